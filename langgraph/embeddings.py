@@ -0,0 +1,184 @@
+import hashlib
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'llm_client'))
+from hash_embedder import HashEmbedder
+
+# Persistent content-hash -> vector cache
+class EmbeddingCache:
+    '''
+    SQLite-backed cache mapping a hash of (model, text) to a float32 vector blob.
+    Survives restarts, so text embedded in a previous run is never re-embedded.
+    '''
+    def __init__(self, path: str = 'embedding_cache.sqlite', model: str = ''):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings '
+            '(key TEXT PRIMARY KEY, dims INTEGER NOT NULL, vector BLOB NOT NULL)'
+        )
+        self._conn.commit()
+
+    def key(self, text: str) -> str:
+        '''Content hash of a text, scoped to the model so vectors never mix.'''
+        return hashlib.sha256(f'{self.model}\0{text}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        '''Return cached vectors for the given keys (missing keys are omitted).'''
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({",".join("?" * len(chunk))})',
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+        return found
+
+    def put_many(self, items: List[Tuple[str, List[float]]]):
+        '''Store (key, vector) pairs as float32 blobs.'''
+        rows = [(key, len(vector), array('f', vector).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, dims, vector) VALUES (?, ?, ?)', rows
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Embeddings wrapper with caching and request coalescing
+class CachedEmbeddings(Embeddings):
+    '''
+    Wraps any LangChain Embeddings with a persistent cache.
+    Cache misses from concurrent callers are coalesced into batched embed calls,
+    and identical texts already in flight share one request.
+    '''
+    def __init__(
+        self,
+        embedder: Embeddings,
+        cache: Optional[EmbeddingCache] = None,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ):
+        self.embedder = embedder
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {'hits': 0, 'misses': 0, 'batches': 0, 'embedded': 0, 'embed_time': 0.0}
+
+        self._queue: 'queue.Queue[Tuple[str, str]]' = queue.Queue()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+        self._worker.start()
+
+    def _key(self, text: str) -> str:
+        if self.cache:
+            return self.cache.key(text)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _submit(self, key: str, text: str) -> Future:
+        '''Queue a text for embedding, or join the request already in flight for it.'''
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.put((key, text))
+            return future
+
+    def _run(self):
+        '''Background loop: gather queued texts into batches and embed them.'''
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._embed_batch(batch)
+
+    def _embed_batch(self, batch: List[Tuple[str, str]]):
+        keys = [key for key, _ in batch]
+        try:
+            start = time.perf_counter()
+            vectors = self.embedder.embed_documents([text for _, text in batch])
+            if len(vectors) != len(batch):
+                raise ValueError(f'Embedder returned {len(vectors)} vectors for {len(batch)} texts')
+            with self._lock:
+                self.stats['embed_time'] += time.perf_counter() - start
+                self.stats['batches'] += 1
+                self.stats['embedded'] += len(batch)
+            if self.cache:
+                self.cache.put_many(list(zip(keys, vectors)))
+        except Exception as e:
+            with self._lock:
+                futures = [self._pending.pop(key) for key in keys]
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            futures = [self._pending.pop(key) for key in keys]
+        for future, vector in zip(futures, vectors):
+            future.set_result(vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cached = self.cache.get_many(keys) if self.cache else {}
+
+        futures = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in futures:
+                futures[key] = self._submit(key, text)
+
+        hits = sum(1 for key in keys if key in cached)
+        with self._lock:
+            self.stats['hits'] += hits
+            self.stats['misses'] += len(keys) - hits
+
+        fresh = {key: future.result() for key, future in futures.items()}
+        return [cached[key] if key in cached else fresh[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def report(self) -> str:
+        '''One-line summary of cache effectiveness and embedding cost.'''
+        return (
+            f'hits={self.stats["hits"]} misses={self.stats["misses"]} '
+            f'hit_ratio={self.hit_ratio:.2%} batches={self.stats["batches"]} '
+            f'embedded={self.stats["embedded"]} embed_time={self.stats["embed_time"]:.3f}s'
+        )
@@ -1,10 +1,19 @@
+import os
+import sys
+import sqlite3
+from typing import Literal
 from langchain.chat_models import init_chat_model
+from langchain.embeddings import init_embeddings
 from langgraph.store.memory import InMemoryStore
+from langgraph.checkpoint.sqlite import SqliteSaver
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Command
 from langgraph.prebuilt import create_react_agent
 
 from schemas import State, Router
+from embeddings import CachedEmbeddings, EmbeddingCache, HashEmbedder
+from stub_llm import StubChatModel
+from tracing import configure_tracing_from_env
 from tools import (
     send_response,
     create_support_ticket,
@@ -18,20 +27,82 @@ from prompts import (
     create_agent_prompt
 )
 
-# Init LLM
-llm = init_chat_model('openai:gpt-4o-mini')
+# Shared LLM rate limiter, retries and hedging (llm_client/llm_limiter.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'llm_client'))
+from llm_limiter import limited_http_client, limited_async_http_client
+
+# Every OpenAI call (router, agent, embeddings) shares one limiter; the SDK's own retries are off
+llm_http_client, llm_async_http_client = limited_http_client(), limited_async_http_client()
+
+# Span tracing: set TRACE_FILE and/or OTEL_EXPORTER_OTLP_ENDPOINT to trace every graph run (off by default)
+tracer = configure_tracing_from_env()
+
+# Init LLM: set LLM_PROVIDER=stub to run the graph offline with a deterministic model,
+# or LLM_PROVIDER=mock to call the local OpenAI-compatible mock server (mock_llm/server.py)
+MOCK_LLM_URL = os.getenv('MOCK_LLM_URL', 'http://127.0.0.1:8900/v1')
+if os.getenv('LLM_PROVIDER') == 'stub':
+    llm = StubChatModel(latency_ms=float(os.getenv('STUB_LLM_LATENCY_MS', '0')))
+    agent_model = llm
+elif os.getenv('LLM_PROVIDER') == 'mock':
+    llm = init_chat_model(
+        'openai:gpt-4o-mini',
+        base_url=MOCK_LLM_URL,
+        api_key=os.getenv('OPENAI_API_KEY', 'mock'),
+        http_client=llm_http_client,
+        http_async_client=llm_async_http_client,
+        max_retries=0,
+    )
+    agent_model = llm
+else:
+    llm = init_chat_model(
+        'openai:gpt-4o-mini', http_client=llm_http_client, http_async_client=llm_async_http_client, max_retries=0
+    )
+    agent_model = llm
 
 # Init LLM router with structured output
 llm_router = llm.with_structured_output(Router)
 
+# Embedding model: set EMBEDDINGS_PROVIDER=local to run offline with a deterministic embedder
+EMBEDDING_MODEL = 'openai:text-embedding-3-small'
+if os.getenv('EMBEDDINGS_PROVIDER') == 'local':
+    EMBEDDING_MODEL = 'local:hash-256'
+    embedder, embedding_dims = HashEmbedder(dims=256), 256
+elif os.getenv('LLM_PROVIDER') == 'mock':
+    # Own cache key, so mock vectors never mix with real ones in the embedding cache
+    EMBEDDING_MODEL = 'mock:text-embedding-3-small'
+    embedder = init_embeddings(
+        'openai:text-embedding-3-small',
+        base_url=MOCK_LLM_URL,
+        api_key=os.getenv('OPENAI_API_KEY', 'mock'),
+        check_embedding_ctx_length=False,
+        http_client=llm_http_client,
+        http_async_client=llm_async_http_client,
+        max_retries=0,
+    )
+    embedding_dims = 1536
+else:
+    embedder = init_embeddings(
+        EMBEDDING_MODEL, http_client=llm_http_client, http_async_client=llm_async_http_client, max_retries=0
+    )
+    embedding_dims = 1536
+
+# Cached embeddings: vectors persist across runs, concurrent misses are batched
+embeddings = CachedEmbeddings(
+    embedder,
+    cache=EmbeddingCache(
+        os.getenv('EMBEDDING_CACHE_PATH', 'embedding_cache.sqlite'),
+        model=EMBEDDING_MODEL,
+    ),
+)
+
 # Memory store with embeddings
 store = InMemoryStore(
-    index={'embed': 'openai:text-embedding-3-small'}
+    index={'embed': embeddings, 'dims': embedding_dims}
 )
 
 # Create the response agent
 response_agent = create_react_agent(
-    'openai:gpt-4o-mini',
+    agent_model,
     tools=[
         send_response, create_support_ticket, manage_memory, search_memory
     ],
@@ -93,5 +164,19 @@ customer_support_agent.add_edge('triage_router', 'response_agent')
 customer_support_agent.add_edge('triage_router', END)
 customer_support_agent.add_edge('response_agent', END)
 
+# Durable checkpointer: set CHECKPOINT_DB to a SQLite path so interrupted runs resume
+def create_checkpointer(path: str = None):
+    '''Create a SQLite-backed checkpointer, or None to run without persistence.'''
+    path = path or os.getenv('CHECKPOINT_DB')
+    if not path:
+        return None
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+def customer_thread_config(customer_email: str) -> dict:
+    '''Run config for a customer: one checkpointed thread per customer email.'''
+    return {'configurable': {'thread_id': f'customer:{customer_email.strip().lower()}'}}
+
+checkpointer = create_checkpointer()
+
 # Compile the graph
-customer_support_agent = customer_support_agent.compile()
\ No newline at end of file
+customer_support_agent = customer_support_agent.compile(checkpointer=checkpointer)
\ No newline at end of file
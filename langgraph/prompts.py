@@ -1,3 +1,5 @@
+from langchain_core.messages import HumanMessage, SystemMessage, convert_to_messages, trim_messages
+
 from schemas import State
 
 # Define prompt instructions
@@ -10,6 +12,14 @@ prompt_instructions = {
     'agent_instructions': 'Use these tools when appropriate to help Anh provide excellent customer support efficiently.',
 }
 
+# Message history policy for long customer threads
+# strategy: 'trim' drops the oldest turns, 'summarize' folds them into a short digest
+history_policy = {
+    'strategy': 'trim',
+    'max_tokens': 3000,
+    'summary_tokens': 400,
+}
+
 # Define triage prompt templates
 triage_system_prompt = '''
 You are an AI assistant for Anh, who is a customer support specialist for a software company.
@@ -53,6 +63,67 @@ You have access to the following tools to help manage customer support:
 </ Instructions >
 '''
 
+def count_tokens(messages) -> int:
+    '''Cheap token estimate (~4 characters per token) used to budget the prompt.'''
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += len(content) // 4 + 4
+        total += len(str(getattr(message, 'tool_calls', '') or '')) // 4
+    return total
+
+def summarize_messages(messages, max_tokens: int) -> str:
+    '''Extractive digest of older turns: the first line of each message, oldest dropped first.'''
+    lines = []
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        first_line = content.strip().split('\n', 1)[0][:200]
+        if first_line:
+            lines.append(f'- {message.type}: {first_line}')
+
+    budget = max_tokens * 4
+    kept = []
+    for line in reversed(lines):
+        if budget - len(line) < 0:
+            break
+        budget -= len(line)
+        kept.append(line)
+    return '\n'.join(reversed(kept))
+
+def apply_history_policy(messages, policy: dict = history_policy):
+    '''
+    Bound the message history to the policy's token budget.
+    The current turn (from the latest user message on) is always kept whole,
+    so tool calls and their results are never split apart.
+    '''
+    messages = convert_to_messages(messages)
+    if count_tokens(messages) <= policy['max_tokens']:
+        return messages
+
+    last_user = max(
+        (i for i, message in enumerate(messages) if isinstance(message, HumanMessage)),
+        default=0,
+    )
+    older, current = messages[:last_user], messages[last_user:]
+
+    if policy['strategy'] == 'summarize':
+        digest = summarize_messages(older, policy['summary_tokens'])
+        if not digest:
+            return current
+        return [SystemMessage(content=f'Summary of earlier conversation:\n{digest}')] + current
+
+    budget = policy['max_tokens'] - count_tokens(current)
+    if budget <= 0:
+        return current
+    kept = trim_messages(
+        older,
+        max_tokens=budget,
+        token_counter=count_tokens,
+        strategy='last',
+        start_on='human',
+    )
+    return kept + current
+
 # Create prompt for agent
 def create_agent_prompt(state: State):
     return [
@@ -62,4 +133,4 @@ def create_agent_prompt(state: State):
                 instructions=prompt_instructions['agent_instructions'],
             ),
         }
-    ] + state['messages']
\ No newline at end of file
+    ] + apply_history_policy(state['messages'])
\ No newline at end of file
@@ -1,7 +1,12 @@
 from schemas import Inquiry
-from tools import search_memory, manage_memory, MEMORY_DB
+from tools import search_memory, search_memories, manage_memory, set_memory_log_level, MEMORY_DB
 from datetime import datetime
+import argparse
+import contextlib
 import json
+import os
+import random
+import time
 
 # Simplified triage and response functions for the memory test
 def handle_inquiry(inquiry: Inquiry, history=None):
@@ -22,7 +27,9 @@ def handle_inquiry(inquiry: Inquiry, history=None):
 
     # Step 1: Search for customer context
     print('\n📚 STEP 1: Retrieving customer context from memory')
-    search_result = search_memory.invoke({'query': customer_email})
+    search_result = search_memory.invoke(
+        {'query': customer_email, 'filter': {'customer': customer_email}}
+    )
 
     # Step 2: Process the inquiry with context
     print('\n📝 STEP 2: Processing the inquiry with available context')
@@ -31,29 +38,24 @@ def handle_inquiry(inquiry: Inquiry, history=None):
     # Step 3: Update memory with new information
     print('\n💾 STEP 3: Updating memory with new information')
     if 'login issue' in message.lower() or 'login issues' in message.lower():
-        manage_memory.invoke(
-            {
-                'content': f'Customer {customer_email} reported login issues with the mobile app: {message[:100]}...'
-            }
-        )
+        issue_type = 'login'
+        content = f'Customer {customer_email} reported login issues with the mobile app: {message[:100]}...'
     elif 'payment' in message.lower() or 'billing' in message.lower():
-        manage_memory.invoke(
-            {
-                'content': f'Customer {customer_email} had billing/payment question: {message[:100]}...'
-            }
-        )
+        issue_type = 'billing'
+        content = f'Customer {customer_email} had billing/payment question: {message[:100]}...'
     elif 'feature' in message.lower() or 'suggestion' in message.lower():
-        manage_memory.invoke(
-            {
-                'content': f'Customer {customer_email} suggested new feature: {message[:100]}...'
-            }
-        )
+        issue_type = 'feature'
+        content = f'Customer {customer_email} suggested new feature: {message[:100]}...'
     else:
-        manage_memory.invoke(
-            {
-                'content': f'Interaction with {customer_email} about {subject}: {message[:100]}...'
-            }
-        )
+        issue_type = 'general'
+        content = f'Interaction with {customer_email} about {subject}: {message[:100]}...'
+
+    manage_memory.invoke(
+        {
+            'content': content,
+            'metadata': {'customer': customer_email, 'issue_type': issue_type},
+        }
+    )
 
     # Record this interaction in history
     history.append(
@@ -76,6 +78,7 @@ def display_memory_contents():
     for mem_id, data in MEMORY_DB.items():
         print(f'\tID: {mem_id}')
         print(f'\tContent: {data["content"]}')
+        print(f'\tMetadata: {data.get("metadata", {})}')
         print(f'\tCreated: {data["created_at"]}')
         print(f'\tUpdated: {data["updated_at"]}')
         print('-' * 50)
@@ -170,11 +173,15 @@ John''',
 
     # Search for this customer's login issues
     print('\n\n🔍 SEARCHING FOR CUSTOMER\'S LOGIN ISSUES')
-    search_memory.invoke({'query': 'john.smith@example.com login'})
+    search_memory.invoke(
+        {'query': 'login', 'filter': {'customer': 'john.smith@example.com', 'issue_type': 'login'}}
+    )
 
     # Search for this customer's billing issues
     print('\n\n🔍 SEARCHING FOR CUSTOMER\'S BILLING ISSUES')
-    search_memory.invoke({'query': 'john.smith@example.com billing'})
+    search_memory.invoke(
+        {'query': 'billing', 'filter': {'customer': 'john.smith@example.com', 'issue_type': 'billing'}}
+    )
 
     # Search for feature suggestions
     print('\n\n🔍 SEARCHING FOR FEATURE SUGGESTIONS')
@@ -210,7 +217,155 @@ def hot_path_vs_background_demo():
     print('\t• Background: Lower latency, potentially slightly outdated information')
 
 
+# Templates for synthetic inquiries (one per issue type handled by handle_inquiry)
+INQUIRY_TEMPLATES = [
+    ('Cannot login to {app}', 'Hello, I keep having login issues with the {app} since {when}. The error says "{error}".'),
+    ('Question about my bill', 'Hi, my billing statement for {when} looks wrong, I think the payment was charged twice.'),
+    ('Feature suggestion', 'Hi, a suggestion: it would be great to have {feature} in the {app}.'),
+    ('General question', 'Hello, how do I export my data from the {app}? I need it by {when}.'),
+]
+TEMPLATE_VALUES = {
+    'app': ['mobile app', 'web dashboard', 'desktop client'],
+    'when': ['yesterday', 'last week', 'this morning', 'the last update'],
+    'error': ['Authentication Failed', 'Session expired', 'Unknown error'],
+    'feature': ['dark mode', 'CSV export', 'two-factor login', 'offline mode'],
+}
+
+def generate_inquiries(num_customers: int, inquiries_per_customer: int, seed: int = 0):
+    '''Generate synthetic inquiries, interleaved across customers the way they would arrive.'''
+    rng = random.Random(seed)
+    inquiries = []
+    for turn in range(inquiries_per_customer):
+        for customer in range(num_customers):
+            subject, body = rng.choice(INQUIRY_TEMPLATES)
+            values = {key: rng.choice(options) for key, options in TEMPLATE_VALUES.items()}
+            inquiries.append(
+                {
+                    'author': f'customer{customer:05d}@example.com',
+                    'to': 'support@yourcompany.com',
+                    'subject': subject.format(**values),
+                    'message_thread': body.format(**values),
+                }
+            )
+    return inquiries
+
+def percentile(values, p: float) -> float:
+    '''Nearest-rank percentile of a list of numbers (p in 0..100).'''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def measure_search_latency(customers, samples: int = 20, rng: random.Random = None) -> dict:
+    '''Time filtered (per-customer) and unfiltered memory searches against the current store.'''
+    rng = rng or random.Random(0)
+    filtered, unfiltered = [], []
+    for _ in range(samples):
+        customer = rng.choice(customers)
+        start = time.perf_counter()
+        search_memories(customer, filter={'customer': customer})
+        filtered.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        search_memories('login billing feature')
+        unfiltered.append(time.perf_counter() - start)
+    return {
+        'filtered_p50': percentile(filtered, 50),
+        'unfiltered_p50': percentile(unfiltered, 50),
+    }
+
+def run_load_test(
+    num_customers: int = 50,
+    inquiries_per_customer: int = 5,
+    use_graph: bool = False,
+    sample_every: int = 50,
+    seed: int = 0,
+) -> dict:
+    '''
+    Drive synthetic customers through handle_inquiry (or the full graph with a stubbed LLM)
+    and report throughput, latency percentiles and how memory search degrades as the store grows.
+    '''
+    inquiries = generate_inquiries(num_customers, inquiries_per_customer, seed)
+    customers = sorted({inquiry['author'] for inquiry in inquiries})
+    rng = random.Random(seed)
+    set_memory_log_level('quiet')
+
+    if use_graph:
+        # Offline graph: stubbed LLM and local embeddings unless configured otherwise
+        os.environ.setdefault('LLM_PROVIDER', 'stub')
+        os.environ.setdefault('EMBEDDINGS_PROVIDER', 'local')
+        from graph import customer_support_agent, customer_thread_config, checkpointer
+
+    print(f'\n🏋️ LOAD TEST: {num_customers} customers x {inquiries_per_customer} inquiries ({"graph" if use_graph else "handle_inquiry"})')
+    print(f'\t{"processed":>10} {"memories":>9} {"p50 ms":>8} {"p99 ms":>8} {"search(filtered) ms":>20} {"search(all) ms":>15}')
+
+    latencies, window, timeline = [], [], []
+    histories = {}
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        for i, inquiry in enumerate(inquiries, 1):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(devnull):
+                if use_graph:
+                    config = customer_thread_config(inquiry['author']) if checkpointer else None
+                    customer_support_agent.invoke({'inquiry_input': inquiry}, config=config)
+                else:
+                    histories[inquiry['author']] = handle_inquiry(inquiry, histories.get(inquiry['author']))
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            window.append(elapsed)
+
+            if i % sample_every == 0 or i == len(inquiries):
+                search = measure_search_latency(customers, rng=rng)
+                point = {
+                    'processed': i,
+                    'memories': len(MEMORY_DB),
+                    'p50': percentile(window, 50),
+                    'p99': percentile(window, 99),
+                    **search,
+                }
+                timeline.append(point)
+                window = []
+                print(
+                    f'\t{i:>10} {point["memories"]:>9} {point["p50"] * 1000:>8.2f} {point["p99"] * 1000:>8.2f} '
+                    f'{point["filtered_p50"] * 1000:>20.3f} {point["unfiltered_p50"] * 1000:>15.3f}'
+                )
+    total = time.perf_counter() - started
+
+    report = {
+        'inquiries': len(inquiries),
+        'seconds': total,
+        'throughput': len(inquiries) / total if total else 0.0,
+        'p50': percentile(latencies, 50),
+        'p90': percentile(latencies, 90),
+        'p99': percentile(latencies, 99),
+        'memories': len(MEMORY_DB),
+        'timeline': timeline,
+    }
+    print(f'\n📊 {report["inquiries"]} inquiries in {total:.2f}s -> {report["throughput"]:.1f} inquiries/s')
+    print(f'\tLatency p50={report["p50"] * 1000:.2f}ms p90={report["p90"] * 1000:.2f}ms p99={report["p99"] * 1000:.2f}ms')
+    print(f'\tMemory store size: {report["memories"]} memories')
+    return report
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Customer support memory simulation')
+    parser.add_argument('--load', action='store_true', help='Run the synthetic load test instead of the demo')
+    parser.add_argument('--customers', type=int, default=50)
+    parser.add_argument('--inquiries', type=int, default=5, help='Inquiries per customer')
+    parser.add_argument('--graph', action='store_true', help='Run inquiries through the full graph with a stubbed LLM')
+    parser.add_argument('--sample-every', type=int, default=50)
+    parser.add_argument('--json', help='Write the load test report to this file')
+    args = parser.parse_args()
+
+    if args.load:
+        report = run_load_test(args.customers, args.inquiries, args.graph, args.sample_every)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+        raise SystemExit
+
     print('🚀 MEMORY SYSTEM DEMONSTRATION FOR CUSTOMER SUPPORT AGENT')
 
     # Run the customer journey simulation
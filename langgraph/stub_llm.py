@@ -0,0 +1,82 @@
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+# Stubbed chat model for offline runs and load tests
+class StubChatModel(BaseChatModel):
+    '''
+    Deterministic stand-in for the support agent's LLM.
+    - Structured output (the triage Router) classifies every inquiry as 'respond', except obvious spam.
+    - As a ReAct agent it searches memory, stores a memory, sends a response, then answers.
+    An optional fixed latency makes timings closer to a real model.
+    '''
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'stub-chat'
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        return self
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        def classify(messages):
+            self._sleep()
+            text = str(messages[-1]['content'] if isinstance(messages[-1], dict) else messages[-1].content)
+            spam = any(word in text.lower() for word in ('unsubscribe', 'newsletter', 'promotion'))
+            return schema(
+                reasoning='Stubbed classification',
+                classification='ignore' if spam else 'respond',
+            )
+        return RunnableLambda(classify)
+
+    def _sleep(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._sleep()
+
+        # Work out where we are in the current turn
+        last_user = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        request = messages[last_user].content
+        steps = sum(isinstance(m, ToolMessage) for m in messages[last_user:])
+        match = re.search(r'From: (\S+)', request)
+        customer = match.group(1) if match else 'unknown'
+        subject_match = re.search(r'Subject: (.*)', request)
+        subject = subject_match.group(1).strip() if subject_match else 'your inquiry'
+
+        if steps == 0:
+            call = ('search_memory', {'query': customer, 'filter': {'customer': customer}})
+        elif steps == 1:
+            call = (
+                'manage_memory',
+                {
+                    'content': f'Interaction with {customer} about {subject}',
+                    'metadata': {'customer': customer, 'issue_type': 'general'},
+                },
+            )
+        elif steps == 2:
+            call = ('send_response', {'to': customer, 'subject': f'Re: {subject}', 'content': 'Thanks, we are on it.'})
+        else:
+            call = None
+
+        if call:
+            message = AIMessage(
+                content='',
+                tool_calls=[{'name': call[0], 'args': call[1], 'id': f'call_{last_user}_{steps}'}],
+            )
+        else:
+            message = AIMessage(content=f'Responded to {customer} about {subject}.')
+        return ChatResult(generations=[ChatGeneration(message=message)])
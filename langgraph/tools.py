@@ -1,5 +1,10 @@
+import os
 import json
+import heapq
+import bisect
+from collections import defaultdict
 from datetime import datetime
+from typing import List, Optional
 from langchain_core.tools import tool
 
 # Tools for handling customer support tasks
@@ -19,85 +24,221 @@ def create_support_ticket(
 
 MEMORY_DB = {}
 
+# Secondary indexes over memory metadata
+class MetadataIndex:
+    '''
+    Hash indexes on customer and issue type, plus a sorted index on timestamp.
+    Used to cut the candidate set for a filtered search before any text scoring.
+    '''
+    FILTER_KEYS = ('customer', 'issue_type', 'since', 'until')
+
+    def __init__(self):
+        self.by_customer = defaultdict(set)
+        self.by_issue_type = defaultdict(set)
+        self.by_timestamp = []  # sorted (timestamp, memory_id)
+        self._entries = {}
+
+    @staticmethod
+    def _key(value) -> str:
+        # Metadata comes from the model, so values may be missing or not strings
+        return '' if value is None else str(value).lower()
+
+    def add(self, memory_id: str, metadata: dict):
+        self.remove(memory_id)
+        customer = self._key(metadata.get('customer'))
+        issue_type = self._key(metadata.get('issue_type'))
+        timestamp = metadata.get('timestamp')
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S') if timestamp is None else str(timestamp)
+        if customer:
+            self.by_customer[customer].add(memory_id)
+        if issue_type:
+            self.by_issue_type[issue_type].add(memory_id)
+        bisect.insort(self.by_timestamp, (timestamp, memory_id))
+        self._entries[memory_id] = (customer, issue_type, timestamp)
+
+    def remove(self, memory_id: str):
+        entry = self._entries.pop(memory_id, None)
+        if entry is None:
+            return
+        customer, issue_type, timestamp = entry
+        self.by_customer[customer].discard(memory_id)
+        self.by_issue_type[issue_type].discard(memory_id)
+        position = bisect.bisect_left(self.by_timestamp, (timestamp, memory_id))
+        if position < len(self.by_timestamp) and self.by_timestamp[position] == (timestamp, memory_id):
+            del self.by_timestamp[position]
+
+    def candidates(self, filter: Optional[dict]) -> Optional[List[str]]:
+        '''
+        Memory ids (oldest first) matching a filter with keys customer, issue_type, since, until.
+        Returns None when there is no filter, or every key is None (i.e. every memory is a candidate).
+        Any other key raises ValueError: the filter comes from the model, and ignoring a misspelled
+        customer key would search every customer's memories.
+        Dates compare as prefixes, so since='2025-05-01' and until='2025-05-31' both work.
+        '''
+        if not filter:
+            return None
+        unknown = sorted(set(filter) - set(self.FILTER_KEYS))
+        if unknown:
+            raise ValueError(f'Unknown filter keys {unknown}, expected some of {self.FILTER_KEYS}')
+
+        sets = []
+        if filter.get('customer') is not None:
+            sets.append(self.by_customer.get(self._key(filter['customer']), set()))
+        if filter.get('issue_type') is not None:
+            sets.append(self.by_issue_type.get(self._key(filter['issue_type']), set()))
+        if filter.get('since') or filter.get('until'):
+            low = bisect.bisect_left(self.by_timestamp, (str(filter.get('since') or ''),))
+            high = (
+                bisect.bisect_right(self.by_timestamp, (str(filter['until']) + '\uffff',))
+                if filter.get('until') else len(self.by_timestamp)
+            )
+            sets.append({memory_id for _, memory_id in self.by_timestamp[low:high]})
+
+        if not sets:
+            return None
+        # Intersect starting from the most selective index
+        sets.sort(key=len)
+        matched = set(sets[0]).intersection(*sets[1:])
+        return sorted(matched, key=lambda memory_id: self._entries[memory_id][2])
+
+METADATA_INDEX = MetadataIndex()
+
+# Memory tool output: 'hits' prints every search hit, 'summary' only operations and counts, 'quiet' nothing
+LOG_LEVELS = ('quiet', 'summary', 'hits')
+MEMORY_LOG_LEVEL = os.getenv('MEMORY_LOG_LEVEL', 'hits')
+if MEMORY_LOG_LEVEL not in LOG_LEVELS:
+    print(f'⚠️ Unknown MEMORY_LOG_LEVEL {MEMORY_LOG_LEVEL!r}, expected one of {LOG_LEVELS}; using "hits"')
+    MEMORY_LOG_LEVEL = 'hits'
+
+def set_memory_log_level(level: str):
+    '''Change how much the memory tools print.'''
+    global MEMORY_LOG_LEVEL
+    if level not in LOG_LEVELS:
+        raise ValueError(f'Unknown log level {level!r}, expected one of {LOG_LEVELS}')
+    MEMORY_LOG_LEVEL = level
+
+def _log(level: str, message: str):
+    if LOG_LEVELS.index(MEMORY_LOG_LEVEL) >= LOG_LEVELS.index(level):
+        print(message)
+
 # Create simplified memory tools
 @tool
 def manage_memory(
-    content: str = None, action: str = 'create', id: str = None
+    content: str = None, action: str = 'create', id: str = None, metadata: dict = None
 ) -> str:
-    '''Create, update, or delete persistent MEMORIES for this customer.'''
+    '''
+    Create, update, or delete persistent MEMORIES for this customer.
+    Optional metadata: customer (email), issue_type (login/billing/feature/general) and timestamp.
+    '''
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    print(f'\n\t🧠 [MEMORY OPERATION - {action.upper()}]')
+    _log('summary', f'\n\t🧠 [MEMORY OPERATION - {action.upper()}]')
+    # Drop empty metadata fields so they don't overwrite defaults such as the timestamp
+    metadata = {key: value for key, value in (metadata or {}).items() if value is not None}
 
     if action == 'create' and content:
         memory_id = f'mem_{abs(hash(content))}'[:12]
         MEMORY_DB[memory_id] = {
             'content': content,
+            'metadata': {'timestamp': timestamp, **(metadata or {})},
             'created_at': timestamp,
             'updated_at': timestamp,
         }
-        print(f'\t✅ Created memory: {memory_id}')
+        METADATA_INDEX.add(memory_id, MEMORY_DB[memory_id]['metadata'])
+        _log('summary', f'\t✅ Created memory: {memory_id}')
         return f'created memory {memory_id}'
 
     elif action == 'update' and id and content:
         if id in MEMORY_DB:
             MEMORY_DB[id]['content'] = content
             MEMORY_DB[id]['updated_at'] = timestamp
-            print(f'\t✅ Updated memory: {id}')
+            if metadata:
+                MEMORY_DB[id]['metadata'].update(metadata)
+                METADATA_INDEX.add(id, MEMORY_DB[id]['metadata'])
+            _log('summary', f'\t✅ Updated memory: {id}')
             return f'updated memory {id}'
         else:
-            print(f'\t❌ Failed to update: Memory {id} not found')
+            _log('summary', f'\t❌ Failed to update: Memory {id} not found')
             return f'Error: Memory {id} not found'
 
     elif action == 'delete' and id:
         if id in MEMORY_DB:
             del MEMORY_DB[id]
-            print(f'\t✅ Deleted memory: {id}')
+            METADATA_INDEX.remove(id)
+            _log('summary', f'\t✅ Deleted memory: {id}')
             return f'deleted memory {id}'
         else:
-            print(f'\t❌ Failed to delete: Memory {id} not found')
+            _log('summary', f'\t❌ Failed to delete: Memory {id} not found')
             return f'Error: Memory {id} not found'
 
     return 'Memory operation failed. Check parameters.'
 
 
+def search_memories(
+    query: str, limit: int = 10, offset: int = 0, filter: dict = None
+) -> List[dict]:
+    '''
+    Structured memory search: returns the ranked page of matching memories as dicts.
+    Only the top offset + limit matches are kept (heap selection), never a full sort.
+    The filter (see MetadataIndex.candidates) narrows the candidates before scoring.
+    '''
+    if offset < 0:
+        raise ValueError(f'offset must be >= 0, got {offset}')
+    query_terms = query.lower().split()
+    if not query_terms or limit <= 0:
+        return []
+
+    candidate_ids = METADATA_INDEX.candidates(filter)
+    if candidate_ids is None:
+        candidates = MEMORY_DB.items()
+    else:
+        candidates = ((mem_id, MEMORY_DB[mem_id]) for mem_id in candidate_ids)
+
+    def scored():
+        # Simple relevance score based on word matching
+        for mem_id, data in candidates:
+            content = data['content'].lower()
+            matches = sum(term in content for term in query_terms)
+            if matches:
+                yield mem_id, data, matches / len(query_terms)
+
+    # nlargest is stable, so ties keep insertion order like a full sort would
+    top = heapq.nlargest(offset + limit, scored(), key=lambda x: x[2])
+
+    return [
+        {
+            'id': mem_id,
+            'value': {'content': data['content']},
+            'metadata': data.get('metadata', {}),
+            'created_at': data['created_at'],
+            'updated_at': data['updated_at'],
+            'score': score,
+        }
+        for mem_id, data, score in top[offset:offset + limit]
+    ]
+
 @tool
 def search_memory(
     query: str, limit: int = 10, offset: int = 0, filter: dict = None
 ) -> str:
     '''Search memories for information relevant to the current context.'''
-    print(f'\n\t🔍 [MEMORY SEARCH]')
-    print(f'\t🔎 Query: {query}')
-
-    # Simplified memory search based on basic text matching
-    results = []
-    query_lower = query.lower()
-
-    for mem_id, data in MEMORY_DB.items():
-        content = data['content'].lower()
-        # Simple relevance score based on word matching
-        if any(term in content for term in query_lower.split()):
-            score = sum(term in content for term in query_lower.split()) / len(
-                query_lower.split()
+    _log('summary', f'\n\t🔍 [MEMORY SEARCH]')
+    _log('summary', f'\t🔎 Query: {query}')
+    if filter:
+        _log('summary', f'\t🏷️ Filter: {filter}')
+
+    try:
+        results = search_memories(query, limit=limit, offset=offset, filter=filter)
+    except ValueError as e:
+        _log('summary', f'\t❌ Search failed: {e}')
+        return f'Error: {e}'
+
+    _log('summary', f'\t📊 Found {len(results)} relevant memories')
+    if MEMORY_LOG_LEVEL == 'hits':
+        for r in results:
+            print(f'\t  • [{r["id"]}] - Score: {r["score"]:.4f}')
+            print(
+                f'\t    {r["value"]["content"][:100]}{"..." if len(r["value"]["content"]) > 100 else ""}'
             )
-            results.append(
-                {
-                    'id': mem_id,
-                    'value': {'content': data['content']},
-                    'created_at': data['created_at'],
-                    'updated_at': data['updated_at'],
-                    'score': score,
-                }
-            )
-
-    # Sort by relevance score
-    results = sorted(results, key=lambda x: x['score'], reverse=True)[:limit]
-
-    print(f'\t📊 Found {len(results)} relevant memories')
-    for r in results:
-        print(f'\t  • [{r["id"]}] - Score: {r["score"]:.4f}')
-        print(
-            f'\t    {r["value"]["content"][:100]}{"..." if len(r["value"]["content"]) > 100 else ""}'
-        )
 
     return json.dumps(results)
@@ -0,0 +1,400 @@
+import argparse
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+logger = logging.getLogger(__name__)
+
+# Spans
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: str  # 'request', 'node', 'llm', 'tool' or 'internal'
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def to_otlp(spans: List[Span], service_name: str) -> dict:
+    '''Spans as an OTLP/JSON ExportTraceServiceRequest (what OTLP/HTTP collectors and the collector file exporter use).'''
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+            'scopeSpans': [{
+                'scope': {'name': 'support-agent'},
+                'spans': [
+                    {
+                        'traceId': span.trace_id,
+                        'spanId': span.span_id,
+                        'parentSpanId': span.parent_id or '',
+                        'name': span.name,
+                        'kind': 2 if span.kind == 'request' else 1,  # SERVER for the request root, INTERNAL otherwise
+                        'startTimeUnixNano': str(span.start_ns),
+                        'endTimeUnixNano': str(span.end_ns),
+                        'attributes': [
+                            {'key': key, 'value': _otlp_value(value)}
+                            for key, value in {'span.kind': span.kind, **span.attributes}.items()
+                        ],
+                        'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+                    }
+                    for span in spans
+                ],
+            }],
+        }],
+    }
+
+def from_otlp(payload: dict) -> List[Span]:
+    spans = []
+    for resource_spans in payload.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for s in scope_spans.get('spans', []):
+                attributes = {a['key']: next(iter(a['value'].values())) for a in s.get('attributes', [])}
+                kind = attributes.pop('span.kind', 'internal')
+                spans.append(Span(
+                    trace_id=s['traceId'],
+                    span_id=s['spanId'],
+                    parent_id=s.get('parentSpanId') or None,
+                    name=s['name'],
+                    kind=kind,
+                    start_ns=int(s['startTimeUnixNano']),
+                    end_ns=int(s['endTimeUnixNano']),
+                    attributes=attributes,
+                    error=s.get('status', {}).get('message'),
+                ))
+    return spans
+
+
+# Exporters: each receives a finished trace (all its spans) at once
+class FileExporter:
+    '''Appends one OTLP/JSON ExportTraceServiceRequest per trace to a JSON-lines file.'''
+    def __init__(self, path: str, service_name: str = 'support-agent'):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        line = json.dumps(to_otlp(spans, self.service_name))
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+class OTLPHttpExporter:
+    '''POSTs traces to an OTLP/HTTP collector ({endpoint}/v1/traces, JSON encoding) from a background thread.'''
+    def __init__(self, endpoint: str, service_name: str = 'support-agent', timeout: float = 5.0):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service_name = service_name
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='otlp-export')
+
+    def export(self, spans: List[Span]):
+        self._executor.submit(self._post, json.dumps(to_otlp(spans, self.service_name)).encode())
+
+    def _post(self, body: bytes):
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError as e:
+            logger.warning('OTLP export to %s failed: %s', self.url, e)
+
+
+# Tracer
+class Tracer:
+    '''
+    Collects spans per trace and hands each trace to the exporters when its root span ends.
+    Spans are opened explicitly (start_span/end_span, as the callback handler does)
+    or with the span() context manager, which nests under the current span.
+    '''
+    def __init__(self, exporters: List[Any]):
+        self.exporters = exporters
+        self._traces: Dict[str, List[Span]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._current: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+    def start_span(self, name: str, kind: str = 'internal', parent: Optional[Span] = None, **attributes) -> Span:
+        return Span(
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            name=name,
+            kind=kind,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+        )
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None):
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f'{type(error).__name__}: {error}'
+        with self._lock:
+            self._traces[span.trace_id].append(span)
+            if span.parent_id is not None:
+                return
+            spans = self._traces.pop(span.trace_id)
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception:
+                logger.exception('trace export failed')
+
+    @contextmanager
+    def span(self, name: str, kind: str = 'internal', **attributes):
+        span = self.start_span(name, kind, self._current.get(), **attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            self._current.reset(token)
+
+
+def _payload_size(value: Any) -> int:
+    '''Approximate payload size in bytes (UTF-8 length of the text content).'''
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode())
+    content = getattr(value, 'content', None)
+    if content is not None:
+        return _payload_size(content if isinstance(content, str) else json.dumps(content, default=str))
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(item) for item in value)
+    return len(json.dumps(value, default=str).encode())
+
+# Callback handler: turns LangChain/LangGraph runs into spans
+class TracingCallbackHandler(BaseCallbackHandler):
+    '''
+    One span per graph request, per graph node (triage_router, response_agent and the ReAct agent/tools nodes),
+    per LLM call (with token counts) and per tool call (search_memory, manage_memory, ...), with payload sizes.
+    LangGraph's internal runnables (channel writes, routing branches, ...) are not spans: their children
+    attach to the nearest traced ancestor.
+    '''
+    run_inline = True
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._spans: Dict[UUID, Span] = {}
+        self._nearest: Dict[UUID, Optional[Span]] = {}  # run -> nearest traced span (itself or an ancestor)
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: Optional[str], kind: Optional[str], **attributes):
+        with self._lock:
+            parent = self._nearest.get(parent_run_id) if parent_run_id else None
+            if kind is None:
+                self._nearest[run_id] = parent
+                return
+            span = self.tracer.start_span(name, kind, parent, **attributes)
+            self._spans[run_id] = span
+            self._nearest[run_id] = span
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes) -> None:
+        with self._lock:
+            self._nearest.pop(run_id, None)
+            span = self._spans.pop(run_id, None)
+        if span:
+            span.attributes.update(attributes)
+            self.tracer.end_span(span, error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        name = kwargs.get('name') or (serialized or {}).get('name', 'chain')
+        node = (metadata or {}).get('langgraph_node')
+        if parent_run_id is None:
+            inquiry = inputs.get('inquiry_input', {}) if isinstance(inputs, dict) else {}
+            attributes = {f'inquiry.{key}': inquiry[key] for key in ('author', 'subject') if key in inquiry}
+            self._start(run_id, None, name, 'request', **attributes, **{'input.bytes': _payload_size(inputs)})
+        elif node == name and not name.startswith('__'):
+            self._start(run_id, parent_run_id, name, 'node')
+        else:
+            self._start(run_id, parent_run_id, None, None)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = (metadata or {}).get('ls_model_name') or kwargs.get('name') or (serialized or {}).get('name', 'llm')
+        prompt = [m for batch in messages for m in batch]
+        self._start(run_id, parent_run_id, name, 'llm', **{'llm.messages': len(prompt), 'request.bytes': _payload_size(prompt)})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = (metadata or {}).get('ls_model_name') or kwargs.get('name') or (serialized or {}).get('name', 'llm')
+        self._start(run_id, parent_run_id, name, 'llm', **{'request.bytes': _payload_size(prompts)})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        attributes = {}
+        generations = [g for batch in response.generations for g in batch]
+        usage = next((getattr(g.message, 'usage_metadata', None) for g in generations if hasattr(g, 'message')), None)
+        usage = usage or (response.llm_output or {}).get('token_usage') or {}
+        input_tokens = usage.get('input_tokens', usage.get('prompt_tokens'))
+        output_tokens = usage.get('output_tokens', usage.get('completion_tokens'))
+        if input_tokens is not None:
+            attributes['llm.input_tokens'] = input_tokens
+        if output_tokens is not None:
+            attributes['llm.output_tokens'] = output_tokens
+        attributes['response.bytes'] = sum(
+            _payload_size(getattr(g, 'message', None) or g.text) for g in generations
+        )
+        tool_calls = sum(len(getattr(getattr(g, 'message', None), 'tool_calls', None) or []) for g in generations)
+        if tool_calls:
+            attributes['llm.tool_calls'] = tool_calls
+        self._end(run_id, **attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get('name') or (serialized or {}).get('name', 'tool')
+        self._start(run_id, parent_run_id, name, 'tool', **{'input.bytes': _payload_size(input_str)})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, **{'output.bytes': _payload_size(output)})
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+# Global switch: with tracing disabled no handler is attached to any run, so the graph pays nothing
+_tracing_handler: ContextVar[Optional[TracingCallbackHandler]] = ContextVar('support_agent_tracing', default=None)
+register_configure_hook(_tracing_handler, inheritable=True)
+
+def enable_tracing(path: str = None, otlp_endpoint: str = None, service_name: str = 'support-agent') -> Optional[Tracer]:
+    '''Trace every graph run in this context to a JSON-lines file and/or an OTLP/HTTP collector.'''
+    exporters = []
+    if path:
+        exporters.append(FileExporter(path, service_name))
+    if otlp_endpoint:
+        exporters.append(OTLPHttpExporter(otlp_endpoint, service_name))
+    if not exporters:
+        return None
+    tracer = Tracer(exporters)
+    _tracing_handler.set(TracingCallbackHandler(tracer))
+    return tracer
+
+def disable_tracing():
+    _tracing_handler.set(None)
+
+def configure_tracing_from_env() -> Optional[Tracer]:
+    '''TRACE_FILE=<path> and/or OTEL_EXPORTER_OTLP_ENDPOINT=<url> turn tracing on.'''
+    return enable_tracing(
+        os.getenv('TRACE_FILE'),
+        os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'),
+        os.getenv('OTEL_SERVICE_NAME', 'support-agent'),
+    )
+
+
+# Flame-style report
+def load_traces(path: str) -> Dict[str, List[Span]]:
+    traces = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                for span in from_otlp(json.loads(line)):
+                    traces[span.trace_id].append(span)
+    return traces
+
+def _span_label(span: Span) -> str:
+    details = []
+    if 'llm.input_tokens' in span.attributes:
+        details.append(f'tokens={span.attributes["llm.input_tokens"]}/{span.attributes.get("llm.output_tokens", "?")}')
+    for key in ('request.bytes', 'input.bytes', 'response.bytes', 'output.bytes'):
+        if key in span.attributes:
+            details.append(f'{key.split(".")[0]}={int(span.attributes[key])}B')
+    if span.error:
+        details.append(f'ERROR {span.error}')
+    return f'{span.kind}:{span.name}' + (f'  [{" ".join(details)}]' if details else '')
+
+def print_flame(spans: List[Span], width: int = 40):
+    '''Span tree with each span's position and extent on the request's timeline.'''
+    children = defaultdict(list)
+    for span in spans:
+        children[span.parent_id].append(span)
+    roots = children[None] or [min(spans, key=lambda s: s.start_ns)]
+    root = roots[0]
+    total = max(root.end_ns - root.start_ns, 1)
+    title = ' '.join(f'{k.split(".")[1]}={v}' for k, v in root.attributes.items() if k.startswith('inquiry.'))
+    print(f'\n🔥 {root.duration_ms:.1f}ms  trace {root.trace_id[:12]}  {title}')
+
+    def walk(span: Span, depth: int):
+        offset = int((span.start_ns - root.start_ns) / total * width)
+        length = max(1, round((span.end_ns - span.start_ns) / total * width))
+        bar = ' ' * offset + '█' * min(length, width - offset)
+        child_ms = sum(child.duration_ms for child in children[span.span_id])
+        print(
+            f'\t{bar:<{width}} {span.duration_ms:>9.1f}ms {span.duration_ms / root.duration_ms * 100 if root.duration_ms else 100:>4.0f}% '
+            f'self={max(span.duration_ms - child_ms, 0):>7.1f}ms  {"  " * depth}{_span_label(span)}'
+        )
+        for child in sorted(children[span.span_id], key=lambda s: s.start_ns):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+
+def print_breakdown(traces: Dict[str, List[Span]]):
+    '''Total self time per span (kind:name) across the given traces.'''
+    self_ms, counts = defaultdict(float), defaultdict(int)
+    for spans in traces.values():
+        child_ms = defaultdict(float)
+        for span in spans:
+            child_ms[span.parent_id] += span.duration_ms
+        for span in spans:
+            key = f'{span.kind}:{span.name}'
+            self_ms[key] += max(span.duration_ms - child_ms[span.span_id], 0)
+            counts[key] += 1
+    total = sum(self_ms.values()) or 1
+    print(f'\n📊 SELF TIME BY SPAN ({len(traces)} traces)')
+    print(f'\t{"span":<40} {"calls":>6} {"self ms":>10} {"share":>6}')
+    for key, ms in sorted(self_ms.items(), key=lambda item: item[1], reverse=True):
+        print(f'\t{key:<40} {counts[key]:>6} {ms:>10.1f} {ms / total * 100:>5.1f}%')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Flame-style breakdown of the slowest traced requests')
+    parser.add_argument('trace_file', nargs='?', default=os.getenv('TRACE_FILE', 'traces.jsonl'))
+    parser.add_argument('--slowest', type=int, default=5, help='Number of slowest requests to show')
+    parser.add_argument('--width', type=int, default=40, help='Timeline width in characters')
+    args = parser.parse_args()
+
+    traces = load_traces(args.trace_file)
+    if not traces:
+        print(f'No traces in {args.trace_file}')
+    else:
+        def duration(spans):
+            return max(s.end_ns for s in spans) - min(s.start_ns for s in spans)
+        slowest = dict(sorted(traces.items(), key=lambda item: duration(item[1]), reverse=True)[:args.slowest])
+        print(f'🔎 {len(traces)} traces in {args.trace_file}, showing the {len(slowest)} slowest')
+        for spans in slowest.values():
+            print_flame(spans, args.width)
+        print_breakdown(slowest)
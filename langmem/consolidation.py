@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langgraph.store.base import BaseStore, PutOp
+
+from memory_filter import strip_prefix, tokenize
+
+logger = logging.getLogger('coach.consolidation')
+
+# Words that say nothing about which topic a memory belongs to
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'to', 'of', 'in', 'on', 'at', 'for', 'with', 'by', 'is', 'are',
+    'was', 'were', 'be', 'been', 'am', 'i', 'im', 'my', 'me', 'you', 'it', 'this', 'that', 'so', 'do',
+    'have', 'has', 'had', 'about', 'now', 'just', 'really', 'want', 'would', 'like', 'user', 'shared',
+}
+
+Summarizer = Callable[[List[str]], str]
+
+def topic_terms(text: str) -> set:
+    return {t for t in tokenize(strip_prefix(text)) if t not in STOPWORDS and not t.isdigit()}
+
+def extractive_summarizer(texts: List[str]) -> str:
+    '''Local stand-in for an LLM summarizer: newest-first, deduplicated fragments in one profile line.'''
+    seen, parts = set(), []
+    for text in reversed(texts):
+        fragment = strip_prefix(text).strip().rstrip('.')
+        terms = frozenset(topic_terms(fragment))
+        if fragment and terms not in seen:
+            seen.add(terms)
+            parts.append(fragment)
+    return 'User profile: ' + '; '.join(parts)
+
+def llm_summarizer(llm) -> Summarizer:
+    '''Summarizer that asks a chat model to merge a cluster of memories into one profile record.'''
+    def summarize(texts: List[str]) -> str:
+        bullet_list = '\n'.join(f'- {text}' for text in texts)
+        response = llm.invoke(
+            'Merge these notes about one user into a single concise profile statement. '
+            'Keep every fact; when notes disagree, the later note wins.\n\n' + bullet_list
+        )
+        return response.content.strip()
+    return summarize
+
+
+def load_namespace(store: BaseStore, namespace: Tuple[str, ...], page_size: int = 500):
+    '''All items of a namespace, oldest first.'''
+    items, offset = [], 0
+    while True:
+        page = store.search(namespace, limit=page_size, offset=offset)
+        items.extend(page)
+        if len(page) < page_size:
+            break
+        offset += page_size
+    return sorted(items, key=lambda item: item.created_at)
+
+def cluster_memories(items, min_overlap: float = 0.5) -> List[list]:
+    '''
+    Greedy single-pass clustering on topic terms.
+    A memory joins the cluster whose terms it overlaps most (overlap coefficient), if above min_overlap.
+    '''
+    clusters: List[Tuple[set, list]] = []
+    for item in items:
+        terms = topic_terms(str(item.value.get('content', '')))
+        best, best_overlap = None, min_overlap
+        for cluster in clusters:
+            cluster_terms = cluster[0]
+            if not terms or not cluster_terms:
+                continue
+            overlap = len(terms & cluster_terms) / min(len(terms), len(cluster_terms))
+            if overlap >= best_overlap:
+                best, best_overlap = cluster, overlap
+        if best:
+            best[0].update(terms)
+            best[1].append(item)
+        else:
+            clusters.append((set(terms), [item]))
+    return [members for _, members in clusters]
+
+def measure_search_latency(store: BaseStore, namespace: Tuple[str, ...], queries: List[str]) -> float:
+    '''Mean seconds per search over the given queries.'''
+    if not queries:
+        return 0.0
+    start = time.perf_counter()
+    for query in queries:
+        store.search(namespace, query=query, limit=5)
+    return (time.perf_counter() - start) / len(queries)
+
+def unchanged(store: BaseStore, namespace: Tuple[str, ...], items) -> bool:
+    '''True if every item is still in the store as loaded (not updated or deleted since).'''
+    for item in items:
+        current = store.get(namespace, item.key)
+        if current is None or current.updated_at != item.updated_at:
+            return False
+    return True
+
+def consolidate_namespace(
+    store: BaseStore,
+    namespace: Tuple[str, ...],
+    summarizer: Summarizer = extractive_summarizer,
+    min_overlap: float = 0.5,
+    min_cluster_size: int = 3,
+    sample_queries: int = 10,
+) -> Dict[str, float]:
+    '''
+    Merge each cluster of related memories into one profile record and retire the originals.
+    A cluster is left alone if any member was updated or deleted while it was being summarized,
+    so a concurrent write is never lost.
+    Returns a report with store size and mean search latency before and after.
+    '''
+    items = load_namespace(store, namespace)
+    queries = [str(item.value.get('content', '')) for item in items[:: max(1, len(items) // sample_queries)]][:sample_queries]
+    latency_before = measure_search_latency(store, namespace, queries)
+
+    ops, merged_clusters, skipped_clusters, retired = [], 0, 0, 0
+    for members in cluster_memories(items, min_overlap):
+        if len(members) < min_cluster_size:
+            continue
+        summary = summarizer([str(item.value.get('content', '')) for item in members])
+        if not unchanged(store, namespace, members):
+            skipped_clusters += 1
+            continue
+        ops.append(
+            PutOp(namespace, f'profile-{uuid.uuid4()}', {'content': summary, 'kind': 'profile', 'sources': len(members)})
+        )
+        ops.extend(PutOp(namespace, item.key, None) for item in members)
+        merged_clusters += 1
+        retired += len(members)
+
+    # One batch: deletes and the new profile records (embedded together) land at once
+    if ops:
+        store.batch(ops)
+
+    size_after = len(load_namespace(store, namespace))
+    return {
+        'size_before': len(items),
+        'size_after': size_after,
+        'clusters_merged': merged_clusters,
+        'clusters_skipped': skipped_clusters,
+        'memories_retired': retired,
+        'search_latency_before': latency_before,
+        'search_latency_after': measure_search_latency(store, namespace, queries),
+    }
+
+def print_report(namespace: Tuple[str, ...], report: Dict[str, float]):
+    print(
+        f'\t🧹 {"/".join(namespace)}: {report["size_before"]} -> {report["size_after"]} memories '
+        f'({report["clusters_merged"]} clusters, {report["memories_retired"]} retired, '
+        f'{report["clusters_skipped"]} skipped as changed), '
+        f'search {report["search_latency_before"] * 1000:.2f}ms -> {report["search_latency_after"] * 1000:.2f}ms'
+    )
+
+def consolidate_all(
+    store: BaseStore,
+    prefix: Tuple[str, ...] = ('health_coach',),
+    summarizer: Summarizer = extractive_summarizer,
+    on_consolidated: Optional[Callable[[Tuple[str, ...]], None]] = None,
+    skip: Optional[Callable[[Tuple[str, ...]], bool]] = None,
+    **kwargs,
+) -> Dict[Tuple[str, ...], Dict[str, float]]:
+    '''
+    Consolidate every memory namespace under a prefix.
+    skip: namespaces it returns True for (e.g. users with a turn in flight) are left for the next pass.
+    '''
+    reports = {}
+    for namespace in store.list_namespaces(prefix=prefix, limit=100000):
+        if namespace[-1] != 'memories' or (skip and skip(namespace)):
+            continue
+        reports[namespace] = consolidate_namespace(store, namespace, summarizer, **kwargs)
+        print_report(namespace, reports[namespace])
+        if on_consolidated and reports[namespace]['clusters_merged']:
+            on_consolidated(namespace)
+    return reports
+
+async def run_consolidation_loop(store: BaseStore, interval_seconds: float, **kwargs):
+    '''
+    Periodic background job: consolidate all namespaces every interval (off the event loop).
+    A failed pass (summarizer or store error) is logged and retried on the next interval.
+    '''
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(consolidate_all, store, **kwargs)
+        except Exception:
+            logger.exception('Consolidation pass failed')
+
+
+if __name__ == '__main__':
+    import fitness_coach_agent as coach
+
+    parser = argparse.ArgumentParser(description='Consolidate fragmented coach memories')
+    parser.add_argument('--interval', type=float, help='Run every N seconds instead of once')
+    parser.add_argument('--llm', action='store_true', help='Summarize clusters with the coach LLM instead of the local summarizer')
+    parser.add_argument('--min-cluster-size', type=int, default=3)
+    args = parser.parse_args()
+
+    summarizer = llm_summarizer(coach.get_llm()) if args.llm else extractive_summarizer
+    if args.interval:
+        asyncio.run(run_consolidation_loop(coach.get_store(), args.interval, summarizer=summarizer, min_cluster_size=args.min_cluster_size))
+    else:
+        consolidate_all(coach.get_store(), summarizer=summarizer, min_cluster_size=args.min_cluster_size)
@@ -1,26 +1,79 @@
 import os
+import sys
 import json
+import asyncio
+import argparse
+import functools
+import httpx
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.messages import HumanMessage, SystemMessage
 from langmem import create_manage_memory_tool, create_search_memory_tool
-from langgraph.store.memory import InMemoryStore
 
-from helpers import extract_key_information, clean_response
+from sqlite_store import SqliteStore, HashEmbedder
+from memory_filter import MemoryWriteFilter
+
+# Shared LLM rate limiter, retries and hedging (llm_client/llm_limiter.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'llm_client'))
+from llm_limiter import limited_http_client, limited_async_http_client
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model='gpt-4o-mini',
-    temperature=0.2,
+# Shared HTTP connection pools: every session reuses the same keep-alive connections,
+# and every LLM/embedding call goes through the shared limiter (which retries, so the SDK doesn't)
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+http_limits = httpx.Limits(
+    max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS
 )
+llm_http_client = limited_http_client(limits=http_limits)
+llm_async_http_client = limited_async_http_client(limits=http_limits)
+
+# LLM_PROVIDER=mock points the coach at the local mock server (mock_llm/server.py)
+LLM_BASE_URL = None
+if os.getenv('LLM_PROVIDER') == 'mock':
+    LLM_BASE_URL = os.getenv('MOCK_LLM_URL', 'http://127.0.0.1:8900/v1')
+    OPENAI_API_KEY = OPENAI_API_KEY or 'mock'
+
+# The LLM, store and default tools are built on first use, so importing this module
+# (e.g. to serve with a stub LLM and a local store) doesn't need OPENAI_API_KEY
+@functools.lru_cache(maxsize=None)
+def get_llm() -> ChatOpenAI:
+    return ChatOpenAI(
+        api_key=OPENAI_API_KEY,
+        base_url=LLM_BASE_URL,
+        model='gpt-4o-mini',
+        temperature=0.2,
+        http_client=llm_http_client,
+        http_async_client=llm_async_http_client,
+        max_retries=0,
+    )
 
-# Create memory store (in-memory)
-# Note: when quit the program, the memory will be lost
-store = InMemoryStore()
+@functools.lru_cache(maxsize=None)
+def get_store() -> SqliteStore:
+    '''
+    The coach's memory store (durable, on disk).
+    Memories and their vectors survive restarts; set EMBEDDINGS_PROVIDER=local to embed offline.
+    '''
+    if os.getenv('EMBEDDINGS_PROVIDER') == 'local':
+        embed, dims = HashEmbedder(dims=256), 256
+    else:
+        embed = OpenAIEmbeddings(
+            model='text-embedding-3-small',
+            api_key=OPENAI_API_KEY,
+            base_url=LLM_BASE_URL,
+            http_client=llm_http_client,
+            http_async_client=llm_async_http_client,
+            max_retries=0,
+            # Token-length checks need tiktoken's encodings, which the offline mock setup can't fetch
+            check_embedding_ctx_length=LLM_BASE_URL is None,
+        )
+        dims = 1536
+    return SqliteStore(
+        os.getenv('COACH_MEMORY_DB', 'coach_memory.sqlite'),
+        index={'embed': embed, 'dims': dims, 'fields': ['content']},
+    )
 
 SYSTEM_PROMPT = '''You are a personal health coach with access to memory tools.
 Your goal is to help users achieve their fitness goals by providing personalized advice and tracking their progress over time.
@@ -40,15 +93,24 @@ Always be supportive, encouraging, and provide actionable advice.
 # User ID (simple simulation)
 user_id = 'user123'
 
-# Create tools
-manage_memory = create_manage_memory_tool(
-    namespace=('health_coach', user_id, 'memories'),
-    store=store
-)
-search_memory = create_search_memory_tool(
-    namespace=('health_coach', user_id, 'memories'),
-    store=store
-)
+def create_user_tools(user_id: str, store: SqliteStore = None):
+    '''Memory tools and write filter bound to one user's namespace (in store, the coach's store by default).'''
+    store = store or get_store()
+    namespace = ('health_coach', user_id, 'memories')
+    manage_memory = create_manage_memory_tool(namespace=namespace, store=store)
+    search_memory = create_search_memory_tool(namespace=namespace, store=store)
+    # Write-side filter: drop chit-chat, merge near-duplicates instead of appending
+    memory_filter = MemoryWriteFilter(store, namespace)
+    return manage_memory, search_memory, memory_filter
+
+# Tools for the interactive coach's user
+@functools.lru_cache(maxsize=None)
+def get_default_tools():
+    return create_user_tools(user_id)
+
+# Markers the LLM may use in its response
+RESPONSE_PREFIXES = ['RESPONSE:', 'USER RESPONSE:', 'COACH:']
+MEMORY_MARKERS = ['MEMORY:', 'STORE IN MEMORY:', 'REMEMBER:']
 
 def extract_key_information(user_message: str) -> str:
     '''
@@ -62,12 +124,12 @@ def extract_key_information(user_message: str) -> str:
 def clean_response(response: str) -> str:
     '''Clean up the response to remove any system artifacts'''
     # Remove common formatting markers
-    for marker in ['RESPONSE:', 'USER RESPONSE:', 'COACH:']:
+    for marker in RESPONSE_PREFIXES:
         if response.startswith(marker):
             response = response[len(marker):].strip()
 
     # Remove any remaining memory markers and their content
-    for marker in ['MEMORY:', 'STORE IN MEMORY:', 'REMEMBER:']:
+    for marker in MEMORY_MARKERS:
         if marker in response:
             parts = response.split(marker, 1)
             if len(parts) > 1:
@@ -79,10 +141,106 @@ def clean_response(response: str) -> str:
 
     return response.strip()
 
+def print_memory_results(memory_results):
+    '''Pretty-print memory search results (tool output may be a list or a JSON string).'''
+    try:
+        memory_items = json.loads(memory_results) if isinstance(memory_results, str) else memory_results
+    except ValueError:
+        print(f"⚠️ Memory format: {memory_results[:100]}...")
+        return
+
+    if memory_items:
+        print(f'\tFound {len(memory_items)} relevant memories:')
+        for i, item in enumerate(memory_items):
+            if 'value' in item and 'content' in item['value']:
+                print(f'\t\t• Memory {i+1}: {item["value"]["content"][:100]}...')
+    else:
+        print('\tNo relevant memories found.')
+
+def build_messages(user_message: str, conversation_history: list, memory_results) -> list:
+    '''Prompt for one coaching turn.'''
+    # Create context for LLM
+    context = (
+        '\n'.join(conversation_history[-5:])
+        if len(conversation_history) > 5
+        else '\n'.join(conversation_history)
+    )
+
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=f'''User message: {user_message}
+
+Previous conversation context: {context}
+
+Memory search results: {memory_results}
+
+Respond to the user with personalized health coaching advice based on their message and any relevant information from memory.
+
+Also, identify if there's new important information about the user that should be stored in memory.
+Don't mention the memory system directly to the user - they should just experience personalized advice.'''
+        )
+    ]
+
+def extract_memory(response_text: str, user_message: str):
+    '''Split the LLM response into (response text, memory to store).'''
+    memory_to_store = None
+
+    # Check if the response contains a clear indication of memory content
+    if any(marker in response_text for marker in MEMORY_MARKERS):
+        try:
+            # Try to extract memory section - assumes model might format its response with a designated memory section
+            for marker in MEMORY_MARKERS:
+                if marker in response_text:
+                    parts = response_text.split(marker, 1)
+                    if len(parts) > 1:
+                        memory_section = parts[1].split('\n\n', 1)[0].strip()
+                        response_text = response_text.replace(
+                            marker + memory_section,
+                            ''
+                        ).strip()
+                        memory_to_store = memory_section
+                        break
+
+        except Exception as e:
+            # If extraction fails, create a general memory
+            memory_to_store = f"User message: {user_message}"
+    else:
+        # Create an automatic memory from this interaction
+        memory_to_store = extract_key_information(user_message)
+
+    return response_text, memory_to_store
+
+def store_memory(memory_to_store: str, manage_memory=None, memory_filter=None, log=print):
+    '''Write a memory through the write-side filter (skip, merge or store); the default user's tools by default.'''
+    if manage_memory is None or memory_filter is None:
+        manage_memory, _, memory_filter = get_default_tools()
+    try:
+        decision, existing_id = memory_filter.check(
+            memory_to_store, trusted=not memory_to_store.startswith('User shared:')
+        )
+        if decision == 'skip':
+            log('\n💤 Nothing worth remembering in this message')
+        elif decision == 'merge':
+            log('\n🔁 Merging with an existing memory...')
+            manage_memory.invoke(
+                {'action': 'update', 'id': existing_id, 'content': memory_to_store}
+            )
+            memory_filter.record(existing_id, memory_to_store, decision)
+            log(f"Updated memory: {memory_to_store}")
+        else:
+            log('\n💾 Storing new information in memory...')
+            result = manage_memory.invoke({'content': memory_to_store})
+            memory_filter.record(result.split()[-1], memory_to_store, decision)
+            log(f"Stored memory: {memory_to_store}")
+    except Exception as e:
+        log(f"Error storing memory: {e}")
+
 def run_interactive_health_coach():
     print('''I am your AI health coach with memory. I can provide personalized fitness advice.
 I can also remember details about your fitness journey between conversations.
 Type 'exit', 'quit', or 'bye' to end our conversation.''')
+    llm = get_llm()
+    _, search_memory, memory_filter = get_default_tools()
     
     # Init conversation history
     conversation_history = []
@@ -93,6 +251,7 @@ Type 'exit', 'quit', or 'bye' to end our conversation.''')
 
         # Check if user wants to exit
         if user_message.lower() in ['exit', 'quit', 'bye']:
+            print(f'\n\tMemory writes: {memory_filter.report()}')
             print('\nThank you for chatting with your health coach! Stay healthy and keep moving!')
             break
         
@@ -102,99 +261,129 @@ Type 'exit', 'quit', or 'bye' to end our conversation.''')
             # Create a search query based on user input and conversation history
             print('\n\tSearching memory for relevant context...')
             memory_results = search_memory.invoke({'query': user_message})
-            # Parse and pretty-print memory results
-            if memory_results and memory_results != '[]':
-                try:
-                    memory_items = json.loads(memory_results)
-                    if memory_items:
-                        print(f'\tFound {len(memory_items)} relevant memories:')
-                        for i, item in enumerate(memory_items):
-                            if 'value' in item and 'content' in item['value']:
-                                print(f'\t\t• Memory {i+1}: {item["value"]["content"][:100]}...')
-                    else:
-                        print('\tNo relevant memories found.')
-                except:
-                    print(f"⚠️ Memory format: {memory_results[:100]}...")
-            else:
-                print('\tNo relevant memories found.')
+            print_memory_results(memory_results)
         except Exception as e:
             print(f'\tError searching memory: {e}')
 
         # Add to conversation history
         conversation_history.append(user_message)
         
-        # Create context for LLM
-        context = (
-            '\n'.join(conversation_history[-5:])
-            if len(conversation_history) > 5
-            else '\n'.join(conversation_history)
-        )
-        
         # Generate response with context
-        message = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=f'''User message: {user_message}
-
-Previous conversation context: {context}
-
-Memory search results: {memory_results}
-
-Respond to the user with personalized health coaching advice based on their message and any relevant information from memory.
-
-Also, identify if there's new important information about the user that should be stored in memory.
-Don't mention the memory system directly to the user - they should just experience personalized advice.'''
-            )
-        ]
+        message = build_messages(user_message, conversation_history, memory_results)
         
         # Get response from LLM
         print('\n⏳ Thinking...')
         response = llm.invoke(message)
         
         # Process response to extract potential memory updates
-        response_text = response.content
-        memory_to_store = None
-        
-        # Check if the response contains a clear indication of memory content
-        if (
-            'MEMORY:' in response_text
-            or 'STORE IN MEMORY:' in response_text
-            or 'REMEMBER:' in response_text
-        ):
-            try:
-                # Try to extract memory section - assumes model might format its response with a designated memory section
-                for marker in ['MEMORY:', 'STORE IN MEMORY:', 'REMEMBER:']:
-                    if marker in response_text:
-                        parts = response_text.split(marker, 1)
-                        if len(parts) > 1:
-                            memory_section = parts[1].split('\n\n', 1)[0].strip()
-                            response_text = response_text.replace(
-                                marker + memory_section,
-                                ''
-                            ).strip()
-                            memory_to_store = memory_section
-                            break
-
-            except Exception as e:
-                # If extraction fails, create a general memory
-                memory_to_store = f"User message: {user_message}"
-        else:
-            # Create an automatic memory from this interaction
-            memory_to_store = extract_key_information(user_message)
+        response_text, memory_to_store = extract_memory(response.content, user_message)
         
         # Store memory if we have something to store
         if memory_to_store:
-            try:
-                print('\n💾 Storing new information in memory...')
-                manage_memory.invoke({'content': memory_to_store})
-                print(f"Stored memory: {memory_to_store}")
-            except Exception as e:
-                print(f"Error storing memory: {e}")
+            store_memory(memory_to_store)
         
         # Clean up response
         response_text = clean_response(response_text)
         
         # Print response
         print('\nCoach:', response_text)
-        
+
+async def stream_response(message: list):
+    '''
+    Stream the LLM response to the terminal as it is generated.
+    Response prefixes are dropped and printing stops at a memory marker,
+    so the user never sees memory sections. Returns (full text, cleaned text already printed).
+    '''
+    hold = max(len(marker) for marker in RESPONSE_PREFIXES + MEMORY_MARKERS)
+    text, start, printed = '', None, 0
+
+    print('\nCoach: ', end='', flush=True)
+    async for chunk in get_llm().astream(message):
+        text += chunk.content
+        if start is None:
+            # Wait until we know whether the response opens with a prefix
+            if len(text) < hold:
+                continue
+            body = text
+            for prefix in RESPONSE_PREFIXES:
+                if text.startswith(prefix):
+                    body = text[len(prefix):]
+                    break
+            start = printed = len(text) - len(body.lstrip())
+
+        markers = [text.find(marker) for marker in MEMORY_MARKERS if marker in text]
+        cut = min(markers) if markers else len(text) - hold
+        if cut > printed:
+            print(text[printed:cut], end='', flush=True)
+            printed = cut
+
+    return text, text[start or 0:max(printed, start or 0)]
+
+async def run_interactive_health_coach_async():
+    '''
+    Async coach loop: the response is streamed before the memory write finishes,
+    and the next turn's memory search starts while that write may still be in flight.
+    A consistency barrier re-runs the search once the write lands, so no turn misses the prior turn's memory.
+    '''
+    print('''I am your AI health coach with memory. I can provide personalized fitness advice.
+I can also remember details about your fitness journey between conversations.
+Type 'exit', 'quit', or 'bye' to end our conversation.''')
+    _, search_memory, memory_filter = get_default_tools()
+
+    conversation_history = []
+    pending_write = None
+
+    while True:
+        user_message = await asyncio.to_thread(input, '\nYou: ')
+
+        if user_message.lower() in ['exit', 'quit', 'bye']:
+            if pending_write:
+                await pending_write
+            print(f'\n\tMemory writes: {memory_filter.report()}')
+            print('\nThank you for chatting with your health coach! Stay healthy and keep moving!')
+            break
+
+        # Speculative search: don't wait for the previous turn's write
+        memory_results = '[]'
+        write_in_flight = pending_write is not None and not pending_write.done()
+        search = asyncio.create_task(search_memory.ainvoke({'query': user_message}))
+        try:
+            print('\n\tSearching memory for relevant context...')
+            memory_results = await search
+            # Consistency barrier: if the write was still running, the search may have missed it
+            if write_in_flight:
+                await pending_write
+                memory_results = await search_memory.ainvoke({'query': user_message})
+            print_memory_results(memory_results)
+        except Exception as e:
+            print(f'\tError searching memory: {e}')
+
+        conversation_history.append(user_message)
+        message = build_messages(user_message, conversation_history, memory_results)
+
+        full_text, printed = await stream_response(message)
+        response_text, memory_to_store = extract_memory(full_text, user_message)
+        response_text = clean_response(response_text)
+        # Print whatever was held back (text after a memory section, or the tail of the stream)
+        print(response_text[len(printed):] if response_text.startswith(printed) else '', flush=True)
+
+        # Write in the background; writes are chained so they land in order
+        if memory_to_store:
+            previous_write = pending_write
+
+            async def write(memory_to_store=memory_to_store, previous_write=previous_write):
+                if previous_write:
+                    await previous_write
+                await asyncio.to_thread(store_memory, memory_to_store)
+
+            pending_write = asyncio.create_task(write())
+
 if __name__ == '__main__':
-    run_interactive_health_coach()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Health coach with memory')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Stream responses and write memory in the background')
+    args = parser.parse_args()
+
+    if args.use_async:
+        asyncio.run(run_interactive_health_coach_async())
+    else:
+        run_interactive_health_coach()
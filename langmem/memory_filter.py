@@ -0,0 +1,186 @@
+import hashlib
+import re
+from typing import Dict, Optional, Tuple
+
+# Words that carry no lasting information about the user
+CHIT_CHAT = {
+    'hi', 'hello', 'hey', 'thanks', 'thank', 'ok', 'okay', 'cool', 'great', 'nice', 'bye',
+    'lol', 'yes', 'no', 'sure', 'good', 'morning', 'evening', 'awesome', 'cheers', 'yeah',
+}
+
+# Words that usually signal something worth remembering for a health coach
+HEALTH_TERMS = {
+    'weight', 'weigh', 'kg', 'kgs', 'lbs', 'pounds', 'goal', 'goals', 'diet', 'vegetarian', 'vegan',
+    'allergy', 'allergic', 'injury', 'injured', 'pain', 'hurts', 'knee', 'back', 'sleep', 'calories',
+    'protein', 'run', 'running', 'marathon', 'gym', 'workout', 'lift', 'squat', 'swim', 'cycling',
+    'yoga', 'age', 'years', 'height', 'cm', 'bmi', 'medication', 'asthma', 'diabetes', 'lose',
+    'gain', 'muscle', 'fat', 'steps', 'week', 'daily', 'eat', 'meal', 'breakfast', 'dinner',
+}
+
+# Preferences, health and family: first-person statements about these are kept even when short
+PERSONAL_TERMS = {
+    'like', 'love', 'prefer', 'enjoy', 'hate', 'dislike', 'cant', 'never', 'always', 'favorite', 'favourite',
+    'pregnant', 'sick', 'ill', 'surgery', 'condition', 'doctor', 'diagnosed', 'tired', 'stress', 'stressed',
+    'wife', 'husband', 'partner', 'kids', 'child', 'children', 'son', 'daughter', 'baby', 'mother', 'father',
+    'mom', 'dad', 'family',
+}
+FIRST_PERSON = {'i', 'my', 'im', 'me'}
+# Words that don't count towards a personal statement being about something ("I love it")
+FILLER = FIRST_PERSON | {'it', 'this', 'that', 'so', 'is', 'am', 'are', 'a', 'the', 'to', 'you', 'really', 'just'}
+
+def tokenize(text: str):
+    return re.findall(r'[a-z]+|[0-9]+', text.lower())
+
+def strip_prefix(text: str) -> str:
+    for prefix in ('User shared:', 'User message:'):
+        if text.startswith(prefix):
+            return text[len(prefix):].strip()
+    return text
+
+def salience_score(text: str) -> float:
+    '''
+    Cheap local estimate (0..1) of how worth remembering a message is.
+    Rewards health terms, numbers and first-person statements; penalizes chit-chat and bare questions.
+    First-person statements of a preference, health or family fact score at least 0.5.
+    '''
+    tokens = tokenize(strip_prefix(text))
+    if not tokens:
+        return 0.0
+    if is_personal_fact(text):
+        return max(0.5, _base_score(text, tokens))
+    return _base_score(text, tokens)
+
+def is_personal_fact(text: str) -> bool:
+    '''A first-person statement (not a question) of a preference, health or family fact, e.g. "I hate broccoli".'''
+    tokens = tokenize(strip_prefix(text))
+    meaningful = [t for t in tokens if t not in FILLER and t not in CHIT_CHAT]
+    return (
+        not text.rstrip().endswith('?')
+        and bool(FIRST_PERSON & set(tokens))
+        and bool(PERSONAL_TERMS & set(meaningful))
+        and len(meaningful) >= 2
+    )
+
+def _base_score(text: str, tokens) -> float:
+    content_tokens = [t for t in tokens if t not in CHIT_CHAT]
+    score = 0.0
+    score += min(0.5, 0.15 * sum(t in HEALTH_TERMS for t in content_tokens))
+    score += 0.2 if any(t.isdigit() for t in tokens) else 0.0
+    score += 0.2 if FIRST_PERSON & set(tokens) else 0.0
+    score += min(0.2, 0.02 * len(content_tokens))
+    if text.rstrip().endswith('?'):
+        score *= 0.5
+    if len(content_tokens) <= 1:
+        score *= 0.2
+    return min(score, 1.0)
+
+def simhash(text: str, bits: int = 64) -> int:
+    '''SimHash fingerprint over word unigrams and bigrams; similar texts differ in few bits.'''
+    tokens = tokenize(strip_prefix(text))
+    features = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * bits
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=bits // 8).digest(), 'little')
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+# Write-side filter pipeline for the coach's memory tools
+class MemoryWriteFilter:
+    '''
+    Decides what happens to a candidate memory before it reaches the store:
+    - 'skip' when salience is below the threshold (chit-chat),
+    - 'merge' into an existing memory when it is a near-duplicate,
+    - 'store' otherwise.
+    Near-duplicates are found with a SimHash distance prefilter, confirmed by token Jaccard similarity
+    (SimHash alone is noisy on short texts). Fingerprints of the namespace's memories are loaded once
+    and kept in sync by this filter.
+    '''
+    def __init__(
+        self,
+        store,
+        namespace: Tuple[str, ...],
+        salience_threshold: float = 0.3,
+        max_distance: int = 20,
+        min_jaccard: float = 0.6,
+    ):
+        self.store = store
+        self.namespace = namespace
+        self.salience_threshold = salience_threshold
+        self.max_distance = max_distance
+        self.min_jaccard = min_jaccard
+        self.stats = {'stored': 0, 'merged': 0, 'skipped': 0}
+        self._fingerprints: Optional[Dict[str, Tuple[int, set]]] = None
+
+    @staticmethod
+    def _fingerprint(content: str) -> Tuple[int, set]:
+        return simhash(content), set(tokenize(strip_prefix(content)))
+
+    def _load_fingerprints(self) -> Dict[str, Tuple[int, set]]:
+        if self._fingerprints is None:
+            self._fingerprints = {}
+            offset = 0
+            while True:
+                page = self.store.search(self.namespace, limit=500, offset=offset)
+                for item in page:
+                    self._fingerprints[item.key] = self._fingerprint(str(item.value.get('content', '')))
+                if len(page) < 500:
+                    break
+                offset += 500
+        return self._fingerprints
+
+    def find_near_duplicate(self, content: str) -> Optional[str]:
+        '''Key of the most similar existing memory, if any is a near-duplicate.'''
+        fingerprint, tokens = self._fingerprint(content)
+        best_key, best_similarity = None, self.min_jaccard
+        for key, (other_fingerprint, other_tokens) in self._load_fingerprints().items():
+            if hamming_distance(fingerprint, other_fingerprint) > self.max_distance:
+                continue
+            similarity = jaccard(tokens, other_tokens)
+            if similarity >= best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key
+
+    def check(self, content: str, trusted: bool = False) -> Tuple[str, Optional[str]]:
+        '''
+        Classify a candidate memory: returns (decision, existing key to merge into).
+        Trusted memories (explicitly marked by the LLM) skip the salience check but are still deduplicated.
+        '''
+        if not trusted and salience_score(content) < self.salience_threshold:
+            self.stats['skipped'] += 1
+            return 'skip', None
+
+        key = self.find_near_duplicate(content)
+        if key:
+            return 'merge', key
+        return 'store', None
+
+    def record(self, key: str, content: str, decision: str = 'store'):
+        '''
+        Track the fingerprint of a memory that was just stored or merged, and count the write.
+        Call it only once the write succeeded, so the stats match the store.
+        '''
+        self._load_fingerprints()[key] = self._fingerprint(content)
+        self.stats['merged' if decision == 'merge' else 'stored'] += 1
+
+    def forget(self, key: str):
+        self._load_fingerprints().pop(key, None)
+
+    def reset(self):
+        '''Drop cached fingerprints; they are reloaded from the store on next use (e.g. after consolidation).'''
+        self._fingerprints = None
+
+    def report(self) -> str:
+        avoided = self.stats['merged'] + self.stats['skipped']
+        total = avoided + self.stats['stored']
+        return (
+            f'stored={self.stats["stored"]} merged={self.stats["merged"]} skipped={self.stats["skipped"]} '
+            f'(writes avoided: {avoided}/{total})'
+        )
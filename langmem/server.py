@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from aiohttp import ClientSession, WSMsgType, web
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import fitness_coach_agent as coach
+from sqlite_store import SqliteStore, HashEmbedder
+from llm_limiter import get_limiter
+from consolidation import run_consolidation_loop
+
+logger = logging.getLogger('coach.server')
+
+# Stubbed LLM for offline load tests
+class StubCoachLLM(BaseChatModel):
+    '''Returns a canned coaching reply after a fixed delay, so tests measure the server and memory layer.'''
+    latency_ms: float = 50.0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'stub-coach'
+
+    def _reply(self) -> ChatResult:
+        text = 'Nice work! Keep a steady routine: three strength sessions and two easy cardio days this week.'
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return self._reply()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._reply()
+
+
+# Per-user sessions
+class UserSession:
+    '''Namespace-bound memory tools, conversation history and write ordering for one user.'''
+    def __init__(self, user_id: str, store: SqliteStore = None):
+        self.user_id = user_id
+        self.manage_memory, self.search_memory, self.memory_filter = coach.create_user_tools(user_id, store)
+        self.conversation_history = []
+        self.lock = asyncio.Lock()
+        self.active_turns = 0  # running or waiting for the lock
+        self.pending_write: Optional[asyncio.Task] = None
+
+    def busy(self) -> bool:
+        '''A turn or memory write is in flight: evicting now would lose write ordering and dedup state.'''
+        return bool(self.active_turns) or (self.pending_write is not None and not self.pending_write.done())
+
+class SessionCache:
+    '''
+    LRU cache of user sessions: tools are created on demand and evicted when idle.
+    Busy sessions are never evicted; if all are busy the cache runs over capacity until one is idle.
+    '''
+    def __init__(self, capacity: int = 1000, store: SqliteStore = None):
+        self.capacity = capacity
+        self.store = store
+        self._sessions: 'OrderedDict[str, UserSession]' = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, user_id: str) -> UserSession:
+        session = self._sessions.get(user_id)
+        if session:
+            self.stats['hits'] += 1
+            self._sessions.move_to_end(user_id)
+            return session
+
+        self.stats['misses'] += 1
+        session = self._sessions[user_id] = UserSession(user_id, self.store)
+        while len(self._sessions) > self.capacity:
+            idle = next((uid for uid, s in self._sessions.items() if s is not session and not s.busy()), None)
+            if idle is None:
+                break
+            del self._sessions[idle]
+            self.stats['evictions'] += 1
+        return session
+
+    def peek(self, user_id: str) -> Optional[UserSession]:
+        '''Cached session without touching LRU order or stats.'''
+        return self._sessions.get(user_id)
+
+    def pending_writes(self) -> list:
+        return [s.pending_write for s in self._sessions.values() if s.pending_write]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+async def coach_turn(session: UserSession, user_message: str, llm, on_token=None) -> dict:
+    '''
+    One coaching turn for a user: search memory, generate (optionally streamed), then write memory in the background.
+    Turns of the same user are serialized; different users run concurrently.
+    '''
+    session.active_turns += 1
+    try:
+        return await _coach_turn(session, user_message, llm, on_token)
+    finally:
+        session.active_turns -= 1
+
+async def _coach_turn(session: UserSession, user_message: str, llm, on_token=None) -> dict:
+    async with session.lock:
+        # The previous write must land before this turn searches
+        if session.pending_write:
+            try:
+                await session.pending_write
+            except Exception:
+                logger.exception('Memory write failed for %s', session.user_id)
+            session.pending_write = None
+
+        memory_results = await session.search_memory.ainvoke({'query': user_message})
+        session.conversation_history.append(user_message)
+        message = coach.build_messages(user_message, session.conversation_history, memory_results)
+
+        if on_token:
+            text = ''
+            async for chunk in llm.astream(message):
+                text += chunk.content
+                await on_token(chunk.content)
+        else:
+            text = (await llm.ainvoke(message)).content
+
+        response_text, memory_to_store = coach.extract_memory(text, user_message)
+        if memory_to_store:
+            session.pending_write = asyncio.create_task(
+                asyncio.to_thread(
+                    coach.store_memory,
+                    memory_to_store,
+                    session.manage_memory,
+                    session.memory_filter,
+                    logger.debug,
+                )
+            )
+
+    return {'response': coach.clean_response(response_text), 'memories': len(memory_results)}
+
+
+# HTTP / WebSocket app
+def create_app(
+    llm=None, cache_capacity: int = 1000, consolidate_every: float = None, store: SqliteStore = None
+) -> web.Application:
+    '''
+    consolidate_every: run memory consolidation for all users every N seconds in the background.
+    store: memory store for all users (default: the coach's store).
+    A turn that fails (LLM or store error) answers {"error"} with status 500, or {"type": "error"} on the WebSocket.
+    Routes:
+    - POST /chat {"user_id", "message"} -> {"response", "memories"}
+    - GET /ws?user_id=... WebSocket: send a message, receive {"type": "token"} chunks then {"type": "done"}
+    - GET /stats -> session cache and turn counters
+    '''
+    app = web.Application()
+    app['llm'] = llm or coach.get_llm()
+    app['store'] = store or coach.get_store()
+    app['sessions'] = SessionCache(cache_capacity, app['store'])
+    # Mutable, since the app's own mapping is frozen once it starts
+    app['counters'] = {'turns': 0, 'errors': 0}
+
+    async def chat(request: web.Request) -> web.Response:
+        body = await request.json()
+        if not body.get('user_id') or not body.get('message'):
+            return web.json_response({'error': 'user_id and message are required'}, status=400)
+        session = app['sessions'].get(body['user_id'])
+        try:
+            result = await coach_turn(session, body['message'], app['llm'])
+        except Exception as e:
+            logger.exception('Turn failed for %s', body['user_id'])
+            app['counters']['errors'] += 1
+            return web.json_response({'error': f'{type(e).__name__}: {e}'}, status=500)
+        app['counters']['turns'] += 1
+        return web.json_response(result)
+
+    async def websocket(request: web.Request) -> web.WebSocketResponse:
+        user_id = request.query.get('user_id')
+        if not user_id:
+            raise web.HTTPBadRequest(text='user_id is required')
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            session = app['sessions'].get(user_id)
+
+            async def send_token(token: str):
+                await ws.send_json({'type': 'token', 'content': token})
+
+            try:
+                result = await coach_turn(session, msg.data, app['llm'], on_token=send_token)
+            except Exception as e:
+                logger.exception('Turn failed for %s', user_id)
+                app['counters']['errors'] += 1
+                await ws.send_json({'type': 'error', 'error': f'{type(e).__name__}: {e}'})
+                continue
+            app['counters']['turns'] += 1
+            await ws.send_json({'type': 'done', **result})
+        return ws
+
+    async def stats(request: web.Request) -> web.Response:
+        sessions = app['sessions']
+        return web.json_response(
+            {'sessions': len(sessions), **app['counters'], **sessions.stats, 'llm_limiter': get_limiter().stats}
+        )
+
+    async def flush_writes(app: web.Application):
+        await asyncio.gather(*app['sessions'].pending_writes(), return_exceptions=True)
+
+    async def start_consolidation(app: web.Application):
+        def on_consolidated(namespace):
+            # Cached fingerprints point at retired memories; reload them on next write
+            session = app['sessions'].peek(namespace[1])
+            if session:
+                session.memory_filter.reset()
+
+        def in_use(namespace):
+            # Don't rewrite a user's memories while a turn or its memory write is in flight
+            session = app['sessions'].peek(namespace[1])
+            return session is not None and session.busy()
+
+        app['consolidation'] = asyncio.create_task(
+            run_consolidation_loop(app['store'], consolidate_every, on_consolidated=on_consolidated, skip=in_use)
+        )
+
+    async def stop_consolidation(app: web.Application):
+        app['consolidation'].cancel()
+
+    if consolidate_every:
+        app.on_startup.append(start_consolidation)
+        app.on_cleanup.append(stop_consolidation)
+
+    app.router.add_post('/chat', chat)
+    app.router.add_get('/ws', websocket)
+    app.router.add_get('/stats', stats)
+    app.on_shutdown.append(flush_writes)
+    return app
+
+
+def local_store(path: str) -> SqliteStore:
+    '''A store that embeds locally, for runs that make no OpenAI calls.'''
+    return SqliteStore(path, index={'embed': HashEmbedder(dims=256), 'dims': 256, 'fields': ['content']})
+
+
+# Load test
+async def run_load_test(
+    sessions: int = 100,
+    turns: int = 3,
+    concurrency: int = 50,
+    latency_ms: float = 50.0,
+    port: int = 8765,
+):
+    '''
+    Serve the app with a stubbed LLM and drive concurrent user sessions over HTTP.
+    Sessions use a throwaway store with local embeddings, so the test makes no OpenAI calls and never
+    touches the coach's own database.
+    '''
+    scratch = tempfile.TemporaryDirectory()
+    store = local_store(os.path.join(scratch.name, 'load_test.sqlite'))
+    app = create_app(llm=StubCoachLLM(latency_ms=latency_ms), cache_capacity=sessions, store=store)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+
+    messages = [
+        'I weigh 82 kg and want to get to 75 kg',
+        'I run 5 km three times a week',
+        'My knee hurts after long runs',
+        'What should I eat before a workout?',
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def user_session(client: ClientSession, n: int):
+        async with semaphore:
+            for turn in range(turns):
+                start = time.perf_counter()
+                async with client.post(
+                    f'http://127.0.0.1:{port}/chat',
+                    json={'user_id': f'load-user-{n}', 'message': messages[(n + turn) % len(messages)]},
+                ) as response:
+                    await response.json()
+                latencies.append(time.perf_counter() - start)
+
+    print(f'\n🏋️ LOAD TEST: {sessions} sessions x {turns} turns, concurrency {concurrency}, stub LLM {latency_ms:.0f}ms')
+    started = time.perf_counter()
+    async with ClientSession() as client:
+        await asyncio.gather(*(user_session(client, n) for n in range(sessions)))
+        elapsed = time.perf_counter() - started
+        async with client.get(f'http://127.0.0.1:{port}/stats') as response:
+            stats = await response.json()
+    await runner.cleanup()
+    store.close()
+    scratch.cleanup()
+
+    latencies.sort()
+    print(f'\t{sessions / elapsed:.1f} sessions/s, {len(latencies) / elapsed:.1f} turns/s ({elapsed:.2f}s total)')
+    print(f'\tTurn latency p50={latencies[len(latencies) // 2] * 1000:.1f}ms p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms')
+    print(f'\tServer stats: {stats}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multi-user health coach server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.getenv('COACH_PORT', '8080')))
+    parser.add_argument('--cache-size', type=int, default=1000, help='Max user sessions kept in memory')
+    parser.add_argument('--consolidate-every', type=float, help='Consolidate memories every N seconds')
+    parser.add_argument(
+        '--stub-llm', action='store_true',
+        help='Serve with a stubbed LLM and local embeddings in coach_memory_stub.sqlite (no OpenAI calls or key needed)',
+    )
+    parser.add_argument('--load-test', action='store_true', help='Run a local load test with a stubbed LLM')
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    if args.load_test:
+        asyncio.run(run_load_test(args.sessions, args.turns, args.concurrency, args.latency_ms))
+    else:
+        llm, store = None, None
+        if args.stub_llm:
+            # Kept apart from the coach's database, whose vectors come from OpenAI embeddings
+            llm, store = StubCoachLLM(latency_ms=args.latency_ms), local_store('coach_memory_stub.sqlite')
+        web.run_app(create_app(llm, args.cache_size, args.consolidate_every, store), host=args.host, port=args.port)
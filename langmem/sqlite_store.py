@@ -0,0 +1,275 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langgraph.store.base import (
+    BaseStore,
+    GetOp,
+    Item,
+    ListNamespacesOp,
+    PutOp,
+    SearchItem,
+    SearchOp,
+)
+from langgraph.store.base.embed import ensure_embeddings, get_text_at_path, tokenize_path
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'llm_client'))
+from hash_embedder import HashEmbedder
+
+# Durable store for langmem tools
+class SqliteStore(BaseStore):
+    '''
+    SQLite-backed BaseStore usable by create_manage_memory_tool / create_search_memory_tool.
+    - Every namespace gets its own table, so a search only touches the user's partition.
+    - Vectors are computed once on put and kept as float32 blobs next to the value;
+      on startup they are read back from disk, never re-embedded.
+    - Search loads a namespace's vectors into a numpy matrix that stays cached until the next write.
+    - Texts and queries are embedded before the store lock is taken, so one user's embedding call
+      never holds up other users' reads and writes.
+    - The vector dims are recorded in the database; opening it with embeddings of other dims is an error.
+
+    index: {'embed': Embeddings or provider string, 'dims': int, 'fields': ['content']}
+    '''
+    def __init__(self, path: str = 'coach_memory.sqlite', index: Optional[dict] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS namespaces '
+            '(id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT UNIQUE NOT NULL)'
+        )
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.commit()
+        self._tables: Dict[Tuple[str, ...], str] = {
+            tuple(json.loads(namespace)): f'items_{table_id}'
+            for table_id, namespace in self._conn.execute('SELECT id, namespace FROM namespaces')
+        }
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+
+        self.index_config = index
+        self.embeddings = ensure_embeddings(index['embed']) if index else None
+        self._fields = [
+            (field, tokenize_path(field)) for field in ((index or {}).get('fields') or ['$'])
+        ]
+        self.dims = index.get('dims') if index else None
+        if self.dims:
+            self._check_dims()
+
+    def _check_dims(self):
+        '''Record the vector dims on first use; refuse a database whose vectors have other dims.'''
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dims'").fetchone()
+        stored = int(row[0]) if row else None
+        if stored is None:
+            # Databases from before dims were recorded: infer them from any stored vector
+            for table in self._tables.values():
+                blob = self._conn.execute(f'SELECT vector FROM {table} WHERE vector IS NOT NULL LIMIT 1').fetchone()
+                if blob:
+                    stored = len(blob[0]) // np.dtype(np.float32).itemsize
+                    break
+        if stored is not None and stored != self.dims:
+            raise ValueError(
+                f'{self.path} holds {stored}-dim vectors, but the index is configured for {self.dims} dims '
+                '(use the embeddings it was built with, or another database path)'
+            )
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dims', ?)", (str(self.dims),))
+        self._conn.commit()
+
+    # Namespace partitions
+
+    def _table(self, namespace: Tuple[str, ...], create: bool = False) -> Optional[str]:
+        table = self._tables.get(namespace)
+        if table or not create:
+            return table
+        cursor = self._conn.execute(
+            'INSERT INTO namespaces (namespace) VALUES (?)', (json.dumps(list(namespace)),)
+        )
+        table = f'items_{cursor.lastrowid}'
+        self._conn.execute(
+            f'CREATE TABLE {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'created_at TEXT NOT NULL, updated_at TEXT NOT NULL, vector BLOB)'
+        )
+        self._tables[namespace] = table
+        return table
+
+    def _tables_under(self, prefix: Tuple[str, ...]) -> List[Tuple[Tuple[str, ...], str]]:
+        return [
+            (namespace, table)
+            for namespace, table in self._tables.items()
+            if namespace[:len(prefix)] == prefix
+        ]
+
+    # Embedding
+
+    def _text_for(self, value: dict, index: Any) -> Optional[str]:
+        '''Text to embed for a value, or None when it should not be indexed.'''
+        if not self.embeddings or index is False:
+            return None
+        fields = self._fields if index is None else [(field, tokenize_path(field)) for field in index]
+        texts = []
+        for path, tokens in fields:
+            if path == '$':
+                texts.append(json.dumps(value, ensure_ascii=False))
+            else:
+                texts.extend(get_text_at_path(value, tokens))
+        return '\n'.join(texts) or None
+
+    def _matrix(self, table: str) -> Tuple[List[str], np.ndarray]:
+        '''Keys and stacked vectors of one namespace (cached until the next write to it).'''
+        cached = self._matrices.get(table)
+        if cached is None:
+            rows = self._conn.execute(
+                f'SELECT key, vector FROM {table} WHERE vector IS NOT NULL'
+            ).fetchall()
+            keys = [key for key, _ in rows]
+            vectors = (
+                np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                if rows else np.zeros((0, 0), dtype=np.float32)
+            )
+            cached = self._matrices[table] = (keys, vectors)
+        return cached
+
+    # Operations
+
+    def _item(self, namespace, row, cls=Item, **extra):
+        key, value, created_at, updated_at = row[:4]
+        return cls(
+            namespace=namespace,
+            key=key,
+            value=json.loads(value),
+            created_at=datetime.fromisoformat(created_at),
+            updated_at=datetime.fromisoformat(updated_at),
+            **extra,
+        )
+
+    def _get(self, op: GetOp) -> Optional[Item]:
+        table = self._table(op.namespace)
+        if not table:
+            return None
+        row = self._conn.execute(
+            f'SELECT key, value, created_at, updated_at FROM {table} WHERE key = ?', (op.key,)
+        ).fetchone()
+        return self._item(op.namespace, row) if row else None
+
+    def _embed_puts(self, ops: List[PutOp]) -> Dict[int, List[float]]:
+        '''Vectors of the put values that are indexed, by position in ops (one embedding call).'''
+        texts = {}
+        for i, op in enumerate(ops):
+            if op.value is not None:
+                text = self._text_for(op.value, op.index)
+                if text:
+                    texts[i] = text
+        if not texts:
+            return {}
+        vectors = dict(zip(texts, self.embeddings.embed_documents(list(texts.values()))))
+        for vector in vectors.values():
+            if self.dims and len(vector) != self.dims:
+                raise ValueError(f'Embeddings returned {len(vector)} dims, the index is configured for {self.dims}')
+        return vectors
+
+    def _embed_query(self, op: SearchOp) -> Optional[np.ndarray]:
+        if not (op.query and self.embeddings):
+            return None
+        query_vector = np.asarray(self.embeddings.embed_query(op.query), dtype=np.float32)
+        if self.dims and len(query_vector) != self.dims:
+            raise ValueError(f'Embeddings returned {len(query_vector)} dims, the index is configured for {self.dims}')
+        return query_vector
+
+    def _put_many(self, ops: List[PutOp], vectors: Dict[int, List[float]]):
+        now = datetime.now(timezone.utc).isoformat()
+        for i, op in enumerate(ops):
+            table = self._table(op.namespace, create=op.value is not None)
+            if not table:
+                continue
+            self._matrices.pop(table, None)
+            if op.value is None:
+                self._conn.execute(f'DELETE FROM {table} WHERE key = ?', (op.key,))
+                continue
+            vector = vectors.get(i)
+            blob = np.asarray(vector, dtype=np.float32).tobytes() if vector is not None else None
+            self._conn.execute(
+                f'INSERT INTO {table} (key, value, created_at, updated_at, vector) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, '
+                'updated_at = excluded.updated_at, vector = excluded.vector',
+                (op.key, json.dumps(op.value, ensure_ascii=False), now, now, blob),
+            )
+        self._conn.commit()
+
+    def _search(self, op: SearchOp, query_vector: Optional[np.ndarray]) -> List[SearchItem]:
+        candidates = []
+        for namespace, table in self._tables_under(op.namespace_prefix):
+            rows = self._conn.execute(
+                f'SELECT key, value, created_at, updated_at FROM {table} ORDER BY updated_at DESC'
+            ).fetchall()
+            if op.filter:
+                rows = [
+                    row for row in rows
+                    if all(json.loads(row[1]).get(k) == v for k, v in op.filter.items())
+                ]
+            scores = {}
+            if query_vector is not None and rows:
+                keys, vectors = self._matrix(table)
+                if len(keys):
+                    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+                    similarities = vectors @ query_vector / np.where(norms == 0, 1.0, norms)
+                    scores = dict(zip(keys, similarities.tolist()))
+            candidates.extend((scores.get(row[0]), namespace, row) for row in rows)
+
+        if query_vector is not None:
+            # Scored items first (best match first), unscored items after
+            candidates.sort(key=lambda c: (c[0] is None, -(c[0] or 0.0)))
+
+        page = candidates[op.offset:op.offset + op.limit]
+        return [self._item(namespace, row, SearchItem, score=score) for score, namespace, row in page]
+
+    def _list_namespaces(self, op: ListNamespacesOp) -> List[Tuple[str, ...]]:
+        def matches(namespace, condition):
+            path = condition.path
+            if len(namespace) < len(path):
+                return False
+            part = namespace[:len(path)] if condition.match_type == 'prefix' else namespace[-len(path):]
+            return all(p == '*' or p == n for n, p in zip(part, path))
+
+        namespaces = [
+            namespace for namespace in self._tables
+            if all(matches(namespace, condition) for condition in (op.match_conditions or ()))
+        ]
+        if op.max_depth is not None:
+            namespaces = {namespace[:op.max_depth] for namespace in namespaces}
+        return sorted(namespaces)[op.offset:op.offset + op.limit]
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        ops = list(ops)
+        for op in ops:
+            if not isinstance(op, (GetOp, SearchOp, ListNamespacesOp, PutOp)):
+                raise ValueError(f'Unknown operation type: {type(op)}')
+        results: List[Any] = [None] * len(ops)
+
+        # Embed outside the lock (embedding may be a network round trip); writes share one call
+        puts = [op for op in ops if isinstance(op, PutOp)]
+        put_vectors = self._embed_puts(puts)
+        query_vectors = {i: self._embed_query(op) for i, op in enumerate(ops) if isinstance(op, SearchOp)}
+
+        with self._lock:
+            for i, op in enumerate(ops):
+                if isinstance(op, GetOp):
+                    results[i] = self._get(op)
+                elif isinstance(op, SearchOp):
+                    results[i] = self._search(op, query_vectors[i])
+                elif isinstance(op, ListNamespacesOp):
+                    results[i] = self._list_namespaces(op)
+            if puts:
+                self._put_many(puts, put_vectors)
+        return results
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.batch, list(ops))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
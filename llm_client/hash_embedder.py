@@ -0,0 +1,31 @@
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+def hash_embedding(text: str, dims: int) -> np.ndarray:
+    '''
+    Feature-hashed unit vector of a text's word unigrams and bigrams, so similar texts get similar vectors.
+    Each feature adds +1 or -1 to one of dims buckets; a text with no words gives the zero vector.
+    '''
+    vector = np.zeros(dims, dtype=np.float32)
+    tokens = re.findall(r'\w+', text.lower())
+    for feature in tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]:
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+        vector[int.from_bytes(digest[:4], 'little') % dims] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+# Local embedder (no network)
+class HashEmbedder(Embeddings):
+    '''Deterministic local stand-in for a real embedding model, built on hash_embedding.'''
+    def __init__(self, dims: int = 256):
+        self.dims = dims
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [hash_embedding(text, self.dims).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return hash_embedding(text, self.dims).tolist()
@@ -0,0 +1,539 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Requests that count against the provider's limits (everything else passes straight through)
+LIMITED_PATHS = ('/chat/completions', '/completions', '/embeddings', '/responses')
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}  # signals that shrink the concurrency limit
+
+def estimate_tokens(body: bytes) -> int:
+    '''Tokens a request will use before the response says so: ~4 characters per prompt token, plus max_tokens.'''
+    try:
+        payload = json.loads(body or b'{}')
+    except ValueError:
+        return 1
+    if 'input' in payload:
+        prompt = payload['input']
+        return max(1, len(json.dumps(prompt)) // 4)
+    prompt_tokens = len(json.dumps(payload.get('messages', payload.get('prompt', '')))) // 4
+    return max(1, prompt_tokens + (payload.get('max_completion_tokens') or payload.get('max_tokens') or 256))
+
+def response_tokens(response: httpx.Response) -> Optional[int]:
+    '''Actual total tokens from a non-streamed response's usage block.'''
+    try:
+        return response.json()['usage']['total_tokens']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+# Building blocks
+class TokenBucket:
+    '''
+    Reservation-style token bucket: reserve() takes the tokens immediately (the balance may go negative)
+    and returns how long the caller must wait before using them, so waiters are served in arrival order.
+    '''
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.burst)
+            return max(0.0, -self.tokens / self.rate)
+
+    def try_reserve(self, amount: float) -> bool:
+        '''Take the tokens only if they are available right now.'''
+        if not self.rate:
+            return True
+        with self._lock:
+            self._refill()
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+
+    def adjust(self, amount: float):
+        '''Charge (or refund, if negative) the difference between estimated and actual usage.'''
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.burst, self.tokens - amount)
+
+class AIMDConcurrency:
+    '''
+    Adaptive concurrency limit: grows by about one slot per limit's worth of successful requests (additive increase)
+    and halves when the provider signals overload (multiplicative decrease), at most once per cooldown,
+    so one burst of 429s from requests already in flight counts as a single signal.
+    '''
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64, decrease: float = 0.5, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, overloaded: bool = False, succeeded: bool = True):
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            elif succeeded:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+# Shared limiter
+class LLMLimiter:
+    '''
+    One limiter for every LLM and embedding call in the process:
+    - token buckets on requests and tokens per minute (token use is estimated up front, corrected from `usage`)
+    - AIMD concurrency limit, shrunk on 429/503 and grown on success
+    - retries of 429/5xx and transport errors with full-jitter exponential backoff (honouring retry-after)
+    - hedging: a non-streamed request still running after the recent p{hedge_percentile} latency is sent again
+      and the first response wins, for at most hedge_max_fraction of requests
+    '''
+    def __init__(
+        self,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200_000,
+        initial_concurrency: int = 8,
+        max_concurrency: int = 64,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 20.0,
+        hedge_percentile: float = 95,
+        hedge_max_fraction: float = 0.05,
+        hedge_min_samples: int = 20,
+    ):
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60))
+        self.tokens = TokenBucket(tokens_per_minute / 60, max(1.0, tokens_per_minute / 60))
+        self.concurrency = AIMDConcurrency(initial_concurrency, 1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_fraction = hedge_max_fraction
+        self.hedge_min_samples = hedge_min_samples
+        self.stats = {
+            'requests': 0, 'retries': 0, 'throttled': 0, 'errors': 0, 'hedges': 0, 'hedge_wins': 0,
+            'rate_wait_seconds': 0.0, 'queue_wait_seconds': 0.0, 'backoff_seconds': 0.0,
+        }
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, amount: float = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def rate_delay(self, estimated_tokens: int) -> float:
+        '''Reserve one request and the estimated tokens; the delay before they are available.'''
+        delay = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        self._count('requests')
+        self._count('rate_wait_seconds', delay)
+        return delay
+
+    def backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        '''Delay before retrying; the retry reserves its own request from the bucket, so retries respect the rate too.'''
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            delay = float(retry_after) if retry_after else random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        except ValueError:
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        self._count('retries')
+        self._count('backoff_seconds', delay)
+        return max(delay, self.requests.reserve(1))
+
+    def record(self, response: Optional[httpx.Response], latency: float):
+        if response is not None and response.status_code == 429:
+            self._count('throttled')
+        elif response is None or response.status_code >= 400:
+            self._count('errors')
+        else:
+            with self._lock:
+                self._latencies.append(latency)
+
+    def try_reserve_hedge(self, estimated_tokens: int) -> bool:
+        '''Take one request and the estimated tokens for a hedge, only if both are available right now.'''
+        if not self.requests.try_reserve(1):
+            return False
+        if not self.tokens.try_reserve(estimated_tokens):
+            self.requests.adjust(-1)
+            return False
+        self._count('hedges')
+        return True
+
+    def hedge_delay(self) -> Optional[float]:
+        '''Seconds to wait before hedging a request, or None when hedging is off or the budget is spent.'''
+        with self._lock:
+            if not self.hedge_max_fraction or len(self._latencies) < self.hedge_min_samples:
+                return None
+            if self.stats['hedges'] >= self.hedge_max_fraction * self.stats['requests']:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+
+    def report(self) -> str:
+        s = self.stats
+        return (
+            f'requests={s["requests"]} throttled(429)={s["throttled"]} retries={s["retries"]} errors={s["errors"]} '
+            f'hedges={s["hedges"]} (won {s["hedge_wins"]}) concurrency={self.concurrency.in_flight}/{int(self.concurrency.limit)} '
+            f'throttle time: rate={s["rate_wait_seconds"]:.1f}s queue={s["queue_wait_seconds"]:.1f}s backoff={s["backoff_seconds"]:.1f}s'
+        )
+
+
+def _is_limited(request: httpx.Request) -> bool:
+    return request.method == 'POST' and request.url.path.endswith(LIMITED_PATHS)
+
+def _is_streamed(body: bytes) -> bool:
+    return b'"stream": true' in body or b'"stream":true' in body
+
+
+# httpx transports: the limiter sits under the OpenAI SDK, so every client built on it is covered
+class _ReleasingStream(httpx.SyncByteStream):
+    '''Holds the concurrency slot until a (possibly streamed) response body is closed.'''
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+class RateLimitedTransport(httpx.BaseTransport):
+    def __init__(self, limiter: LLMLimiter, transport: httpx.BaseTransport = None):
+        self.limiter = limiter
+        self.transport = transport or httpx.HTTPTransport()
+        self._hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm-hedge')
+
+    def _send(self, request: httpx.Request, streamed: bool, estimated: int) -> httpx.Response:
+        delay = None if streamed else self.limiter.hedge_delay()
+        if delay is None:
+            return self.transport.handle_request(request)
+
+        primary = self._hedge_executor.submit(self.transport.handle_request, request)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.limiter.try_reserve_hedge(estimated):
+            return primary.result()
+        hedge = self._hedge_executor.submit(self.transport.handle_request, request)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        winner = next(iter(done))
+        loser = hedge if winner is primary else primary
+        loser.add_done_callback(lambda f: f.exception() is None and f.result().close())
+        if winner is hedge:
+            self.limiter._count('hedge_wins')
+        return winner.result()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not _is_limited(request):
+            return self.transport.handle_request(request)
+
+        body = request.read()
+        estimated = estimate_tokens(body)
+        streamed = _is_streamed(body)
+        time.sleep(self.limiter.rate_delay(estimated))
+
+        start = time.monotonic()
+        self.limiter.concurrency.acquire()
+        self.limiter._count('queue_wait_seconds', time.monotonic() - start)
+
+        response, overloaded = None, False
+        try:
+            for attempt in range(self.limiter.max_retries + 1):
+                start = time.monotonic()
+                try:
+                    response = self._send(request, streamed, estimated)
+                except httpx.TransportError as e:
+                    self.limiter.record(None, time.monotonic() - start)
+                    overloaded = overloaded or isinstance(e, httpx.TimeoutException)
+                    if attempt == self.limiter.max_retries:
+                        raise
+                    time.sleep(self.limiter.backoff(attempt))
+                    continue
+                self.limiter.record(response, time.monotonic() - start)
+                overloaded = overloaded or response.status_code in OVERLOAD_STATUS
+                if response.status_code not in RETRYABLE_STATUS or attempt == self.limiter.max_retries:
+                    break
+                response.read()
+                response.close()
+                time.sleep(self.limiter.backoff(attempt, response))
+
+            succeeded = response.status_code < 400
+            if succeeded and not streamed:
+                response.read()
+                actual = response_tokens(response)
+                if actual is not None:
+                    self.limiter.tokens.adjust(actual - estimated)
+        except BaseException:
+            # Give the slot back whatever fails (including a cancelled or failed body read)
+            self.limiter.concurrency.release(overloaded=overloaded, succeeded=False)
+            if response is not None:
+                response.close()
+            raise
+
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                self.limiter.concurrency.release(overloaded=overloaded, succeeded=succeeded)
+
+        if response.is_stream_consumed:
+            release()
+            return response
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    def close(self):
+        self._hedge_executor.shutdown(wait=False)
+        self.transport.close()
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    '''Async twin of RateLimitedTransport, sharing the same limiter (waits poll for a free slot).'''
+    def __init__(self, limiter: LLMLimiter, transport: httpx.AsyncBaseTransport = None):
+        self.limiter = limiter
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def _send(self, request: httpx.Request, streamed: bool, estimated: int) -> httpx.Response:
+        delay = None if streamed else self.limiter.hedge_delay()
+        if delay is None:
+            return await self.transport.handle_async_request(request)
+
+        def discard(f):
+            # Close the response of a request whose result nobody will read
+            if not f.cancelled() and f.exception() is None:
+                asyncio.ensure_future(f.result().aclose())
+
+        primary = asyncio.ensure_future(self.transport.handle_async_request(request))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or not self.limiter.try_reserve_hedge(estimated):
+                return await primary
+            hedge = asyncio.ensure_future(self.transport.handle_async_request(request))
+            done, _ = await asyncio.wait([primary, hedge], return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            # The caller was cancelled while waiting: neither request may outlive it
+            for future in (primary, hedge):
+                if future is not None:
+                    future.cancel()
+                    future.add_done_callback(discard)
+            raise
+        winner = next(iter(done))
+        loser = hedge if winner is primary else primary
+        loser.add_done_callback(discard)
+        if winner is hedge:
+            self.limiter._count('hedge_wins')
+        return winner.result()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not _is_limited(request):
+            return await self.transport.handle_async_request(request)
+
+        body = await request.aread()
+        estimated = estimate_tokens(body)
+        streamed = _is_streamed(body)
+        await asyncio.sleep(self.limiter.rate_delay(estimated))
+
+        start = time.monotonic()
+        poll = 0.002
+        while not self.limiter.concurrency.try_acquire():
+            await asyncio.sleep(poll)
+            poll = min(poll * 2, 0.05)
+        self.limiter._count('queue_wait_seconds', time.monotonic() - start)
+
+        response, overloaded = None, False
+        try:
+            for attempt in range(self.limiter.max_retries + 1):
+                start = time.monotonic()
+                try:
+                    response = await self._send(request, streamed, estimated)
+                except httpx.TransportError as e:
+                    self.limiter.record(None, time.monotonic() - start)
+                    overloaded = overloaded or isinstance(e, httpx.TimeoutException)
+                    if attempt == self.limiter.max_retries:
+                        raise
+                    await asyncio.sleep(self.limiter.backoff(attempt))
+                    continue
+                self.limiter.record(response, time.monotonic() - start)
+                overloaded = overloaded or response.status_code in OVERLOAD_STATUS
+                if response.status_code not in RETRYABLE_STATUS or attempt == self.limiter.max_retries:
+                    break
+                await response.aread()
+                await response.aclose()
+                await asyncio.sleep(self.limiter.backoff(attempt, response))
+
+            succeeded = response.status_code < 400
+            if succeeded and not streamed:
+                await response.aread()
+                actual = response_tokens(response)
+                if actual is not None:
+                    self.limiter.tokens.adjust(actual - estimated)
+        except BaseException:
+            # Give the slot back whatever fails (including a cancelled or failed body read)
+            self.limiter.concurrency.release(overloaded=overloaded, succeeded=False)
+            if response is not None:
+                asyncio.ensure_future(response.aclose())
+            raise
+
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                self.limiter.concurrency.release(overloaded=overloaded, succeeded=succeeded)
+
+        if response.is_stream_consumed:
+            release()
+            return response
+        response.stream = _AsyncReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+# Process-wide limiter and clients built on it
+_limiter: Optional[LLMLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_limiter() -> LLMLimiter:
+    '''The process-wide limiter, configured from LLM_RPM, LLM_TPM, LLM_CONCURRENCY, LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES and LLM_HEDGE_FRACTION.'''
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = LLMLimiter(
+                requests_per_minute=float(os.getenv('LLM_RPM', '500')),
+                tokens_per_minute=float(os.getenv('LLM_TPM', '200000')),
+                initial_concurrency=int(os.getenv('LLM_CONCURRENCY', '8')),
+                max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '64')),
+                max_retries=int(os.getenv('LLM_MAX_RETRIES', '4')),
+                hedge_max_fraction=float(os.getenv('LLM_HEDGE_FRACTION', '0.05')),
+            )
+        return _limiter
+
+def limited_http_client(limiter: LLMLimiter = None, limits: httpx.Limits = None, timeout: float = 60.0, **kwargs) -> httpx.Client:
+    '''Keep-alive httpx client whose LLM/embedding requests go through the (shared) limiter.
+    Pair it with max_retries=0 on the SDK client: the limiter does the retrying.'''
+    transport = httpx.HTTPTransport(limits=limits or httpx.Limits(max_connections=64, max_keepalive_connections=20))
+    return httpx.Client(transport=RateLimitedTransport(limiter or get_limiter(), transport), timeout=timeout, **kwargs)
+
+def limited_async_http_client(limiter: LLMLimiter = None, limits: httpx.Limits = None, timeout: float = 60.0, **kwargs) -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(limits=limits or httpx.Limits(max_connections=64, max_keepalive_connections=20))
+    return httpx.AsyncClient(transport=AsyncRateLimitedTransport(limiter or get_limiter(), transport), timeout=timeout, **kwargs)
+
+def limit_mem0(memory, http_client: httpx.Client):
+    '''Route mem0's own OpenAI clients (LLM and embedder) through a limited http client.'''
+    for component in (getattr(memory, 'llm', None), getattr(memory, 'embedding_model', None)):
+        client = getattr(component, 'client', None)
+        if client is not None and hasattr(client, 'with_options'):
+            component.client = client.with_options(http_client=http_client, max_retries=0)
+
+
+# Load test against the mock server (mock_llm/server.py) or any OpenAI-compatible endpoint
+def run_load_test(base_url: str, requests: int, concurrency: int, requests_per_minute: float, limited: bool):
+    from openai import OpenAI
+
+    limiter = LLMLimiter(requests_per_minute=requests_per_minute, initial_concurrency=min(8, concurrency))
+    client = (
+        OpenAI(base_url=base_url, api_key='mock', http_client=limited_http_client(limiter), max_retries=0)
+        if limited else OpenAI(base_url=base_url, api_key='mock', max_retries=2)
+    )
+
+    def call(i):
+        start = time.perf_counter()
+        try:
+            client.chat.completions.create(model='gpt-4o-mini', messages=[{'role': 'user', 'content': f'request {i}'}], max_tokens=32)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, type(e).__name__
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for latency, _ in results)
+    failures = sum(1 for _, error in results if error)
+    label = 'shared limiter' if limited else 'SDK retries only'
+    print(
+        f'\t{label:<18} {failures:>8} {latencies[len(latencies) // 2] * 1000:>8.0f} '
+        f'{latencies[int(len(latencies) * 0.99) - 1] * 1000:>8.0f} {requests / elapsed:>7.1f}'
+    )
+    if limited:
+        print(f'\t\t{limiter.report()}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the shared LLM limiter against an OpenAI-compatible server')
+    parser.add_argument('--base-url', default=os.getenv('MOCK_LLM_URL', 'http://127.0.0.1:8900/v1'))
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--rpm', type=float, default=3000, help='Requests per minute allowed by the limiter')
+    args = parser.parse_args()
+
+    print(f'\n🚦 LLM LIMITER LOAD TEST: {args.requests} requests, {args.concurrency} callers, {args.rpm:.0f} rpm, {args.base_url}')
+    print(f'\t{"mode":<18} {"failures":>8} {"p50 ms":>8} {"p99 ms":>8} {"req/s":>7}')
+    run_load_test(args.base_url, args.requests, args.concurrency, args.rpm, limited=False)
+    run_load_test(args.base_url, args.requests, args.concurrency, args.rpm, limited=True)
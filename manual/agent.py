@@ -1,29 +1,48 @@
 import os
+import sys
 from dotenv import load_dotenv
 from typing import List, Optional
 from openai import OpenAI
 
 from memory import Memory
 
+# Shared LLM rate limiter, retries and hedging (llm_client/llm_limiter.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'llm_client'))
+from llm_limiter import limited_http_client
+
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# LLM_PROVIDER=mock points the agent at the local mock server (mock_llm/server.py)
+LLM_BASE_URL = None
+if os.getenv('LLM_PROVIDER') == 'mock':
+    LLM_BASE_URL = os.getenv('MOCK_LLM_URL', 'http://127.0.0.1:8900/v1')
+    OPENAI_API_KEY = OPENAI_API_KEY or 'mock'
+
+# MEMORY_SOCKET shares one in-RAM Memory across agent workers via memory_server.py
+MEMORY_SOCKET = os.getenv('MEMORY_SOCKET')
+
 class MemoryAgent:
     def __init__(
         self,
         api_key: str = OPENAI_API_KEY,
         model_name: str = 'gpt-4o-mini',
-        memory_dir: str = './agent_memory'
+        memory_dir: str = './agent_memory',
+        memory_socket: Optional[str] = MEMORY_SOCKET
     ):
-        self.memory = Memory(storage_dir=memory_dir)
-        # Add some initial facts about the agent
-        self.memory.add_fact('I am an AI assistant with memory capabilities.')
-        self.memory.add_fact('I can remmeber user interactions and recall them later.')
-        self.memory.add_fact('I can store and retrieve factual information.')
-        self.memory.add_fact('I can rememeber and execute procedures and workflows.')
+        if memory_socket:
+            from memory_server import RemoteMemory
+            self.memory = RemoteMemory(memory_socket)
+        else:
+            self.memory = Memory(storage_dir=memory_dir)
+        # Add some initial facts about the agent (once: the store may be shared, or persisted from earlier runs)
+        self.memory.add_fact('I am an AI assistant with memory capabilities.', unique=True)
+        self.memory.add_fact('I can remmeber user interactions and recall them later.', unique=True)
+        self.memory.add_fact('I can store and retrieve factual information.', unique=True)
+        self.memory.add_fact('I can rememeber and execute procedures and workflows.', unique=True)
         
-        self.client = OpenAI(api_key=api_key)
+        self.client = OpenAI(api_key=api_key, base_url=LLM_BASE_URL, http_client=limited_http_client(), max_retries=0)
         self.model_name = model_name
         self.system_prompt = '''You are a helpful AI assistant with memory capabilities. You can remember past interactions, 
 facts you've learned, and procedures you know. Use the provided context to give personalized, 
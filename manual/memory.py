@@ -1,17 +1,203 @@
 import json
 import os
+import re
+import math
+import heapq
 import datetime
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Callable
 from dotenv import load_dotenv
 
+from snapshot import FACT_SCHEMA, CONVERSATION_SCHEMA, SnapshotRecords, load_snapshot, snapshot_path, write_snapshot
+
 load_dotenv()
 
+# 'keyword': count of query terms found as substrings (full scan)
+# 'term': count of query terms found as whole words (inverted index)
+# 'bm25': BM25-weighted whole-word match (inverted index)
+SEARCH_MODES = ('keyword', 'term', 'bm25')
+# 'recent' (conversations only): BM25 times a recency decay over time-partitioned indexes
+CONVERSATION_SEARCH_MODES = SEARCH_MODES + ('recent',)
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class InvertedIndex:
+    '''
+    Term -> {record position: term frequency} over one memory store, used by the 'term' and 'bm25' search modes.
+    Built lazily on the first indexed search and extended incrementally as records are appended;
+    rebuilt if the store was changed in any other way.
+    '''
+    def __init__(self, text_of: Callable[[Dict[str, Any]], str], k1: float = 1.2, b: float = 0.75):
+        self.text_of = text_of
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: List[int] = []
+        self.total_length = 0
+        self._last = None
+
+    def sync(self, records: List[Dict[str, Any]]):
+        '''Bring the index up to date with the store.'''
+        indexed = len(self.lengths)
+        if len(records) < indexed or (indexed and records[indexed - 1] is not self._last):
+            self.postings, self.lengths, self.total_length = {}, [], 0
+            indexed = 0
+        for position in range(indexed, len(records)):
+            terms = tokenize(self.text_of(records[position]))
+            for term in terms:
+                postings = self.postings.setdefault(term, {})
+                postings[position] = postings.get(position, 0) + 1
+            self.lengths.append(len(terms))
+            self.total_length += len(terms)
+        self._last = records[-1] if records else None
+
+    def search(self, query: str, limit: int, bm25: bool = False) -> List[int]:
+        '''Positions of the best-matching records, best first.'''
+        count = len(self.lengths)
+        if not count:
+            return []
+        terms = [term for term in set(tokenize(query)) if term in self.postings]
+        if bm25:
+            idfs = {
+                term: math.log(1 + (count - len(self.postings[term]) + 0.5) / (len(self.postings[term]) + 0.5))
+                for term in terms
+            }
+            scores = self.bm25_scores(idfs, self.total_length / count or 1)
+        else:
+            scores = defaultdict(int)
+            for term in terms:
+                for position in self.postings[term]:
+                    scores[position] += 1
+        return [position for position, _ in heapq.nlargest(limit, scores.items(), key=lambda x: x[1])]
+
+    def bm25_scores(self, idfs: Dict[str, float], average_length: float) -> Dict[int, float]:
+        '''BM25 score of every record matching a term of idfs (idf and average length are the caller's, e.g. store-wide).'''
+        scores = defaultdict(float)
+        for term, idf in idfs.items():
+            for position, frequency in self.postings.get(term, {}).items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / average_length)
+                scores[position] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def size_bytes(self) -> int:
+        '''Estimated size of a compact encoding: term bytes, 8 bytes per posting (position + frequency), 4 per length.'''
+        return sum(len(term.encode()) + 8 * len(postings) for term, postings in self.postings.items()) + 4 * len(self.lengths)
+
+class PartitionedIndex:
+    '''
+    Episodic index split into time partitions (per day or ISO week), each with its own InvertedIndex,
+    used by the 'recent' conversation search mode.
+    A record scores BM25 (store-wide idf) times a recency decay that halves every half_life_days, measured back
+    from the newest record. Partitions are searched newest first, and the search stops once a partition's best
+    possible score (every query term saturated, at the partition's newest decay) can't enter the top-k.
+    '''
+    def __init__(
+        self, text_of: Callable[[Dict[str, Any]], str], granularity: str = 'week', half_life_days: float = 7.0,
+        k1: float = 1.2, b: float = 0.75
+    ):
+        if granularity not in ('day', 'week'):
+            raise ValueError(f'Unknown partition granularity {granularity!r}, expected \'day\' or \'week\'')
+        self.text_of = text_of
+        self.granularity = granularity
+        self.half_life_days = half_life_days
+        self.k1 = k1
+        self.b = b
+        self._reset()
+
+    def _reset(self):
+        self.partitions: Dict[str, Dict[str, Any]] = {}
+        self.ordered: List[Dict[str, Any]] = []  # newest first
+        self.times: List[float] = []
+        self.document_frequency: Dict[str, int] = defaultdict(int)
+        self.total_length = 0
+        self.newest = 0.0
+        self.partitions_searched = 0  # by the last search
+        self._last = None
+
+    def partition_key(self, moment: datetime.datetime) -> str:
+        if self.granularity == 'day':
+            return moment.date().isoformat()
+        year, week, _ = moment.isocalendar()
+        return f'{year}-W{week:02d}'
+
+    def sync(self, records: List[Dict[str, Any]]):
+        '''Bring the partitions up to date with the store.'''
+        indexed = len(self.times)
+        if len(records) < indexed or (indexed and records[indexed - 1] is not self._last):
+            self._reset()
+            indexed = 0
+        touched = set()
+        for position in range(indexed, len(records)):
+            record = records[position]
+            moment = datetime.datetime.fromisoformat(record['timestamp'])
+            key = self.partition_key(moment)
+            partition = self.partitions.get(key)
+            if partition is None:
+                partition = self.partitions[key] = {
+                    'key': key, 'records': [], 'positions': [], 'newest': float('-inf'),
+                    'index': InvertedIndex(self.text_of, self.k1, self.b),
+                }
+            partition['records'].append(record)
+            partition['positions'].append(position)
+            partition['newest'] = max(partition['newest'], moment.timestamp())
+            self.times.append(moment.timestamp())
+            for term in set(tokenize(self.text_of(record))):
+                self.document_frequency[term] += 1
+            touched.add(key)
+        if touched:
+            for key in touched:
+                self.partitions[key]['index'].sync(self.partitions[key]['records'])
+            self.total_length = sum(partition['index'].total_length for partition in self.partitions.values())
+            self.ordered = sorted(self.partitions.values(), key=lambda partition: partition['newest'], reverse=True)
+            self.newest = max(self.times)
+        self._last = records[-1] if records else None
+
+    def search(self, query: str, limit: int) -> List[int]:
+        '''Positions of the best recency-weighted matches, best first.'''
+        self.partitions_searched = 0
+        count = len(self.times)
+        if not count or limit <= 0:
+            return []
+        idfs = {
+            term: math.log(1 + (count - self.document_frequency[term] + 0.5) / (self.document_frequency[term] + 0.5))
+            for term in set(tokenize(query)) if self.document_frequency.get(term)
+        }
+        if not idfs:
+            return []
+        average_length = self.total_length / count or 1
+        best_possible = sum(idfs.values()) * (self.k1 + 1)
+        rate = math.log(2) / (self.half_life_days * 86400)
+        top = []  # min-heap of (score, position)
+        for partition in self.ordered:
+            if len(top) == limit and top[0][0] >= best_possible * math.exp(-rate * (self.newest - partition['newest'])):
+                break
+            self.partitions_searched += 1
+            for local, score in partition['index'].bm25_scores(idfs, average_length).items():
+                position = partition['positions'][local]
+                entry = (score * math.exp(-rate * (self.newest - self.times[position])), position)
+                if len(top) < limit:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+        return [position for _, position in sorted(top, reverse=True)]
+
+    def size_bytes(self) -> int:
+        '''Estimated size of a compact encoding: the partitions' indexes, document frequencies and 8 bytes per timestamp.'''
+        return (
+            sum(partition['index'].size_bytes() for partition in self.partitions.values())
+            + sum(len(term.encode()) + 4 for term in self.document_frequency) + 8 * len(self.times)
+        )
+
 class Memory:
     def __init__(self, 
         storage_dir: str = './agent_memory',
         facts_file: str = 'facts_semantic.json',
         conversations_file: str = 'conversations_episodic.json',
         procedures_file: str = 'procedures.json',
+        snapshots: bool = True,
     ):
         # Create storage directory
         self.storage_dir = storage_dir
@@ -22,11 +208,18 @@ class Memory:
         self.conversations_file = os.path.join(self.storage_dir, conversations_file)
         self.procedures_file = os.path.join(self.storage_dir, procedures_file)
         
-        # Init memory stores
-        self.facts = self._load_json(self.facts_file, default=[])
-        self.conversations = self._load_json(self.conversations_file, default=[])
+        # Search indexes (built on first use, stay in RAM)
+        self.fact_index = InvertedIndex(lambda fact: fact['content'])
+        conversation_text = lambda conversation: f'{conversation["user_message"]} {conversation["agent_response"]}'
+        self.conversation_index = InvertedIndex(conversation_text)
+        self.conversation_partitions = PartitionedIndex(conversation_text, granularity='week', half_life_days=7.0)
+
+        # Init memory stores (from binary snapshots with prebuilt indexes when fresh, see compact())
+        self.snapshots = snapshots
+        self.facts = self._load_records(self.facts_file, FACT_SCHEMA, self.fact_index)
+        self.conversations = self._load_records(self.conversations_file, CONVERSATION_SCHEMA, self.conversation_index)
         self.procedures = self._load_json(self.procedures_file, default={})
-        
+
         # Working memory (stays in RAM)
         self.working_memory = []
         self.working_memory_capacity = 10
@@ -41,13 +234,40 @@ class Memory:
     
     def _save_json(self, data: Any, file_path: str):
         '''Save a JSON object to the given file path.'''
+        if isinstance(data, SnapshotRecords):
+            data = list(data)
         with open(file_path, 'w') as f:
             json.dump(data, f, indent=2)
+
+    def _load_records(self, file_path: str, schema: tuple, index: InvertedIndex):
+        '''Load a record store from its snapshot if that is fresh (restoring the prebuilt index), else from JSON.'''
+        snapshot = load_snapshot(snapshot_path(file_path), file_path, schema) if self.snapshots else None
+        if snapshot is None:
+            return self._load_json(file_path, default=[])
+        records = SnapshotRecords(snapshot, schema)
+        snapshot.restore_index(index, records)
+        return records
+
+    def compact(self):
+        '''
+        Write a binary snapshot (columnar records + prebuilt search index) next to each record store's JSON.
+        Later instances load it instead of the JSON until the JSON changes again.
+        '''
+        for records, file_path, schema, index in (
+            (self.facts, self.facts_file, FACT_SCHEMA, self.fact_index),
+            (self.conversations, self.conversations_file, CONVERSATION_SCHEMA, self.conversation_index),
+        ):
+            if not os.path.exists(file_path):
+                continue
+            index.sync(records)
+            write_snapshot(snapshot_path(file_path), file_path, records, schema, index)
     
     def add_fact(
-        self, content: str, category: Optional[str] = None
+        self, content: str, category: Optional[str] = None, unique: bool = False
     ):
-        '''Add a fact to semantic memory.'''
+        '''Add a fact to semantic memory (unique: skip it if the same fact is already stored).'''
+        if unique and any(fact['content'] == content for fact in self.facts):
+            return
         fact = {
             'content': content,
             'category': category,
@@ -102,8 +322,16 @@ class Memory:
             )
             self.working_memory = self.working_memory[1:]
     
-    def search_facts(self, query: str, limit: int = 3):
-        '''Keyword search for facts'''
+    def _index_search(self, records: List[Dict[str, Any]], index: InvertedIndex, query: str, limit: int, mode: str):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f'Unknown search mode {mode!r}, expected one of {SEARCH_MODES}')
+        index.sync(records)
+        return [records[position] for position in index.search(query, limit, bm25=mode == 'bm25')]
+
+    def search_facts(self, query: str, limit: int = 3, mode: str = 'keyword'):
+        '''Search for facts (mode: one of SEARCH_MODES)'''
+        if mode != 'keyword':
+            return self._index_search(self.facts, self.fact_index, query, limit, mode)
         query_terms = query.lower().split()
         results = []
         
@@ -118,8 +346,13 @@ class Memory:
         results.sort(key=lambda x: x[1], reverse=True)
         return [item[0] for item in results[:limit]]
         
-    def search_conversations(self, query: str, limit: int = 3):
-        '''Keyword search for past conversations'''
+    def search_conversations(self, query: str, limit: int = 3, mode: str = 'keyword'):
+        '''Search past conversations (mode: one of CONVERSATION_SEARCH_MODES)'''
+        if mode == 'recent':
+            self.conversation_partitions.sync(self.conversations)
+            return [self.conversations[position] for position in self.conversation_partitions.search(query, limit)]
+        if mode != 'keyword':
+            return self._index_search(self.conversations, self.conversation_index, query, limit, mode)
         query_terms = query.lower().split()
         results = []
         
@@ -149,6 +382,12 @@ class Memory:
         results.sort(key=lambda x: x.get('usage_count', 0), reverse=True)
         return results[:limit]
 
+    def count(self, store: str) -> int:
+        '''Number of records in the facts, conversations or procedures store'''
+        if store not in ('facts', 'conversations', 'procedures'):
+            raise ValueError(f'Unknown store {store!r}')
+        return len(getattr(self, store))
+
     def get_recent_conversations(self, count: int = 5) -> List[Dict[str, Any]]:
         '''Get the most recent conversations'''
         return self.conversations[-count:] if len(self.conversations) > count else self.conversations
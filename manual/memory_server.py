@@ -0,0 +1,575 @@
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from memory import Memory
+
+# Wire format
+# Frame: !IIB header (payload length, request id, opcode for requests / status for responses) + payload.
+# Payload: one value in a tagged binary encoding: None, bool, int64, float64, str, bytes, list (and tuple), dict.
+HEADER = struct.Struct('!IIB')
+OK, ERROR = 0, 1
+
+OPS = (
+    'add_fact', 'add_procedure', 'add_conversation', 'add_to_working_memory',
+    'search_facts', 'search_conversations', 'search_procedures', 'get_recent_conversations',
+    'generate_context', 'get_store', 'flush', 'stats', 'compact', 'count',
+)
+OPCODES = {name: code for code, name in enumerate(OPS)}
+
+_U32 = struct.Struct('!I')
+_I64 = struct.Struct('!q')
+_F64 = struct.Struct('!d')
+
+def encode(value: Any, out: bytearray = None) -> bytearray:
+    out = bytearray() if out is None else out
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, int):
+        out += b'i' + _I64.pack(value)
+    elif isinstance(value, float):
+        out += b'd' + _F64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out += b's' + _U32.pack(len(data)) + data
+    elif isinstance(value, (bytes, bytearray)):
+        out += b'b' + _U32.pack(len(value)) + value
+    elif isinstance(value, Sequence):
+        out += b'l' + _U32.pack(len(value))
+        for item in value:
+            encode(item, out)
+    elif isinstance(value, dict):
+        out += b'm' + _U32.pack(len(value))
+        for key, item in value.items():
+            encode(key, out)
+            encode(item, out)
+    else:
+        raise TypeError(f'Cannot encode {type(value).__name__}')
+    return out
+
+def decode(data: bytes, offset: int = 0):
+    '''(value, next offset)'''
+    tag = data[offset:offset + 1]
+    offset += 1
+    if tag == b'N':
+        return None, offset
+    if tag == b'T':
+        return True, offset
+    if tag == b'F':
+        return False, offset
+    if tag == b'i':
+        return _I64.unpack_from(data, offset)[0], offset + 8
+    if tag == b'd':
+        return _F64.unpack_from(data, offset)[0], offset + 8
+    if tag in (b's', b'b'):
+        size = _U32.unpack_from(data, offset)[0]
+        offset += 4
+        raw = bytes(data[offset:offset + size])
+        return (raw.decode('utf-8') if tag == b's' else raw), offset + size
+    if tag == b'l':
+        count = _U32.unpack_from(data, offset)[0]
+        offset += 4
+        items = []
+        for _ in range(count):
+            item, offset = decode(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == b'm':
+        count = _U32.unpack_from(data, offset)[0]
+        offset += 4
+        result = {}
+        for _ in range(count):
+            key, offset = decode(data, offset)
+            result[key], offset = decode(data, offset)
+        return result, offset
+    raise ValueError(f'Unknown tag {tag!r} at offset {offset - 1}')
+
+def frame(request_id: int, code: int, value: Any) -> bytes:
+    payload = encode(value)
+    return HEADER.pack(len(payload), request_id, code) + payload
+
+
+# Server
+class SharedMemory(Memory):
+    '''
+    Memory for the server process: writes are applied in RAM at once, and the JSON files are rewritten
+    at most once per flush interval instead of on every add (many workers' adds share one rewrite).
+    The server serializes pending stores off the event loop: take_dirty() on the loop, write() on a writer thread.
+    '''
+    def __init__(self, *args, **kwargs):
+        self._dirty: Dict[str, Any] = {}
+        super().__init__(*args, **kwargs)
+
+    def _save_json(self, data: Any, file_path: str):
+        self._dirty[file_path] = data
+
+    def take_dirty(self) -> Dict[str, Any]:
+        '''Pending stores, shallow-copied so they stay fixed while the originals keep changing.'''
+        dirty, self._dirty = self._dirty, {}
+        return {file_path: data.copy() for file_path, data in dirty.items()}
+
+    def write(self, dirty: Dict[str, Any]) -> int:
+        '''Write stores from take_dirty(); each file is replaced atomically, so a crash never leaves it half-written.'''
+        for file_path, data in dirty.items():
+            Memory._save_json(self, data, f'{file_path}.tmp')
+            os.replace(f'{file_path}.tmp', file_path)
+        return len(dirty)
+
+    def flush(self) -> int:
+        '''Write pending changes now, on the calling thread.'''
+        return self.write(self.take_dirty())
+
+    def compact(self):
+        self.flush()
+        super().compact()
+
+class MemoryServer:
+    '''
+    One shared, indexed in-RAM Memory served over a Unix socket.
+    - Requests on a connection are answered in order, so clients can pipeline many frames per write.
+    - Each connection (agent worker) has its own working memory; facts, conversations and procedures are shared.
+    - Ops run on the event loop one at a time, so the Memory needs no locking.
+    '''
+    def __init__(self, socket_path: str, storage_dir: str = './agent_memory', flush_interval: float = 0.05):
+        self.socket_path = socket_path
+        self.memory = SharedMemory(storage_dir=storage_dir)
+        self.flush_interval = flush_interval
+        self.stats = {'connections': 0, 'requests': 0, 'errors': 0, 'flushes': 0, 'write_errors': 0}
+        self._flush_scheduled = False
+        self._flush_task = None
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._server = None
+        # A single writer thread keeps rewrites of a file in order
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='memory-writer')
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+
+    async def serve_forever(self):
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, lambda: stopped.done() or stopped.set_result(None))
+        try:
+            await stopped
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        if self._flush_task:
+            self._flush_task.cancel()
+        await self._compact()
+        self._writer.shutdown()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def _flush(self) -> int:
+        '''Write pending changes on the writer thread; returns once they (and any earlier writes) are on disk.'''
+        dirty = self.memory.take_dirty()
+        try:
+            written = await asyncio.get_running_loop().run_in_executor(self._writer, self.memory.write, dirty)
+        except OSError:
+            # Keep the changes pending (newer versions of a store win) and retry with the next flush
+            self.stats['write_errors'] += 1
+            for file_path, data in dirty.items():
+                self.memory._dirty.setdefault(file_path, data)
+            raise
+        if written:
+            self.stats['flushes'] += 1
+        return written
+
+    async def _compact(self):
+        '''Flush, then write snapshots (on the loop: indexes and stores must not change meanwhile).'''
+        await self._flush()
+        self.memory.compact()
+
+    def _schedule_flush(self):
+        if self._flush_scheduled or not self.memory._dirty:
+            return
+        self._flush_scheduled = True
+
+        async def flush():
+            await asyncio.sleep(self.flush_interval)
+            self._flush_scheduled = False
+            try:
+                await self._flush()
+            except OSError:
+                self._schedule_flush()
+        self._flush_task = asyncio.ensure_future(flush())
+
+    def _call(self, working_memory: List[dict], op: str, args: list, kwargs: dict) -> Any:
+        memory = self.memory
+        if op == 'get_store':
+            if args[0] not in ('facts', 'conversations', 'procedures'):
+                raise ValueError(f'Unknown store {args[0]!r}')
+            return getattr(memory, args[0])
+        if op == 'stats':
+            return {**self.stats, 'facts': len(memory.facts), 'conversations': len(memory.conversations),
+                    'procedures': len(memory.procedures)}
+        # Swap in this connection's working memory for the duration of the call
+        memory.working_memory = working_memory
+        try:
+            return getattr(memory, op)(*args, **kwargs)
+        finally:
+            working_memory[:] = memory.working_memory
+
+    async def _respond(self, working_memory: List[dict], request_id: int, code: int, payload: bytes) -> bytes:
+        self.stats['requests'] += 1
+        try:
+            (args, kwargs), _ = decode(payload)
+            op = OPS[code]
+            if op == 'flush':
+                result = await self._flush()
+            elif op == 'compact':
+                result = await self._compact()
+            else:
+                result = self._call(working_memory, op, args, kwargs)
+            response = frame(request_id, OK, result)
+        except Exception as e:
+            self.stats['errors'] += 1
+            response = frame(request_id, ERROR, f'{type(e).__name__}: {e}')
+        self._schedule_flush()
+        return response
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats['connections'] += 1
+        self._connections[asyncio.current_task()] = writer
+        working_memory: List[dict] = []
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = await reader.read(1 << 16)
+                if not chunk:
+                    break
+                buffer += chunk
+                # Answer every complete frame from this read (pipelined requests), then drain once
+                offset = 0
+                while len(buffer) - offset >= HEADER.size:
+                    size, request_id, code = HEADER.unpack_from(buffer, offset)
+                    end = offset + HEADER.size + size
+                    if len(buffer) < end:
+                        break
+                    payload = bytes(buffer[offset + HEADER.size:end])
+                    offset = end
+                    writer.write(await self._respond(working_memory, request_id, code, payload))
+                del buffer[:offset]
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+
+# Client
+class RemoteMemoryError(RuntimeError):
+    pass
+
+class RemoteMemory:
+    '''
+    Drop-in for Memory backed by a MemoryServer: same methods, results computed on the shared copy.
+    facts / conversations / procedures fetch a copy of the whole store on every access, so use
+    count() for sizes rather than len(memory.facts), and read them once rather than in a loop.
+    Thread-safe (calls on one connection are serialized); use pipeline() to send many calls in one round trip.
+    A call that fails in transit (timeout, dropped connection, out-of-step response) raises and closes the
+    connection; the next call reconnects, with an empty working memory.
+    '''
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._socket = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._connect()
+
+    def _connect(self):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(self.timeout)
+        try:
+            self._socket.connect(self.socket_path)
+        except OSError:
+            self._disconnect()
+            raise
+        self._reader = self._socket.makefile('rb')
+
+    def _disconnect(self):
+        if self._reader is not None:
+            self._reader.close()
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = self._reader = None
+
+    def _request_frame(self, op: str, args: tuple, kwargs: dict) -> tuple:
+        '''(request id, frame)'''
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        return self._next_id, frame(self._next_id, OPCODES[op], [list(args), kwargs])
+
+    def _read_exactly(self, size: int) -> bytes:
+        data = self._reader.read(size)
+        if len(data) < size:
+            raise ConnectionError('memory server closed the connection')
+        return data
+
+    def _read_response(self, request_id: int) -> Any:
+        size, response_id, status = HEADER.unpack(self._read_exactly(HEADER.size))
+        value, _ = decode(self._read_exactly(size))
+        if response_id != request_id:
+            raise ConnectionError(f'memory server answered request {response_id}, expected {request_id}')
+        if status == ERROR:
+            raise RemoteMemoryError(value)
+        return value
+
+    def _call(self, op: str, *args, **kwargs) -> Any:
+        return self._call_many([(op, args, kwargs)], raise_errors=True)[0]
+
+    def _call_many(self, calls: List[tuple], raise_errors: bool = False) -> List[Any]:
+        '''Send every call in one write, then read the responses (in order).'''
+        with self._lock:
+            if self._socket is None:
+                self._connect()
+            request_ids, frames = zip(*(self._request_frame(op, args, kwargs) for op, args, kwargs in calls))
+            results = []
+            try:
+                self._socket.sendall(b''.join(frames))
+                for request_id in request_ids:
+                    try:
+                        results.append(self._read_response(request_id))
+                    except RemoteMemoryError as e:
+                        results.append(e)
+            except BaseException:
+                # The stream may be mid-frame: never reuse it
+                self._disconnect()
+                raise
+        if raise_errors:
+            for result in results:
+                if isinstance(result, RemoteMemoryError):
+                    raise result
+        return results
+
+    def pipeline(self) -> 'Pipeline':
+        return Pipeline(self)
+
+    # Memory API
+    def add_fact(self, content: str, category: Optional[str] = None, unique: bool = False):
+        return self._call('add_fact', content, category, unique)
+
+    def add_procedure(self, name: str, steps: List[str], description: Optional[str] = None):
+        return self._call('add_procedure', name, steps, description)
+
+    def add_conversation(self, user_message: str, agent_response: str, metadata: Optional[Dict[str, Any]] = None):
+        return self._call('add_conversation', user_message, agent_response, metadata)
+
+    def add_to_working_memory(self, content: str, importance: float = 1.0):
+        return self._call('add_to_working_memory', content, importance)
+
+    def search_facts(self, query: str, limit: int = 3, mode: str = 'keyword'):
+        return self._call('search_facts', query, limit, mode)
+
+    def search_conversations(self, query: str, limit: int = 3, mode: str = 'keyword'):
+        return self._call('search_conversations', query, limit, mode)
+
+    def search_procedures(self, query: str, limit: int = 3):
+        return self._call('search_procedures', query, limit)
+
+    def get_recent_conversations(self, count: int = 5) -> List[Dict[str, Any]]:
+        return self._call('get_recent_conversations', count)
+
+    def generate_context(self, current_message: str) -> str:
+        return self._call('generate_context', current_message)
+
+    def count(self, store: str) -> int:
+        '''Number of records in a store, without fetching it.'''
+        return self._call('count', store)
+
+    @property
+    def facts(self) -> List[Dict[str, Any]]:
+        return self._call('get_store', 'facts')
+
+    @property
+    def conversations(self) -> List[Dict[str, Any]]:
+        return self._call('get_store', 'conversations')
+
+    @property
+    def procedures(self) -> Dict[str, Any]:
+        return self._call('get_store', 'procedures')
+
+    def flush(self) -> int:
+        '''Write pending changes to disk now.'''
+        return self._call('flush')
+
+    def compact(self):
+        '''Write pending changes and binary snapshots (the server also compacts on shutdown; it pauses while writing).'''
+        return self._call('compact')
+
+    def server_stats(self) -> dict:
+        return self._call('stats')
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+class Pipeline:
+    '''
+    Queues RemoteMemory calls and sends them in one write on exit (or execute()).
+    Results (or RemoteMemoryError instances for failed calls) are in .results, in call order.
+    '''
+    def __init__(self, client: RemoteMemory):
+        self.client = client
+        self.calls: List[tuple] = []
+        self.results: List[Any] = []
+
+    def __getattr__(self, op: str):
+        if op not in OPCODES:
+            raise AttributeError(op)
+
+        def queue(*args, **kwargs):
+            self.calls.append((op, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> List[Any]:
+        self.results = self.client._call_many(self.calls) if self.calls else []
+        self.calls = []
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+
+
+def serve_in_background(socket_path: str, storage_dir: str, flush_interval: float = 0.05) -> tuple:
+    '''Run a MemoryServer on a daemon thread (for benchmarks and tests); returns (server, stop).'''
+    server = MemoryServer(socket_path, storage_dir, flush_interval)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name='memory-server', daemon=True).start()
+    started.wait()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    return server, stop
+
+
+# Benchmark: N workers with private copies vs one shared server
+def run_benchmark(workers: int = 8, facts: int = 5000, queries: int = 500, pipeline_depth: int = 32):
+    from search_eval import generate_store
+
+    scratch = tempfile.mkdtemp()
+    try:
+        storage_dir = os.path.join(scratch, 'memory')
+        generate_store(storage_dir, facts, facts)
+        store_mb = sum(os.path.getsize(os.path.join(storage_dir, f)) for f in os.listdir(storage_dir)) / 1e6
+        query_texts = [f'alice python latency {i}' for i in range(queries)]
+        print(f'\n🗄️  MEMORY SERVER BENCHMARK: {facts} facts + {facts} conversations ({store_mb:.1f} MB JSON), {workers} workers')
+        print(f'\t{"mode":<28} {"startup/worker ms":>18} {"search p50 ms":>14} {"searches/s":>11}')
+
+        # Private copies: every worker loads and holds the whole store
+        start = time.perf_counter()
+        copies = [Memory(storage_dir=storage_dir) for _ in range(workers)]
+        startup = (time.perf_counter() - start) / workers
+        latencies = []
+        started = time.perf_counter()
+        for i, query in enumerate(query_texts):
+            t = time.perf_counter()
+            copies[i % workers].search_facts(query, mode='bm25')
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        print(f'\t{"private copy per worker":<28} {startup * 1000:>18.1f} {latencies[len(latencies) // 2] * 1000:>14.3f} {queries / elapsed:>11.0f}')
+        del copies
+
+        socket_path = os.path.join(scratch, 'memory.sock')
+        server, stop = serve_in_background(socket_path, storage_dir)
+        try:
+            start = time.perf_counter()
+            clients = [RemoteMemory(socket_path) for _ in range(workers)]
+            startup = (time.perf_counter() - start) / workers
+            clients[0].search_facts('warm up the index', mode='bm25')
+
+            latencies = []
+            started = time.perf_counter()
+            for i, query in enumerate(query_texts):
+                t = time.perf_counter()
+                clients[i % workers].search_facts(query, mode='bm25')
+                latencies.append(time.perf_counter() - t)
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            print(f'\t{"shared server":<28} {startup * 1000:>18.1f} {latencies[len(latencies) // 2] * 1000:>14.3f} {queries / elapsed:>11.0f}')
+
+            started = time.perf_counter()
+            for i in range(0, queries, pipeline_depth):
+                with clients[0].pipeline() as p:
+                    for query in query_texts[i:i + pipeline_depth]:
+                        p.search_facts(query, mode='bm25')
+            elapsed = time.perf_counter() - started
+            print(f'\t{f"shared server, pipelined x{pipeline_depth}":<28} {"":>18} {"":>14} {queries / elapsed:>11.0f}')
+
+            started = time.perf_counter()
+            with clients[0].pipeline() as p:
+                for i in range(1000):
+                    p.add_fact(f'benchmark fact {i}')
+            elapsed = time.perf_counter() - started
+            stats = clients[0].server_stats()
+            print(f'\t1000 pipelined adds in {elapsed * 1000:.0f}ms, {stats["flushes"]} JSON rewrite(s) so far')
+            for client in clients:
+                client.close()
+        finally:
+            stop()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve one shared Memory to many agent workers over a Unix socket')
+    parser.add_argument('--socket', default=os.getenv('MEMORY_SOCKET', '/tmp/agent_memory.sock'))
+    parser.add_argument('--storage-dir', default='./agent_memory')
+    parser.add_argument('--flush-interval', type=float, default=0.05, help='Seconds between JSON rewrites after changes')
+    parser.add_argument('--benchmark', action='store_true', help='Compare private per-worker copies with the shared server')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--facts', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.workers, args.facts, args.queries)
+    else:
+        server = MemoryServer(args.socket, args.storage_dir, args.flush_interval)
+        print(f'🗄️  Memory server on {args.socket} ({len(server.memory.facts)} facts, {len(server.memory.conversations)} conversations)')
+        print(f'\tPoint agents at it with: export MEMORY_SOCKET={args.socket}')
+        asyncio.run(server.serve_forever())
@@ -0,0 +1,267 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from memory import CONVERSATION_SEARCH_MODES, SEARCH_MODES, Memory, tokenize
+
+# Dataset format (JSON lines), one labeled query per line:
+#   {"store": "facts" | "conversations", "query": "...", "relevant": {"<record id>": <grade>, ...}}
+# Record ids are the records' timestamps (see record_ids); grades are >= 1, higher is more relevant.
+STORES = ('facts', 'conversations')
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'can', 'do', 'for', 'from', 'has', 'have', 'i', 'in', 'is',
+    'it', 'its', 'me', 'my', 'of', 'on', 'or', 'so', 'that', 'the', 'their', 'them', 'they', 'this', 'to', 'was', 'we',
+    'what', 'when', 'with', 'you', 'your',
+}
+
+def record_text(store: str, record: Dict[str, Any]) -> str:
+    if store == 'facts':
+        return record['content']
+    return f'{record["user_message"]} {record["agent_response"]}'
+
+def record_ids(records: List[Dict[str, Any]]) -> List[str]:
+    '''Stable ids for a store's records: the timestamp, suffixed with #n when several records share one.'''
+    seen = Counter()
+    ids = []
+    for record in records:
+        timestamp = record['timestamp']
+        ids.append(timestamp if not seen[timestamp] else f'{timestamp}#{seen[timestamp]}')
+        seen[timestamp] += 1
+    return ids
+
+def load_dataset(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_dataset(dataset: List[dict], path: str):
+    with open(path, 'w') as f:
+        for entry in dataset:
+            f.write(json.dumps(entry) + '\n')
+
+def generate_dataset(
+    memory: Memory, queries_per_store: int = 100, terms_per_query: int = 3, noise_terms: int = 1, seed: int = 0
+) -> List[dict]:
+    '''
+    Build a labeled dataset from the records already in the memory stores.
+    Each query samples distinctive (low document frequency) terms of one record, plus noise_terms random vocabulary words;
+    the source record is grade 2 and every other record containing all the sampled terms is grade 1.
+    '''
+    rng = random.Random(seed)
+    dataset = []
+    for store in STORES:
+        records = getattr(memory, store)
+        if not records:
+            continue
+        terms = [set(tokenize(record_text(store, record))) - STOPWORDS for record in records]
+        frequency = Counter(term for record_terms in terms for term in record_terms)
+        vocabulary = sorted(frequency)
+        ids = record_ids(records)
+
+        for index in rng.sample(range(len(records)), min(queries_per_store, len(records))):
+            if not terms[index]:
+                continue
+            # Rarer half of the record's terms (always at least one), so queries are answerable
+            candidates = sorted(terms[index], key=lambda term: (frequency[term], term))
+            candidates = candidates[:max(terms_per_query, len(candidates) // 2)]
+            chosen = rng.sample(candidates, min(terms_per_query, len(candidates)))
+            relevant = {
+                ids[other]: 1 for other, other_terms in enumerate(terms) if other != index and other_terms.issuperset(chosen)
+            }
+            relevant[ids[index]] = 2
+            query_terms = chosen + rng.sample(vocabulary, min(noise_terms, len(vocabulary)))
+            rng.shuffle(query_terms)
+            dataset.append({'store': store, 'query': ' '.join(query_terms), 'relevant': relevant})
+    return dataset
+
+
+# Metrics
+def recall_at_k(ranked: List[str], relevant: Dict[str, int], k: int) -> float:
+    return len(set(ranked[:k]) & set(relevant)) / len(relevant)
+
+def reciprocal_rank(ranked: List[str], relevant: Dict[str, int]) -> float:
+    for rank, record_id in enumerate(ranked, start=1):
+        if record_id in relevant:
+            return 1 / rank
+    return 0.0
+
+def ndcg_at_k(ranked: List[str], relevant: Dict[str, int], k: int) -> float:
+    dcg = sum((2 ** relevant.get(record_id, 0) - 1) / math.log2(rank + 2) for rank, record_id in enumerate(ranked[:k]))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    ideal_dcg = sum((2 ** grade - 1) / math.log2(rank + 2) for rank, grade in enumerate(ideal))
+    return dcg / ideal_dcg if ideal_dcg else 0.0
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def pareto_front(reports: List[dict]) -> set:
+    '''Modes no other mode beats on both p50 latency and nDCG.'''
+    return {
+        report['mode'] for report in reports
+        if not any(
+            other['search_p50_ms'] <= report['search_p50_ms'] and other['ndcg'] >= report['ndcg']
+            and (other['search_p50_ms'], other['ndcg']) != (report['search_p50_ms'], report['ndcg'])
+            for other in reports
+        )
+    }
+
+
+def evaluate(memory: Memory, dataset: List[dict], k: int = 3, modes: List[str] = CONVERSATION_SEARCH_MODES) -> List[dict]:
+    '''Run every labeled query through each search mode; one report per (store, mode). Fact search skips 'recent'.'''
+    reports = []
+    for store in STORES:
+        queries = [entry for entry in dataset if entry['store'] == store]
+        records = getattr(memory, store)
+        if not queries or not records:
+            continue
+        id_of = {id(record): record_id for record, record_id in zip(records, record_ids(records))}
+        search = memory.search_facts if store == 'facts' else memory.search_conversations
+        index = memory.fact_index if store == 'facts' else memory.conversation_index
+
+        for mode in modes:
+            if store == 'facts' and mode not in SEARCH_MODES:
+                continue
+            mode_index = memory.conversation_partitions if mode == 'recent' else index
+            build_seconds, index_bytes = 0.0, 0
+            if mode != 'keyword':
+                mode_index.sync([])  # modes share the index: time a cold build for each
+                start = time.perf_counter()
+                mode_index.sync(records)
+                build_seconds = time.perf_counter() - start
+                index_bytes = mode_index.size_bytes()
+
+            latencies, recalls, reciprocal_ranks, ndcgs, partitions = [], [], [], [], []
+            for entry in queries:
+                start = time.perf_counter()
+                results = search(entry['query'], limit=k, mode=mode)
+                latencies.append(time.perf_counter() - start)
+                if mode == 'recent':
+                    partitions.append(mode_index.partitions_searched)
+                ranked = [id_of[id(record)] for record in results]
+                recalls.append(recall_at_k(ranked, entry['relevant'], k))
+                reciprocal_ranks.append(reciprocal_rank(ranked, entry['relevant']))
+                ndcgs.append(ndcg_at_k(ranked, entry['relevant'], k))
+
+            reports.append({
+                'store': store,
+                'mode': mode,
+                'records': len(records),
+                'queries': len(queries),
+                'k': k,
+                'recall_at_k': sum(recalls) / len(queries),
+                'mrr': sum(reciprocal_ranks) / len(queries),
+                'ndcg': sum(ndcgs) / len(queries),
+                'search_p50_ms': percentile(latencies, 50) * 1000,
+                'search_p95_ms': percentile(latencies, 95) * 1000,
+                'build_ms': build_seconds * 1000,
+                'index_kb': index_bytes / 1024,
+                # 'recent' only: mean partitions searched out of all, to show early termination
+                'partitions_searched': sum(partitions) / len(partitions) if partitions else None,
+                'partitions': len(mode_index.partitions) if partitions else None,
+            })
+    return reports
+
+def print_reports(reports: List[dict]):
+    for store in STORES:
+        store_reports = sorted((r for r in reports if r['store'] == store), key=lambda r: r['search_p50_ms'])
+        if not store_reports:
+            continue
+        front = pareto_front(store_reports)
+        first = store_reports[0]
+        print(f'\n🎯 {store.upper()}: {first["records"]} records, {first["queries"]} queries, k={first["k"]} (* = Pareto-optimal)')
+        print(
+            f'\t  {"mode":<9} {"recall@k":>9} {"MRR":>6} {"nDCG":>6} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"build ms":>9} {"index KB":>9} {"partitions":>12}'
+        )
+        for r in store_reports:
+            marker = '*' if r['mode'] in front else ' '
+            print(
+                f'\t{marker} {r["mode"]:<9} {r["recall_at_k"]:>9.3f} {r["mrr"]:>6.3f} {r["ndcg"]:>6.3f} '
+                f'{r["search_p50_ms"]:>8.3f} {r["search_p95_ms"]:>8.3f} {r["build_ms"]:>9.1f} {r["index_kb"]:>9.1f} '
+                + (f'{r["partitions_searched"]:>6.1f}/{r["partitions"]:<5}' if r['partitions'] else f'{"-":>12}')
+            )
+
+
+# Synthetic stores, for evaluating at sizes the demo store doesn't reach
+TOPICS = ['python', 'memory', 'agents', 'databases', 'testing', 'deployment', 'caching', 'security', 'networking',
+          'logging', 'embeddings', 'prompts', 'scheduling', 'billing', 'onboarding', 'search', 'analytics', 'backups']
+DETAILS = ['latency', 'retries', 'indexes', 'schemas', 'tokens', 'queues', 'workers', 'timeouts', 'replicas', 'configs',
+           'migrations', 'dashboards', 'alerts', 'budgets', 'permissions', 'snapshots', 'benchmarks', 'releases']
+VERBS = ['prefers', 'asked about', 'struggles with', 'is learning', 'reviewed', 'debugged', 'documented', 'optimized']
+PEOPLE = ['alice', 'bob', 'carol', 'dave', 'erin', 'frank', 'grace', 'heidi', 'ivan', 'judy', 'mallory', 'oscar']
+
+def generate_store(storage_dir: str, facts: int, conversations: int, seed: int = 0) -> Memory:
+    '''
+    Fill storage_dir with templated facts and conversations (written in one go).
+    Timestamps are an hour apart, so larger stores span many weeks and the 'recent' mode's partitions matter.
+    '''
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+
+    def sentence():
+        return f'{rng.choice(PEOPLE)} {rng.choice(VERBS)} {rng.choice(TOPICS)} {rng.choice(DETAILS)} and {rng.choice(DETAILS)}'
+
+    memory = Memory(storage_dir=storage_dir)
+    memory.facts = [
+        {'content': sentence(), 'category': rng.choice(TOPICS), 'timestamp': (start + datetime.timedelta(hours=i)).isoformat()}
+        for i in range(facts)
+    ]
+    memory.conversations = [
+        {
+            'user_message': f'What do you know about {rng.choice(TOPICS)} {rng.choice(DETAILS)}?',
+            'agent_response': f'I remember that {sentence()}.',
+            'metadata': {},
+            'timestamp': (start + datetime.timedelta(hours=i)).isoformat(),
+        }
+        for i in range(conversations)
+    ]
+    memory._save_json(memory.facts, memory.facts_file)
+    memory._save_json(memory.conversations, memory.conversations_file)
+    return memory
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluate retrieval quality vs latency of the Memory search modes')
+    parser.add_argument('--storage-dir', default='./agent_memory', help='Memory store to generate from / evaluate against')
+    parser.add_argument('--synthetic', type=int, help='Evaluate against a synthetic store of this many facts and conversations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='Build a labeled dataset from the store')
+    generate_parser.add_argument('--out', required=True)
+    generate_parser.add_argument('--queries', type=int, default=100, help='Queries per store')
+    generate_parser.add_argument('--terms', type=int, default=3, help='Record terms per query')
+    generate_parser.add_argument('--noise-terms', type=int, default=1)
+    generate_parser.add_argument('--seed', type=int, default=0)
+
+    run_parser = subparsers.add_parser('run', help='Evaluate every search mode')
+    run_parser.add_argument('--dataset', help='Labeled dataset (JSON lines); generated from the store if omitted')
+    run_parser.add_argument('-k', type=int, default=3)
+    run_parser.add_argument('--modes', nargs='+', default=list(CONVERSATION_SEARCH_MODES), choices=list(CONVERSATION_SEARCH_MODES))
+    run_parser.add_argument('--json', help='Write the reports to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.synthetic:
+            memory = generate_store(os.path.join(scratch, 'memory'), args.synthetic, args.synthetic)
+        else:
+            memory = Memory(storage_dir=args.storage_dir)
+
+        if args.command == 'generate':
+            dataset = generate_dataset(memory, args.queries, args.terms, args.noise_terms, args.seed)
+            save_dataset(dataset, args.out)
+            print(f'📝 Wrote {len(dataset)} labeled queries to {args.out}')
+        else:
+            dataset = load_dataset(args.dataset) if args.dataset else generate_dataset(memory)
+            reports = evaluate(memory, dataset, args.k, args.modes)
+            print_reports(reports)
+            if args.json:
+                with open(args.json, 'w') as f:
+                    json.dump(reports, f, indent=2)
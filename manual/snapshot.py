@@ -0,0 +1,373 @@
+import argparse
+import array
+import datetime
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections.abc import MutableMapping, MutableSequence
+from typing import Any, Dict, List, Optional, Tuple
+
+# Binary snapshot of a record store (facts / conversations), memory-mapped on load.
+# Layout (native byte order, sections 8-byte aligned):
+#   header   magic, version, section count, record count, source JSON mtime_ns and size (freshness check)
+#   sections name -> (offset, length):
+#     schema                        JSON of the record layout the snapshot was written with
+#     <text field>.offsets/.blob    uint64 offsets (records + 1) into one contiguous UTF-8 blob
+#     <category field>.codes        uint32 per record (0 = None), plus .values.offsets/.values.blob dictionary
+#     <timestamp field>             int64 microseconds since 1970-01-01 (naive ISO timestamps)
+#     _record.offsets/.blob         whole record as JSON for records that don't fit the layout ('' otherwise)
+#     index.*                       prebuilt InvertedIndex: sorted terms, postings offsets, positions, frequencies, lengths
+MAGIC = b'MEMSNAP\0'
+VERSION = 1
+HEADER = struct.Struct('=8sIIQqQ')
+SECTION = struct.Struct('=24sQQ')
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+# Record layouts, in key order. Kinds: text (string blob), category (dictionary-encoded), json, timestamp
+FACT_SCHEMA = (('content', 'text'), ('category', 'category'), ('timestamp', 'timestamp'))
+CONVERSATION_SCHEMA = (
+    ('user_message', 'text'), ('agent_response', 'text'), ('metadata', 'json'), ('timestamp', 'timestamp')
+)
+
+def snapshot_path(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + '.snapshot'
+
+def _source_stat(source_path: str) -> Tuple[int, int]:
+    stat = os.stat(source_path)
+    return stat.st_mtime_ns, stat.st_size
+
+def _columns(record: Dict[str, Any], schema: tuple) -> Optional[Dict[str, Any]]:
+    '''Column values of a record, or None if it doesn't fit the layout (stored as whole-record JSON instead).'''
+    if list(record) != [field for field, _ in schema]:
+        return None
+    values = {}
+    for field, kind in schema:
+        value = record[field]
+        if kind == 'text' and not isinstance(value, str):
+            return None
+        if kind == 'category' and value is not None and not isinstance(value, str):
+            return None
+        if kind == 'json':
+            value = json.dumps(value)
+        if kind == 'timestamp':
+            try:
+                moment = datetime.datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                return None
+            if moment.tzinfo is not None or moment.isoformat() != value:
+                return None
+            value = (moment - EPOCH) // MICROSECOND
+        values[field] = value
+    return values
+
+def _string_column(strings: List[str]) -> Tuple[array.array, bytes]:
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = array.array('Q', [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    return offsets, b''.join(encoded)
+
+def write_snapshot(path: str, source_path: str, records: List[Dict[str, Any]], schema: tuple, index=None):
+    '''Write a snapshot of records (and of index, an InvertedIndex synced to them) that is fresh for source_path.'''
+    sections: Dict[str, bytes] = {'schema': json.dumps(schema).encode()}
+    strings = {field: [] for field, kind in schema if kind in ('text', 'json')}
+    categories = {field: [] for field, kind in schema if kind == 'category'}
+    timestamps = {field: array.array('q') for field, kind in schema if kind == 'timestamp'}
+    whole_records = []
+
+    for record in records:
+        values = _columns(record, schema)
+        whole_records.append('' if values is not None else json.dumps(record))
+        values = values or {}
+        for field in strings:
+            strings[field].append(values.get(field, ''))
+        for field in categories:
+            categories[field].append(values.get(field))
+        for field in timestamps:
+            timestamps[field].append(values.get(field, 0))
+
+    for field, column in list(strings.items()) + [('_record', whole_records)]:
+        offsets, blob = _string_column(column)
+        sections[f'{field}.offsets'], sections[f'{field}.blob'] = offsets.tobytes(), blob
+    for field, column in categories.items():
+        dictionary = sorted({value for value in column if value is not None})
+        code_of = {value: code for code, value in enumerate(dictionary, 1)}
+        offsets, blob = _string_column(dictionary)
+        sections[f'{field}.codes'] = array.array('I', [code_of.get(value, 0) for value in column]).tobytes()
+        sections[f'{field}.values.offsets'], sections[f'{field}.values.blob'] = offsets.tobytes(), blob
+    for field, column in timestamps.items():
+        sections[field] = column.tobytes()
+
+    if index is not None:
+        terms = sorted(index.postings, key=lambda term: term.encode('utf-8'))
+        postings_offsets, positions, frequencies = array.array('Q', [0]), array.array('I'), array.array('I')
+        for term in terms:
+            postings = index.postings[term]
+            positions.extend(postings.keys())
+            frequencies.extend(postings.values())
+            postings_offsets.append(len(positions))
+        term_offsets, term_blob = _string_column(terms)
+        sections['index.terms.offsets'], sections['index.terms.blob'] = term_offsets.tobytes(), term_blob
+        sections['index.postings'] = postings_offsets.tobytes()
+        sections['index.positions'], sections['index.frequencies'] = positions.tobytes(), frequencies.tobytes()
+        sections['index.lengths'] = array.array('I', index.lengths).tobytes()
+        sections['index.total'] = array.array('Q', [index.total_length]).tobytes()
+
+    # Lay out header, section table and 8-byte aligned sections
+    table, body, offset = [], [], HEADER.size + SECTION.size * len(sections)
+    for name, data in sections.items():
+        padding = -offset % 8
+        body.append(b'\0' * padding + data)
+        offset += padding
+        table.append(SECTION.pack(name.encode(), offset, len(data)))
+        offset += len(data)
+    mtime_ns, size = _source_stat(source_path)
+    header = HEADER.pack(MAGIC, VERSION, len(sections), len(records), mtime_ns, size)
+
+    # Write next to the target and swap in, so open snapshots (mapped by running processes) stay valid
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(header + b''.join(table) + b''.join(body))
+    os.replace(tmp_path, path)
+
+class Snapshot:
+    '''A memory-mapped snapshot file; sections are read in place.'''
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self.magic, self.version, section_count, self.count, self.source_mtime_ns, self.source_size = (
+            HEADER.unpack_from(self._mmap, 0)
+        )
+        self.sections = {}
+        if self.magic != MAGIC or self.version != VERSION:
+            return
+        for i in range(section_count):
+            name, offset, length = SECTION.unpack_from(self._mmap, HEADER.size + i * SECTION.size)
+            self.sections[name.rstrip(b'\0').decode()] = (offset, length)
+
+    def raw(self, name: str) -> memoryview:
+        offset, length = self.sections[name]
+        return self._view[offset:offset + length]
+
+    def column(self, name: str, typecode: str) -> memoryview:
+        return self.raw(name).cast(typecode)
+
+    def strings(self, name: str) -> 'StringColumn':
+        return StringColumn(self.column(f'{name}.offsets', 'Q'), self.raw(f'{name}.blob'))
+
+    def restore_index(self, index, records: 'SnapshotRecords'):
+        '''Point an InvertedIndex at the prebuilt index, as if it had been synced to records.'''
+        index.postings = SnapshotPostings(self)
+        index.lengths = array.array('I', self.column('index.lengths', 'I'))
+        index.total_length = self.column('index.total', 'Q')[0]
+        index._last = records[-1] if len(records) else None
+
+class StringColumn:
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def bytes_at(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i: int) -> str:
+        return self.bytes_at(i).decode('utf-8')
+
+def load_snapshot(path: str, source_path: str, schema: tuple) -> Optional[Snapshot]:
+    '''The snapshot at path if it is fresh (source_path unchanged since it was written, same layout), else None.'''
+    if not os.path.exists(path) or not os.path.exists(source_path):
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if not snapshot.sections or (snapshot.source_mtime_ns, snapshot.source_size) != _source_stat(source_path):
+        return None
+    if json.loads(bytes(snapshot.raw('schema'))) != json.loads(json.dumps(schema)):
+        return None
+    return snapshot
+
+class SnapshotRecords(MutableSequence):
+    '''
+    A record store backed by a snapshot: records are decoded on first access and then cached,
+    appends go to RAM, and any other mutation materializes the whole store first.
+    '''
+    def __init__(self, snapshot: Snapshot, schema: tuple):
+        self._schema = schema
+        self._count = snapshot.count
+        self._cache: Dict[int, Dict[str, Any]] = {}
+        self._appended: List[Dict[str, Any]] = []
+        self._whole_records = snapshot.strings('_record')
+        self._columns = {}
+        for field, kind in schema:
+            if kind in ('text', 'json'):
+                self._columns[field] = snapshot.strings(field)
+            elif kind == 'category':
+                values = snapshot.strings(f'{field}.values')
+                self._columns[field] = (snapshot.column(f'{field}.codes', 'I'), [None] + [values[i] for i in range(len(values))])
+            else:
+                self._columns[field] = snapshot.column(field, 'q')
+
+    def _decode(self, i: int) -> Dict[str, Any]:
+        whole_record = self._whole_records.bytes_at(i)
+        if whole_record:
+            return json.loads(whole_record)
+        record = {}
+        for field, kind in self._schema:
+            column = self._columns[field]
+            if kind == 'text':
+                record[field] = column[i]
+            elif kind == 'json':
+                record[field] = json.loads(column.bytes_at(i))
+            elif kind == 'category':
+                codes, values = column
+                record[field] = values[codes[i]]
+            else:
+                record[field] = (EPOCH + column[i] * MICROSECOND).isoformat()
+        return record
+
+    def copy(self) -> 'SnapshotRecords':
+        '''Shallow copy (same record dicts) that stays fixed while the original grows, e.g. for a writer thread.'''
+        records = SnapshotRecords.__new__(SnapshotRecords)
+        records.__dict__.update(self.__dict__)
+        records._cache = dict(self._cache)
+        records._appended = list(self._appended)
+        return records
+
+    def _materialize(self):
+        if self._count:
+            self._appended = [self[i] for i in range(self._count)] + self._appended
+            self._count, self._cache = 0, {}
+
+    def __len__(self) -> int:
+        return self._count + len(self._appended)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('record index out of range')
+        if i >= self._count:
+            return self._appended[i - self._count]
+        record = self._cache.get(i)
+        if record is None:
+            record = self._cache[i] = self._decode(i)
+        return record
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, record: Dict[str, Any]):
+        self._appended.append(record)
+
+    def __setitem__(self, i, record):
+        self._materialize()
+        self._appended[i] = record
+
+    def __delitem__(self, i):
+        self._materialize()
+        del self._appended[i]
+
+    def insert(self, i: int, record: Dict[str, Any]):
+        self._materialize()
+        self._appended.insert(i, record)
+
+class SnapshotPostings(MutableMapping):
+    '''InvertedIndex postings backed by a snapshot: a term's postings are found by binary search and decoded on first use.'''
+    def __init__(self, snapshot: Snapshot):
+        self._terms = snapshot.strings('index.terms')
+        self._offsets = snapshot.column('index.postings', 'Q')
+        self._positions = snapshot.column('index.positions', 'I')
+        self._frequencies = snapshot.column('index.frequencies', 'I')
+        self._cache: Dict[str, Dict[int, int]] = {}
+        self._deleted = set()
+
+    def _find(self, term: str) -> int:
+        key = term.encode('utf-8')
+        low, high = 0, len(self._terms)
+        while low < high:
+            middle = (low + high) // 2
+            if self._terms.bytes_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self._terms) and self._terms.bytes_at(low) == key else -1
+
+    def __getitem__(self, term: str) -> Dict[int, int]:
+        postings = self._cache.get(term)
+        if postings is None:
+            i = -1 if term in self._deleted else self._find(term)
+            if i < 0:
+                raise KeyError(term)
+            start, end = self._offsets[i], self._offsets[i + 1]
+            postings = self._cache[term] = dict(zip(self._positions[start:end], self._frequencies[start:end]))
+        return postings
+
+    def __setitem__(self, term: str, postings: Dict[int, int]):
+        self._cache[term] = postings
+        self._deleted.discard(term)
+
+    def __delitem__(self, term: str):
+        self[term]
+        self._cache.pop(term, None)
+        self._deleted.add(term)
+
+    def __iter__(self):
+        for i in range(len(self._terms)):
+            term = self._terms[i]
+            if term not in self._deleted:
+                yield term
+        for term in self._cache:
+            if self._find(term) < 0:
+                yield term
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+if __name__ == '__main__':
+    from memory import Memory
+    from search_eval import generate_store
+
+    parser = argparse.ArgumentParser(description='Compact a Memory store (write binary snapshots) and compare cold starts')
+    parser.add_argument('--storage-dir', default='./agent_memory')
+    parser.add_argument('--synthetic', type=int, help='Benchmark a synthetic store of this many facts and conversations')
+    parser.add_argument('--query', default='alice python latency')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        storage_dir = args.storage_dir
+        if args.synthetic:
+            storage_dir = os.path.join(scratch, 'memory')
+            generate_store(storage_dir, args.synthetic, args.synthetic)
+
+        start = time.perf_counter()
+        Memory(storage_dir=storage_dir).compact()
+        print(f'🗜️  Compacted {storage_dir} in {(time.perf_counter() - start) * 1000:.0f}ms')
+        for name in sorted(os.listdir(storage_dir)):
+            print(f'\t{name:<36} {os.path.getsize(os.path.join(storage_dir, name)) / 1024:>10.1f} KB')
+
+        print(f'\n⏱️  COLD START (load + first bm25 search of facts and conversations)')
+        print(f'\t{"source":<10} {"load ms":>9} {"first search ms":>16} {"total ms":>9}')
+        for snapshots in (False, True):
+            start = time.perf_counter()
+            memory = Memory(storage_dir=storage_dir, snapshots=snapshots)
+            loaded = time.perf_counter()
+            memory.search_facts(args.query, mode='bm25')
+            memory.search_conversations(args.query, mode='bm25')
+            searched = time.perf_counter()
+            print(
+                f'\t{"snapshot" if snapshots else "json":<10} {(loaded - start) * 1000:>9.2f} '
+                f'{(searched - loaded) * 1000:>16.2f} {(searched - start) * 1000:>9.2f}'
+            )
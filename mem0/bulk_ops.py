@@ -0,0 +1,152 @@
+import inspect
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# progress(done, total) - total is None when the backend can't count cheaply
+Progress = Optional[Callable[[int, Optional[int]], None]]
+
+def to_record(memory_id, payload: dict) -> dict:
+    '''Export record for one memory: id, text, timestamps and the remaining metadata.'''
+    payload = dict(payload or {})
+    return {
+        'id': str(memory_id),
+        'memory': payload.pop('data', None),
+        'created_at': payload.pop('created_at', None),
+        'updated_at': payload.pop('updated_at', None),
+        'metadata': payload,
+    }
+
+
+# Pagers: walk one user's memories page by page
+class PostgresMemoryPager:
+    '''
+    Keyset (cursor) pagination straight over the vecs table behind mem0's supabase vector store.
+    Each page is one indexed range query (id > cursor), so memory use is bounded by the page size
+    no matter how many memories the user has. Connections come from the shared DatabasePool.
+    '''
+    def __init__(self, db_pool, collection_name: str = 'memories', schema: str = 'vecs'):
+        self.db_pool = db_pool
+        self.table = f'"{schema}"."{collection_name}"'
+
+    def count(self, user_id: str) -> int:
+        with self.db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {self.table} WHERE metadata->>'user_id' = %s", (user_id,))
+            return cursor.fetchone()[0]
+
+    def pages(self, user_id: str, page_size: int = 500) -> Iterator[List[dict]]:
+        cursor_id = ''
+        while True:
+            # One pooled connection per page, so a slow consumer never pins a connection
+            with self.db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT id, metadata FROM {self.table} "
+                    f"WHERE metadata->>'user_id' = %s AND id > %s ORDER BY id LIMIT %s",
+                    (user_id, cursor_id, page_size),
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            yield [to_record(memory_id, payload) for memory_id, payload in rows]
+            cursor_id = rows[-1][0]
+            if len(rows) < page_size:
+                return
+
+class VectorStorePager:
+    '''Pages straight from a vector store that supports keyset paging (the local ANN store).'''
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+
+    def count(self, user_id: str) -> int:
+        return len(self.vector_store.list(filters={'user_id': user_id}, top_k=None)[0])
+
+    def pages(self, user_id: str, page_size: int = 500) -> Iterator[List[dict]]:
+        for page in self.vector_store.pages({'user_id': user_id}, page_size):
+            yield [to_record(record.id, record.payload) for record in page]
+
+class GetAllPager:
+    '''
+    Fallback for vector stores without cursor access: one bounded memory.get_all, served in pages.
+    Accounts larger than max_records are truncated (a warning is logged).
+    '''
+    def __init__(self, memory, max_records: int = 10000):
+        self.memory = memory
+        self.max_records = max_records
+        # mem0 >= 1.0 scopes get_all with filters/top_k; older versions take user_id/limit
+        self._scoped_by_filters = 'filters' in inspect.signature(memory.get_all).parameters
+
+    def count(self, user_id: str) -> Optional[int]:
+        return None
+
+    def pages(self, user_id: str, page_size: int = 500) -> Iterator[List[dict]]:
+        if self._scoped_by_filters:
+            response = self.memory.get_all(filters={'user_id': user_id}, top_k=self.max_records)
+        else:
+            response = self.memory.get_all(user_id=user_id, limit=self.max_records)
+        results = response.get('results', [])
+        if len(results) >= self.max_records:
+            logger.warning('get_all returned %d memories for %s; export/delete may be truncated', len(results), user_id)
+        for start in range(0, len(results), page_size):
+            page = results[start:start + page_size]
+            yield [
+                to_record(item['id'], {'data': item.get('memory'), **{k: v for k, v in item.items() if k not in ('id', 'memory')}})
+                for item in page
+            ]
+
+def make_pager(memory, config: dict, db_pool=None):
+    '''Pick the cheapest pager for the configured vector store.'''
+    vector_store = config.get('vector_store', {})
+    if vector_store.get('provider') == 'supabase' and db_pool:
+        store_config = vector_store.get('config', {})
+        return PostgresMemoryPager(db_pool, store_config.get('collection_name', 'memories'))
+    if hasattr(getattr(memory, 'vector_store', None), 'pages'):
+        return VectorStorePager(memory.vector_store)
+    return GetAllPager(memory)
+
+
+# Bulk operations
+def export_user_memories(pager, user_id: str, out, page_size: int = 500, progress: Progress = None) -> int:
+    '''Stream a user's memories to a text file object as JSON lines, one page at a time.'''
+    total = pager.count(user_id)
+    done = 0
+    for page in pager.pages(user_id, page_size):
+        out.writelines(json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in page)
+        done += len(page)
+        if progress:
+            progress(done, total)
+    return done
+
+def delete_user_memories(
+    memory,
+    pager,
+    user_id: str,
+    batch_size: int = 100,
+    max_workers: int = 8,
+    progress: Progress = None,
+) -> int:
+    '''
+    Delete all of a user's memories in batches via memory.delete (keeps mem0's history consistent).
+    Ids come from the pager's cursor, so accounts of any size are handled without loading them all.
+    '''
+    total = pager.count(user_id)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page in pager.pages(user_id, batch_size):
+            results = executor.map(_delete_one, [memory] * len(page), [record['id'] for record in page])
+            done += sum(results)
+            if progress:
+                progress(done, total)
+    return done
+
+def _delete_one(memory, memory_id: str) -> int:
+    try:
+        memory.delete(memory_id)
+        return 1
+    except ValueError:
+        # Already gone (e.g. deleted concurrently)
+        return 0
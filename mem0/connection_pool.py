@@ -0,0 +1,222 @@
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+class DatabasePool:
+    '''
+    One bounded SQLAlchemy pool for DATABASE_URL, shared by mem0's vector store (vecs) and our own queries.
+    - pool_size connections are kept open, up to max_overflow more are opened under load,
+      and callers wait at most pool_timeout seconds for a free connection.
+    - Connections are pinged on checkout (pre-ping) and recycled after recycle_seconds,
+      so a connection dropped by Supabase's pooler is replaced instead of failing a request.
+    '''
+    def __init__(
+        self,
+        connection_string: str = None,
+        pool_size: int = 5,
+        max_overflow: int = 5,
+        pool_timeout: float = 10.0,
+        recycle_seconds: int = 1800,
+        engine: Engine = None,
+    ):
+        self.engine = engine or create_engine(
+            connection_string,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=recycle_seconds,
+            pool_pre_ping=True,
+        )
+        self.stats = {
+            'connects': 0, 'connect_seconds': 0.0, 'checkouts': 0, 'invalidated': 0,
+            'acquires': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+        }
+        self._lock = threading.Lock()
+        self._connect_started = threading.local()
+
+        event.listen(self.engine, 'do_connect', self._on_do_connect)
+        event.listen(self.engine, 'connect', self._on_connect)
+        event.listen(self.engine, 'checkout', self._on_checkout)
+        event.listen(self.engine, 'invalidate', self._on_invalidate)
+
+    def _on_do_connect(self, dialect, conn_rec, cargs, cparams):
+        self._connect_started.value = time.perf_counter()
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        elapsed = time.perf_counter() - getattr(self._connect_started, 'value', time.perf_counter())
+        with self._lock:
+            self.stats['connects'] += 1
+            self.stats['connect_seconds'] += elapsed
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.stats['checkouts'] += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.stats['invalidated'] += 1
+        logger.warning('database connection invalidated: %s', exception)
+
+    @contextmanager
+    def connection(self):
+        '''Raw DBAPI (psycopg2) connection from the pool; commits on success, rolls back on error.'''
+        start = time.perf_counter()
+        conn = self.engine.raw_connection()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.stats['acquires'] += 1
+            self.stats['wait_seconds'] += waited
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()  # back to the pool
+
+    def attach(self, memory):
+        '''Point mem0's supabase vector store (a vecs client) at this pool instead of its own default engine.'''
+        client = memory.vector_store.db
+        if client.engine is not self.engine:
+            client.engine.dispose()
+            client.engine = self.engine
+            client.Session = sessionmaker(self.engine)
+
+    def report(self) -> str:
+        pool = self.engine.pool
+        in_use = pool.checkedout() if hasattr(pool, 'checkedout') else 0
+        idle = pool.checkedin() if hasattr(pool, 'checkedin') else 0
+        connects = self.stats['connects']
+        acquires = self.stats['acquires']
+        return (
+            f'in use={in_use} idle={idle} connects={connects} '
+            f'avg connect={self.stats["connect_seconds"] / connects * 1000 if connects else 0:.1f}ms '
+            f'checkouts={self.stats["checkouts"]} invalidated={self.stats["invalidated"]} '
+            f'avg wait={self.stats["wait_seconds"] / acquires * 1000 if acquires else 0:.1f}ms '
+            f'max wait={self.stats["max_wait_seconds"] * 1000:.1f}ms'
+        )
+
+class HttpClientStats:
+    '''Request counters for a keep-alive httpx client (attached through event hooks).'''
+    def __init__(self):
+        self.stats = {'requests': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def on_response(self, response: httpx.Response):
+        with self._lock:
+            self.stats['requests'] += 1
+            if response.status_code >= 500:
+                self.stats['errors'] += 1
+
+def create_http_client(
+    max_connections: int = 20,
+    max_keepalive_connections: int = 10,
+    keepalive_expiry: float = 60.0,
+    timeout: float = 60.0,
+    limiter=None,
+):
+    '''
+    Shared keep-alive HTTP client (thread-safe), so requests reuse open TLS connections instead of handshaking each time.
+    With a limiter (llm_limiter.LLMLimiter), LLM and embedding requests also go through its rate limits and retries.
+    Returns (client, stats).
+    '''
+    stats = HttpClientStats()
+    transport = httpx.HTTPTransport(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+    )
+    if limiter is not None:
+        from llm_limiter import RateLimitedTransport
+        transport = RateLimitedTransport(limiter, transport)
+    client = httpx.Client(
+        transport=transport,
+        timeout=timeout,
+        event_hooks={'response': [stats.on_response]},
+    )
+    return client, stats
+
+
+# Benchmark: pooled vs connect-per-request
+def stand_in_engine(connect_latency_ms: float, pooled: bool, pool_size: int = 5) -> Engine:
+    '''
+    Local stand-in for a remote Postgres: SQLite behind a fixed connect delay
+    (TCP + TLS + auth handshake to Supabase is typically tens of milliseconds).
+    '''
+    def connect():
+        time.sleep(connect_latency_ms / 1000)
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+    if pooled:
+        return create_engine(
+            'sqlite://', creator=connect, poolclass=QueuePool, pool_size=pool_size, max_overflow=0, pool_pre_ping=True
+        )
+    return create_engine('sqlite://', creator=connect, poolclass=NullPool)
+
+def run_benchmark(
+    requests: int = 500,
+    concurrency: int = 10,
+    connect_latency_ms: float = 30.0,
+    pool_size: int = 5,
+    database_url: str = None,
+):
+    '''Per-request time (acquire + SELECT 1) without and with pooling, against DATABASE_URL or the local stand-in.'''
+    target = 'database-url' if database_url else f'stand-in ({connect_latency_ms:.0f}ms connect)'
+    print(f'\n🔌 CONNECTION POOL BENCHMARK: {requests} requests, concurrency {concurrency}, pool size {pool_size}, {target}')
+    print(f'\t{"mode":<22} {"p50 ms":>8} {"p95 ms":>8} {"connects":>9} {"req/s":>8}')
+
+    for label, pooled in (('connect per request', False), ('pooled', True)):
+        if database_url:
+            engine = (
+                create_engine(database_url, pool_size=pool_size, max_overflow=0, pool_pre_ping=True)
+                if pooled else create_engine(database_url, poolclass=NullPool)
+            )
+        else:
+            engine = stand_in_engine(connect_latency_ms, pooled, pool_size)
+        pool = DatabasePool(engine=engine)
+
+        def request(_):
+            start = time.perf_counter()
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+                cursor.close()
+            return time.perf_counter() - start
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = sorted(executor.map(request, range(requests)))
+        elapsed = time.perf_counter() - started
+        print(
+            f'\t{label:<22} {latencies[len(latencies) // 2] * 1000:>8.2f} {latencies[int(len(latencies) * 0.95)] * 1000:>8.2f} '
+            f'{pool.stats["connects"]:>9} {requests / elapsed:>8.0f}'
+        )
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark pooled vs per-request database connections')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--pool-size', type=int, default=5)
+    parser.add_argument('--connect-latency-ms', type=float, default=30.0, help='Connect delay of the local stand-in')
+    parser.add_argument('--database-url', help='Benchmark a real Postgres instead of the local stand-in')
+    args = parser.parse_args()
+    run_benchmark(args.requests, args.concurrency, args.connect_latency_ms, args.pool_size, args.database_url)
@@ -1,4 +1,8 @@
 import os
+import sys
+import logging
+import tempfile
+import time
 from dotenv import load_dotenv
 
 import streamlit as st
@@ -6,13 +10,26 @@ from openai import OpenAI
 from mem0 import Memory
 import supabase
 
+from search_cache import MemorySearchCache
+from memory_writer import BackgroundMemoryWriter
+from bulk_ops import make_pager, export_user_memories, delete_user_memories
+from local_vector_store import PROVIDER as LOCAL_VECTOR_STORE, register_local_vector_store
+from connection_pool import DatabasePool, create_http_client
+from quick_actions import QuickActionPrecomputer
+
+# Shared LLM rate limiter, retries and hedging (llm_client/llm_limiter.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'llm_client'))
+from llm_limiter import get_limiter, limit_mem0
+
 load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Init supabase client
-supabase_client = supabase.create_client(
-    supabase_url=os.getenv('SUPABASE_URL'),
-    supabase_key=os.getenv('SUPABASE_API_KEY')
-)
+# LLM_PROVIDER=mock points the coach and mem0's LLM/embedder at the local mock server (mock_llm/server.py)
+LLM_BASE_URL = None
+if os.getenv('LLM_PROVIDER') == 'mock':
+    LLM_BASE_URL = os.getenv('MOCK_LLM_URL', 'http://127.0.0.1:8900/v1')
+    os.environ.setdefault('OPENAI_API_KEY', 'mock')
+register_local_vector_store()
 
 # Streamlit page config
 st.set_page_config(
@@ -22,35 +39,134 @@ st.set_page_config(
     initial_sidebar_state='expanded'
 )
 
-# Cache OpenAI client and Memory instance
+# Process-wide keep-alive HTTP clients: every session reuses open TLS connections
+# OpenAI calls (ours and mem0's) also go through the process-wide LLM limiter, which does the retrying
 @st.cache_resource
-def get_openai_client():
-    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+def get_http_client(name):
+    client, stats = create_http_client(
+        max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', '20')),
+        limiter=get_limiter() if name == 'openai' else None,
+    )
+    return client, stats
 
+# Cache OpenAI client and Memory instance
 @st.cache_resource
-def get_memory():
-    config = {
-        "llm": {
-            "provider": "openai",
-            "config": {
-                "model": "gpt-4o-mini",
-            },
+def get_openai_client():
+    http_client, _ = get_http_client('openai')
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'), base_url=LLM_BASE_URL, http_client=http_client, max_retries=0)
+
+# Supabase client per browser session (it holds that user's auth session), sharing one connection pool
+def get_supabase_client():
+    if 'supabase_client' not in st.session_state:
+        http_client, _ = get_http_client('supabase')
+        st.session_state.supabase_client = supabase.create_client(
+            supabase_url=os.getenv('SUPABASE_URL'),
+            supabase_key=os.getenv('SUPABASE_API_KEY'),
+            options=supabase.ClientOptions(httpx_client=http_client),
+        )
+    return st.session_state.supabase_client
+
+# MEMORY_VECTOR_STORE=local keeps vectors on disk next to the app (no network round-trip, works offline)
+if os.getenv('MEMORY_VECTOR_STORE') == 'local':
+    VECTOR_STORE_CONFIG = {
+        "provider": LOCAL_VECTOR_STORE,
+        "config": {
+            "path": os.getenv("MEMORY_VECTOR_PATH", "mem0_vectors"),
+            "collection_name": "memories",
         },
-        "vector_store": {
-            "provider": "supabase",
-            "config": {
-                "connection_string": os.getenv("DATABASE_URL"),
-                "collection_name": "memories",
-            },
+    }
+else:
+    VECTOR_STORE_CONFIG = {
+        "provider": "supabase",
+        "config": {
+            "connection_string": os.getenv("DATABASE_URL"),
+            "collection_name": "memories",
         },
     }
 
-    
-    return Memory.from_config(config)
+MEMORY_CONFIG = {
+    "llm": {
+        "provider": "openai",
+        "config": {
+            "model": "gpt-4o-mini",
+        },
+    },
+    "vector_store": VECTOR_STORE_CONFIG,
+}
+if LLM_BASE_URL:
+    MEMORY_CONFIG["llm"]["config"]["openai_base_url"] = LLM_BASE_URL
+    MEMORY_CONFIG["embedder"] = {"provider": "openai", "config": {"openai_base_url": LLM_BASE_URL}}
+
+# One bounded, health-checked connection pool for DATABASE_URL (vecs and our own queries share it)
+@st.cache_resource
+def get_db_pool():
+    if VECTOR_STORE_CONFIG["provider"] != "supabase":
+        return None
+    return DatabasePool(
+        os.getenv("DATABASE_URL"),
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "5")),
+    )
+
+@st.cache_resource
+def get_memory():
+    memory = Memory.from_config(MEMORY_CONFIG)
+    limit_mem0(memory, get_http_client('openai')[0])
+    db_pool = get_db_pool()
+    if db_pool:
+        db_pool.attach(memory)
+    return memory
+
+# Cursor-based pager over a user's memories (for bulk export/delete)
+@st.cache_resource
+def get_memory_pager():
+    return make_pager(get_memory(), MEMORY_CONFIG, get_db_pool())
+
+# Process-wide search cache, shared by all sessions and invalidated on memory.add
+@st.cache_resource
+def get_memory_cache():
+    return MemorySearchCache(
+        get_memory(),
+        ttl_seconds=float(os.getenv('MEMORY_CACHE_TTL', '120')),
+    )
+
+# Process-wide background writer: memory.add runs off the response path and survives reruns
+@st.cache_resource
+def get_memory_writer():
+    return BackgroundMemoryWriter(
+        get_memory_cache(),
+        coalesce_delay=float(os.getenv('MEMORY_WRITE_DELAY', '2')),
+    )
 
 # Get cached resources
 openai_client = get_openai_client()
+supabase_client = get_supabase_client()
 memory = get_memory()
+db_pool = get_db_pool()
+memory_cache = get_memory_cache()
+memory_writer = get_memory_writer()
+memory_pager = get_memory_pager()
+
+def progress_reporter(progress_bar, action):
+    '''Progress callback for bulk operations that updates a Streamlit progress bar.'''
+    def report(done, total):
+        if total:
+            progress_bar.progress(min(done / total, 1.0), text=f'{action} {done}/{total} memories')
+        else:
+            progress_bar.progress(0.5, text=f'{action} {done} memories')
+    return report
+
+# Fixed Quick Action prompts (pre-warmed in the memory cache at sign-in)
+QUICK_ACTIONS = [
+    ('📝 Today Workout', 'Can you suggest a workout for me today based on my fitness level and goals?'),
+    ('🍎 Nutrition Advice', 'Can you give me some nutrition tips based on my dietary preferences and fitness goals?'),
+    ('📊 Track Progress', 'I want to track my fitness progress. What metrics should I be monitoring and how?'),
+    ('🧘 Recovery Tips', 'What are some good recovery practices I should incorporate into my fitness routine?'),
+]
+
+def prewarm_quick_actions(user_id):
+    memory_cache.prewarm([prompt for _, prompt in QUICK_ACTIONS], user_id)
+    quick_action_answers.refresh(user_id)
 
 # Authentication functions
 def sign_up(email, password, full_name):
@@ -69,6 +185,7 @@ def sign_up(email, password, full_name):
             print(response)
             st.session_state.authenticated = True
             st.session_state.user = response.user
+            prewarm_quick_actions(response.user.id)
             st.rerun()
         return response
     except Exception as e:
@@ -85,6 +202,7 @@ def sign_in(email, password):
             # Store user info in session state
             st.session_state.authenticated = True
             st.session_state.user = response.user
+            prewarm_quick_actions(response.user.id)
             st.rerun()
         return response
     except Exception as e:
@@ -93,6 +211,9 @@ def sign_in(email, password):
             
 def sign_out():
     try:
+        # Make sure queued memories are written before the session ends
+        if st.session_state.user:
+            memory_writer.flush(st.session_state.user.id)
         supabase_client.auth.sign_out()
         # Clear authentication info from session state
         st.session_state.authenticated = False
@@ -102,9 +223,32 @@ def sign_out():
         st.error(f"Error signing out: {str(e)}")
 
 # Fitness Coach chat function with memory
-def get_response(message, user_id):
-    # Retrieve relavant memories
-    relevant_memories = memory.search(
+def record_timings(timings):
+    '''Keep the latest response timings (seconds) for this session and log them.'''
+    history = st.session_state.setdefault('response_timings', [])
+    history.append(timings)
+    del history[:-50]
+    logger.info(
+        'response timings: search=%.3fs ttft=%.3fs total=%.3fs',
+        timings['search'], timings.get('ttft', timings['total']), timings['total'],
+    )
+
+def timings_report():
+    history = st.session_state.get('response_timings', [])
+    if not history:
+        return 'no responses yet'
+    last = history[-1]
+    ttfts = sorted(t.get('ttft', t['total']) for t in history)
+    totals = sorted(t['total'] for t in history)
+    return (
+        f'last ttft={last.get("ttft", last["total"]):.2f}s total={last["total"]:.2f}s | '
+        f'median over {len(history)}: ttft={ttfts[len(ttfts) // 2]:.2f}s total={totals[len(totals) // 2]:.2f}s'
+    )
+
+def build_messages(message, user_id):
+    '''System prompt with the user's relevant memories, followed by the user message.'''
+    # Retrieve relavant memories (cached per user until their next memory.add)
+    relevant_memories = memory_cache.search(
         query=message,
         user_id=user_id,
         limit=5
@@ -126,26 +270,84 @@ User's Relevant Memories:
     
 Always be supportive, encouraging, and provide actionable advice. Don't mention the memory system directly to the user - they should just experience personalized advice.'''
     
-    messages = [
+    return [
         {'role': 'system', 'content': system_prompt},
         {'role': 'user', 'content': message}
     ]
+
+def get_response(message, user_id):
+    '''Stream the coach's reply into the current container and return the complete text.'''
+    start = time.perf_counter()
+    timings = {}
+    messages = build_messages(message, user_id)
+    timings['search'] = time.perf_counter() - start
     
-    with st.spinner('Thinking...'):
-        response = openai_client.chat.completions.create(
-            model='gpt-4o-mini',
-            messages=messages,
-        )
-        response_text = response.choices[0].message.content
+    # Stream tokens into the current container (the assistant chat bubble) as they arrive
+    placeholder = st.empty()
+    response_text = ''
+    stream = openai_client.chat.completions.create(
+        model='gpt-4o-mini',
+        messages=messages,
+        stream=True,
+    )
+    for chunk in stream:
+        token = chunk.choices[0].delta.content if chunk.choices else None
+        if token:
+            timings.setdefault('ttft', time.perf_counter() - start)
+            response_text += token
+            placeholder.markdown(response_text + '▌')
+    placeholder.markdown(response_text)
+    timings['total'] = time.perf_counter() - start
+    record_timings(timings)
         
     # Create new memories from the conversation
     messages.append(
         {'role': 'assistant', 'content': response_text}
     )
-    memory.add(messages=messages, user_id=user_id)
+    memory_writer.submit(messages, user_id)
+    logger.info('memory search cache: %s', memory_cache.report())
+    logger.info('memory writer: %s', memory_writer.report())
     
     return response_text
 
+def generate_answer(message, user_id):
+    '''Non-streaming reply for background precomputation (no Streamlit calls, no memory write).'''
+    response = openai_client.chat.completions.create(
+        model='gpt-4o-mini',
+        messages=build_messages(message, user_id),
+    )
+    return response.choices[0].message.content
+
+# Quick Action answers regenerated in the background whenever a user's memories change
+@st.cache_resource
+def get_quick_action_answers():
+    precomputer = QuickActionPrecomputer(
+        generate_answer,
+        memory_cache.version,
+        [prompt for _, prompt in QUICK_ACTIONS],
+    )
+    memory_cache.add_listener(precomputer.refresh)
+    return precomputer
+
+quick_action_answers = get_quick_action_answers()
+
+def show_quick_action_answer(prompt, user_id):
+    '''
+    Render a precomputed Quick Action answer if it is current for the user; returns it (or None).
+    The exchange is written to memory just like a generated reply.
+    '''
+    start = time.perf_counter()
+    answer = quick_action_answers.get(user_id, prompt)
+    if answer is None:
+        return None
+    st.markdown(answer)
+    elapsed = time.perf_counter() - start
+    record_timings({'search': 0.0, 'ttft': elapsed, 'total': elapsed})
+
+    # Create new memories from the conversation (the search is usually cached from the precompute)
+    memory_writer.submit(build_messages(prompt, user_id) + [{'role': 'assistant', 'content': answer}], user_id)
+    return answer
+
 # Init session state
 if not st.session_state.get('messages', None):
     st.session_state.messages = []
@@ -262,44 +464,68 @@ with st.sidebar:
 - Dietary Preferences: {st.session_state.health_profile["dietary_preferences"]}
 - Medical Conditions: {st.session_state.health_profile["medical_conditions"]}'''
                     
-                    # Add the profile message to memory
-                    memory.add(
-                        messages=[
+                    # Add the profile message to memory (in the background)
+                    memory_writer.submit(
+                        [
                             {'role': 'system', 'content': 'Health profile updated'},
                             {'role': 'user', 'content': profile_message}
                         ],
-                        user_id=user.id
+                        user.id
                     )
                     
                     st.success('Health profile saved successfully!')
             
             # Memory management options
             st.subheader('Memory Management')
-            if st.button('Clear All Memories'):
+            st.caption(f'Memory search cache: {memory_cache.report()}')
+            st.caption(f'Memory writer: {memory_writer.report()}')
+            st.caption(f'Response latency: {timings_report()}')
+            st.caption(
+                f'Quick Action answers: {quick_action_answers.current(user.id)}/{len(QUICK_ACTIONS)} current, '
+                f'{quick_action_answers.report()}'
+            )
+            if db_pool:
+                st.caption(f'Database pool: {db_pool.report()}')
+            http_requests = ' '.join(f'{name}={get_http_client(name)[1].stats["requests"]}' for name in ('openai', 'supabase'))
+            st.caption(f'HTTP requests (keep-alive): {http_requests}')
+            st.caption(f'LLM limiter: {get_limiter().report()}')
+            if st.button('Export Memories'):
                 try:
-                    # Check if the memory object has a clear method
-                    if hasattr(memory, 'clear'):
-                        memory.clear(user_id=user.id)
-                    else:
-                        # Alternative approach if memory.clear() is not available.
-                        # Use the search and delete approach
-                        memories = memory.search(
-                            query='*',
-                            user_id=user.id,
-                            limit=1000
+                    # Include turns still queued for memory.add
+                    memory_writer.flush(user.id)
+                    # Stream pages straight to a temp file so large accounts never sit in RAM
+                    progress_bar = st.progress(0.0, text='Exporting memories...')
+                    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+                        exported = export_user_memories(
+                            memory_pager, user.id, f,
+                            progress=progress_reporter(progress_bar, 'Exported'),
                         )
-                        
-                        if memories and 'results' in memories:
-                            # Log information for debugging
-                            st.write(f'Found {len(memories["results"])} memories for user {user.id}')
-                            
-                            # We can't delete directly as we don't have a direct deletion API in memory object
-                            # Instead, we'll clear the session and inform the user
-                            st.info('Memory system does not support direct clearing. Session has been reset instead')
-                        
+                        st.session_state.export_path = f.name
+                    progress_bar.progress(1.0, text=f'Exported {exported} memories')
+                except Exception as e:
+                    st.error(f'Failed to export memories: {str(e)}')
+
+            if st.session_state.get('export_path'):
+                with open(st.session_state.export_path, 'rb') as f:
+                    st.download_button(
+                        'Download export (JSONL)', f, file_name='memories.jsonl', mime='application/jsonl'
+                    )
+
+            if st.button('Clear All Memories'):
+                try:
+                    # Don't let queued turns re-create memories after the clear
+                    memory_writer.flush(user.id)
+                    progress_bar = st.progress(0.0, text='Deleting memories...')
+                    deleted = delete_user_memories(
+                        memory, memory_pager, user.id,
+                        progress=progress_reporter(progress_bar, 'Deleted'),
+                    )
+                    memory_cache.invalidate(user.id)
+                    logger.info('deleted %d memories for user %s', deleted, user.id)
+
                     # Clear the session state
                     st.session_state.messages = []
-                    st.success('Chat history cleared successfully!')
+                    st.success(f'Deleted {deleted} memories and cleared chat history!')
                     st.rerun()
                 except Exception as e:
                     st.error(f'Failed to clear memories: {str(e)}')
@@ -311,41 +537,13 @@ if st.session_state.authenticated and st.session_state.user:
     
     st.write('I am your AI fitness coach with memory. I can provide personalized fitness advice')
     
-    # Quick action buttons
+    # Quick action buttons (answered in the chat below, like a typed message)
     st.subheader('Quick Actions')
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        if st.button('📝 Today Workout'):
-            quick_prompt = 'Can you suggest a workout for me today based on my fitness level and goals?'
-            st.session_state.messages.append({'role': 'user', 'content': quick_prompt})
-            response = get_response(quick_prompt, user_id)
-            st.session_state.messages.append({'role': 'assistant', 'content': response})
-            st.rerun()
-
-    with col2:
-        if st.button('🍎 Nutrition Advice'):
-            quick_prompt = 'Can you give me some nutrition tips based on my dietary preferences and fitness goals?'
-            st.session_state.messages.append({'role': 'user', 'content': quick_prompt})
-            response = get_response(quick_prompt, user_id)
-            st.session_state.messages.append({'role': 'assistant', 'content': response})
-            st.rerun()
-
-    with col3:
-        if st.button('📊 Track Progress'):
-            quick_prompt = 'I want to track my fitness progress. What metrics should I be monitoring and how?'
-            st.session_state.messages.append({'role': 'user', 'content': quick_prompt})
-            response = get_response(quick_prompt, user_id)
-            st.session_state.messages.append({'role': 'assistant', 'content': response})
-            st.rerun()
-
-    with col4:
-        if st.button('🧘 Recovery Tips'):
-            quick_prompt = 'What are some good recovery practices I should incorporate into my fitness routine?'
-            st.session_state.messages.append({'role': 'user', 'content': quick_prompt})
-            response = get_response(quick_prompt, user_id)
-            st.session_state.messages.append({'role': 'assistant', 'content': response})
-            st.rerun()
+    prompt = None
+    for column, (label, quick_prompt) in zip(st.columns(len(QUICK_ACTIONS)), QUICK_ACTIONS):
+        with column:
+            if st.button(label):
+                prompt = quick_prompt
 
     st.divider()
     
@@ -355,7 +553,7 @@ if st.session_state.authenticated and st.session_state.user:
             st.write(message['content'])
 
     # Chat input
-    user_input = st.chat_input('Ask your fitness coach...')
+    user_input = st.chat_input('Ask your fitness coach...') or prompt
     if user_input:
         # Add user message to chat history
         st.session_state.messages.append({'role': 'user', 'content': user_input})
@@ -364,15 +562,12 @@ if st.session_state.authenticated and st.session_state.user:
         with st.chat_message('user'):
             st.write(user_input)
         
-        # Get response 
-        response = get_response(user_input, user_id)
+        # Stream model response into its chat bubble (Quick Actions answer instantly when precomputed)
+        with st.chat_message('assistant'):
+            response = prompt and show_quick_action_answer(prompt, user_id) or get_response(user_input, user_id)
         
         # Add model response to chat history
         st.session_state.messages.append({'role': 'assistant', 'content': response})
-        
-        # Display model response
-        with st.chat_message('assistant'):
-            st.write(response)
 
 else:
     st.write('Please sign in to start chatting with your personal AI fitness coach')
@@ -0,0 +1,463 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from mem0.vector_stores.configs import VectorStoreConfig
+from mem0.utils.factory import VectorStoreFactory
+from mem0.vector_stores.base import VectorStoreBase
+
+logger = logging.getLogger(__name__)
+
+PROVIDER = 'local_ann'
+
+# Payload keys with an in-memory inverted index (other filter keys are checked on the payload)
+INDEXED_KEYS = ('user_id', 'agent_id', 'run_id')
+
+class LocalANNConfig(BaseModel):
+    collection_name: str = Field('mem0', description='Name of the collection')
+    path: Optional[str] = Field(None, description='Directory holding the vector file and metadata database')
+    embedding_model_dims: int = Field(1536, description='Dimension of the embedding vector')
+    nprobe: int = Field(8, description='IVF lists searched per query')
+    exact_threshold: int = Field(2048, description='Candidate sets up to this size are searched exactly')
+    min_train_size: int = Field(4096, description='Vectors needed before the IVF index is trained')
+
+class OutputData(BaseModel):
+    id: Optional[str]
+    score: Optional[float]
+    payload: Optional[Dict]
+
+
+class LocalANNVectorStore(VectorStoreBase):
+    '''
+    Local vector store for mem0: no network round-trip per search or add.
+    - Vectors live in a memory-mapped float32 file (unit-normalized, so cosine = dot product).
+    - An IVF index (spherical k-means centroids + inverted lists) narrows large searches to nprobe lists;
+      it is trained once min_train_size vectors exist and retrained whenever the collection doubles.
+    - Ids, payloads and list assignments are persisted in SQLite; user/agent/run ids are indexed in memory,
+      so a per-user search only scores that user's vectors (exactly, when there are few of them).
+    '''
+    def __init__(
+        self,
+        collection_name: str = 'mem0',
+        path: Optional[str] = None,
+        embedding_model_dims: int = 1536,
+        nprobe: int = 8,
+        exact_threshold: int = 2048,
+        min_train_size: int = 4096,
+    ):
+        self.collection_name = collection_name
+        self.root = path or f'/tmp/{PROVIDER}'
+        self.dims = embedding_model_dims
+        self.nprobe = nprobe
+        self.exact_threshold = exact_threshold
+        self.min_train_size = min_train_size
+        self._lock = threading.RLock()
+        self.create_col(collection_name)
+
+    # Storage
+    @property
+    def _dir(self) -> str:
+        return os.path.join(self.root, self.collection_name)
+
+    def create_col(self, name: str, vector_size: Optional[int] = None, distance: str = 'cosine'):
+        with self._lock:
+            self.collection_name = name
+            self.dims = vector_size or self.dims
+            os.makedirs(self._dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self._dir, 'meta.sqlite'), check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS records ('
+                'slot INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, payload TEXT NOT NULL, list_id INTEGER)'
+            )
+            self._db.execute('CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)')
+            self._load()
+            self._db.commit()
+        return self
+
+    def _load(self):
+        '''Open the vector file and rebuild the in-memory maps from SQLite.'''
+        self._ids: Dict[int, str] = {}
+        self._slots: Dict[str, int] = {}
+        self._payloads: Dict[int, dict] = {}
+        self._index: Dict[tuple, set] = {}
+        self._lists: List[set] = []
+        self._list_of: Dict[int, int] = {}
+        self._centroids: Optional[np.ndarray] = None
+
+        info = dict(self._db.execute('SELECT key, value FROM info'))
+        self.dims = int(info.get('dims', self.dims))
+        self._trained_at = int(info.get('trained_at', 0))
+        self._open_vectors(int(info.get('capacity', 1024)))
+
+        centroids_path = os.path.join(self._dir, 'centroids.npy')
+        if os.path.exists(centroids_path):
+            self._centroids = np.load(centroids_path)
+            self._lists = [set() for _ in range(len(self._centroids))]
+
+        for slot, memory_id, payload, list_id in self._db.execute('SELECT slot, id, payload, list_id FROM records'):
+            self._add_to_maps(slot, memory_id, json.loads(payload))
+            if list_id is not None and self._centroids is not None:
+                self._lists[list_id].add(slot)
+                self._list_of[slot] = list_id
+        self._next_slot = max(self._ids, default=-1) + 1
+        self._free = sorted(set(range(self._next_slot)) - set(self._ids), reverse=True)
+
+    def _open_vectors(self, capacity: int):
+        path = os.path.join(self._dir, 'vectors.f32')
+        size = capacity * self.dims * 4
+        with open(path, 'ab') as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, self.dims))
+        self._capacity = capacity
+        self._set_info(capacity=capacity, dims=self.dims)
+
+    def _set_info(self, **values):
+        self._db.executemany(
+            'INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)', [(k, str(v)) for k, v in values.items()]
+        )
+
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity != self._capacity:
+            self._vectors.flush()
+            del self._vectors
+            self._open_vectors(capacity)
+
+    def _index_payload(self, slot: int, payload: dict, add: bool = True):
+        for key in INDEXED_KEYS:
+            if payload.get(key) is None:
+                continue
+            if add:
+                self._index.setdefault((key, payload[key]), set()).add(slot)
+            else:
+                self._index.get((key, payload[key]), set()).discard(slot)
+
+    def _add_to_maps(self, slot: int, memory_id: str, payload: dict):
+        self._ids[slot] = memory_id
+        self._slots[memory_id] = slot
+        self._payloads[slot] = payload
+        self._index_payload(slot, payload)
+
+    def _remove_from_maps(self, slot: int):
+        self._index_payload(slot, self._payloads.pop(slot), add=False)
+        del self._slots[self._ids.pop(slot)]
+        list_id = self._list_of.pop(slot, None)
+        if list_id is not None:
+            self._lists[list_id].discard(slot)
+        self._free.append(slot)
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    # IVF index
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1)
+
+    def _train(self, iterations: int = 10, sample_size: int = 20000, seed: int = 0):
+        '''Spherical k-means on a sample of the live vectors, then reassign every vector to its nearest list.'''
+        slots = np.fromiter(self._ids, dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        sample = self._vectors[np.sort(rng.choice(slots, min(len(slots), sample_size), replace=False))]
+        nlist = max(1, int(np.sqrt(len(slots))))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~np.bincount(labels, minlength=nlist).astype(bool)
+            sums[empty] = centroids[empty]
+            centroids = self._normalize(sums)
+
+        self._centroids = centroids
+        np.save(os.path.join(self._dir, 'centroids.npy'), centroids)
+        self._lists = [set() for _ in range(nlist)]
+        self._list_of = {}
+        slots.sort()
+        chunks = np.array_split(slots, max(1, len(slots) // 8192))
+        labels = np.concatenate([self._assign(self._vectors[chunk]) for chunk in chunks])
+        for slot, list_id in zip(slots.tolist(), labels.tolist()):
+            self._lists[list_id].add(slot)
+            self._list_of[slot] = list_id
+        self._db.executemany('UPDATE records SET list_id = ? WHERE slot = ?', [(l, s) for s, l in self._list_of.items()])
+        self._trained_at = len(slots)
+        self._set_info(trained_at=self._trained_at)
+        logger.info('trained IVF index for %s: %d lists over %d vectors', self.collection_name, nlist, len(slots))
+
+    def _maybe_train(self):
+        if len(self._ids) >= self.min_train_size and len(self._ids) >= 2 * self._trained_at:
+            self._train()
+
+    # mem0 VectorStoreBase API
+    def insert(self, vectors: List[list], payloads: Optional[List[Dict]] = None, ids: Optional[List[str]] = None):
+        ids = ids or [str(uuid.uuid4()) for _ in vectors]
+        payloads = payloads or [{} for _ in vectors]
+        if not len(vectors) == len(payloads) == len(ids):
+            raise ValueError('Vectors, payloads, and IDs must have the same length')
+        normalized = self._normalize(vectors)
+
+        with self._lock:
+            for memory_id in ids:
+                if memory_id in self._slots:
+                    self._delete_slot(self._slots[memory_id])
+            slots = [self._free.pop() if self._free else self._take_slot() for _ in ids]
+            self._grow(max(slots) + 1)
+            self._vectors[slots] = normalized
+            labels = self._assign(normalized).tolist() if self._centroids is not None else [None] * len(slots)
+            for slot, memory_id, payload, list_id in zip(slots, ids, payloads, labels):
+                self._add_to_maps(slot, memory_id, dict(payload))
+                if list_id is not None:
+                    self._lists[list_id].add(slot)
+                    self._list_of[slot] = list_id
+            self._db.executemany(
+                'INSERT INTO records (slot, id, payload, list_id) VALUES (?, ?, ?, ?)',
+                [(s, i, json.dumps(p, default=str), l) for s, i, p, l in zip(slots, ids, payloads, labels)],
+            )
+            self._maybe_train()
+            self._vectors.flush()
+            self._db.commit()
+
+    def _take_slot(self) -> int:
+        self._next_slot += 1
+        return self._next_slot - 1
+
+    def _candidates(self, filters: Optional[Dict]) -> Optional[set]:
+        '''Slots matching the filters, or None for "everything".'''
+        if not filters:
+            return None
+        candidates = None
+        for key, value in filters.items():
+            if key in INDEXED_KEYS and not isinstance(value, (list, dict)):
+                members = self._index.get((key, value), set())
+                candidates = set(members) if candidates is None else candidates & members
+        residual = {k: v for k, v in filters.items() if k not in INDEXED_KEYS or isinstance(v, (list, dict))}
+        if residual:
+            pool = self._ids if candidates is None else candidates
+            candidates = {slot for slot in pool if self._matches(self._payloads[slot], residual)}
+        return candidates
+
+    @staticmethod
+    def _matches(payload: dict, filters: Dict) -> bool:
+        for key, value in filters.items():
+            if isinstance(value, list):
+                if payload.get(key) not in value:
+                    return False
+            elif isinstance(value, dict):
+                if 'in' in value and payload.get(key) not in value['in']:
+                    return False
+                if 'eq' in value and payload.get(key) != value['eq']:
+                    return False
+                if 'ne' in value and payload.get(key) == value['ne']:
+                    return False
+            elif payload.get(key) != value:
+                return False
+        return True
+
+    def _probe(self, query: np.ndarray, candidates: Optional[set], top_k: int) -> np.ndarray:
+        '''
+        Slots to score for the query: as many as an unfiltered search over nprobe lists would score.
+        Lists are visited nearest first until that many matching slots are found. A filtered pool that is
+        no larger than this is scanned exactly, since a filter's nearest matches are often far from the
+        query's own lists and probing would scan about as much while missing them.
+        '''
+        target = max(top_k, len(self._ids) * self.nprobe / len(self._lists))
+        if candidates is not None and len(candidates) <= target:
+            return np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        probed = []
+        found = 0
+        for list_id in np.argsort(-(self._centroids @ query)).tolist():
+            members = self._lists[list_id] if candidates is None else self._lists[list_id] & candidates
+            probed.append(members)
+            found += len(members)
+            if found >= target:
+                break
+        return np.fromiter(set().union(*probed), dtype=np.int64, count=found)
+
+    def search_slots(self, query: np.ndarray, top_k: int = 5, filters: Optional[Dict] = None, exact: bool = False):
+        '''(slots, scores) of the top_k most similar vectors, best first.'''
+        with self._lock:
+            candidates = self._candidates(filters)
+            pool = self._ids if candidates is None else candidates
+            if exact or self._centroids is None or len(pool) <= self.exact_threshold:
+                slots = np.fromiter(pool, dtype=np.int64, count=len(pool))
+            else:
+                slots = self._probe(query, candidates, top_k)
+            if not len(slots):
+                return slots, np.empty(0, dtype=np.float32)
+            slots.sort()
+            scores = self._vectors[slots] @ query
+        top = np.argpartition(-scores, top_k - 1)[:top_k] if len(scores) > top_k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return slots[top], scores[top]
+
+    def search(self, query: str, vectors: List[float], top_k: int = 5, filters: Optional[Dict] = None) -> List[OutputData]:
+        slots, scores = self.search_slots(self._normalize(vectors)[0], top_k, filters)
+        with self._lock:
+            return [
+                OutputData(id=self._ids[slot], score=max(0.0, float(score)), payload=dict(self._payloads[slot]))
+                for slot, score in zip(slots.tolist(), scores.tolist())
+                if slot in self._ids
+            ]
+
+    def _delete_slot(self, slot: int):
+        self._remove_from_maps(slot)
+        self._db.execute('DELETE FROM records WHERE slot = ?', (slot,))
+
+    def delete(self, vector_id: str):
+        with self._lock:
+            slot = self._slots.get(vector_id)
+            if slot is None:
+                logger.warning('vector %s not found in collection %s', vector_id, self.collection_name)
+                return
+            self._delete_slot(slot)
+            self._db.commit()
+
+    def update(self, vector_id: str, vector: Optional[List[float]] = None, payload: Optional[Dict] = None):
+        with self._lock:
+            slot = self._slots.get(vector_id)
+            if slot is None:
+                raise ValueError(f'Vector {vector_id} not found')
+            if vector is not None:
+                self.insert([vector], [payload if payload is not None else self._payloads[slot]], [vector_id])
+                return
+            if payload is not None:
+                self._index_payload(slot, self._payloads[slot], add=False)
+                self._payloads[slot] = dict(payload)
+                self._index_payload(slot, self._payloads[slot])
+                self._db.execute('UPDATE records SET payload = ? WHERE slot = ?', (json.dumps(payload, default=str), slot))
+                self._db.commit()
+
+    def get(self, vector_id: str) -> Optional[OutputData]:
+        with self._lock:
+            slot = self._slots.get(vector_id)
+            if slot is None:
+                return None
+            return OutputData(id=vector_id, score=None, payload=dict(self._payloads[slot]))
+
+    def list_cols(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def delete_col(self):
+        with self._lock:
+            self._db.close()
+            del self._vectors
+            for name in ('vectors.f32', 'meta.sqlite', 'centroids.npy'):
+                path = os.path.join(self._dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def col_info(self) -> Dict:
+        with self._lock:
+            return {
+                'name': self.collection_name,
+                'count': len(self._ids),
+                'dimension': self.dims,
+                'capacity': self._capacity,
+                'ivf_lists': len(self._lists),
+            }
+
+    def list(self, filters: Optional[Dict] = None, top_k: Optional[int] = 100) -> List[List[OutputData]]:
+        with self._lock:
+            candidates = self._candidates(filters)
+            slots = sorted(self._ids if candidates is None else candidates)[:top_k]
+            return [[OutputData(id=self._ids[slot], score=None, payload=dict(self._payloads[slot])) for slot in slots]]
+
+    def pages(self, filters: Optional[Dict] = None, page_size: int = 500) -> Iterator[List[OutputData]]:
+        '''Keyset pages (by slot) of the records matching filters; used for bulk export/delete.'''
+        cursor = -1
+        while True:
+            with self._lock:
+                candidates = self._candidates(filters)
+                slots = sorted(slot for slot in (self._ids if candidates is None else candidates) if slot > cursor)[:page_size]
+                page = [OutputData(id=self._ids[slot], score=None, payload=dict(self._payloads[slot])) for slot in slots]
+            if not page:
+                return
+            yield page
+            cursor = slots[-1]
+
+    def reset(self):
+        logger.warning('Resetting collection %s...', self.collection_name)
+        self.delete_col()
+        self.create_col(self.collection_name)
+
+def register_local_vector_store():
+    '''
+    Make `{"vector_store": {"provider": "local_ann", "config": {...}}}` valid in Memory.from_config.
+    mem0 resolves a provider's config class from mem0.configs.vector_stores.<provider>, so this module is aliased there.
+    '''
+    VectorStoreFactory.provider_to_class[PROVIDER] = f'{__name__}.LocalANNVectorStore'
+    VectorStoreConfig.__private_attributes__['_provider_configs'].default[PROVIDER] = 'LocalANNConfig'
+    sys.modules[f'mem0.configs.vector_stores.{PROVIDER}'] = sys.modules[__name__]
+
+
+# Benchmark: IVF vs exact brute force
+def synthetic_vectors(n: int, dims: int, clusters: int = 256, noise: float = 1.2, seed: int = 0) -> np.ndarray:
+    '''Clustered unit vectors, roughly like real embeddings (random uniform vectors make every index look bad).'''
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dims)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + noise * rng.standard_normal((n, dims)).astype(np.float32)
+    return LocalANNVectorStore._normalize(vectors)
+
+def run_benchmark(
+    n: int = 50000, dims: int = 256, users: int = 20, queries: int = 200, top_k: int = 10, nprobe: int = 8, noise: float = 1.2
+):
+    '''Recall@k and latency of the IVF search against exact search over the same store, with and without a user filter.'''
+    vectors = synthetic_vectors(n + queries, dims, noise=noise)
+    data, query_vectors = vectors[:n], vectors[n:]
+
+    with tempfile.TemporaryDirectory() as path:
+        store = LocalANNVectorStore('bench', path, dims, nprobe=nprobe, exact_threshold=0)
+        start = time.perf_counter()
+        for offset in range(0, n, 5000):
+            chunk = range(offset, min(n, offset + 5000))
+            store.insert(data[chunk.start:chunk.stop], [{'user_id': f'user-{i % users}', 'data': str(i)} for i in chunk])
+        ingest = time.perf_counter() - start
+
+        print(f'\n📐 VECTOR SEARCH BENCHMARK: {n} vectors x {dims} dims, {users} users, {queries} queries, k={top_k}, nprobe={nprobe}')
+        print(f'\tIngest {n / ingest:.0f} vectors/s, {store.col_info()["ivf_lists"]} IVF lists')
+        print(f'\t{"search":<14} {"recall@k":>9} {"ivf p50 ms":>11} {"ivf p95 ms":>11} {"exact p50 ms":>13} {"exact p95 ms":>13}')
+        for label, filters in (('all users', None), ('one user', {'user_id': 'user-0'})):
+            recalls, ivf_times, exact_times = [], [], []
+            for query in query_vectors:
+                start = time.perf_counter()
+                approx, _ = store.search_slots(query, top_k, filters)
+                ivf_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                exact, _ = store.search_slots(query, top_k, filters, exact=True)
+                exact_times.append(time.perf_counter() - start)
+                recalls.append(len(set(approx.tolist()) & set(exact.tolist())) / max(1, len(exact)))
+            print(
+                f'\t{label:<14} {np.mean(recalls):>9.3f} '
+                f'{np.percentile(ivf_times, 50) * 1000:>11.2f} {np.percentile(ivf_times, 95) * 1000:>11.2f} '
+                f'{np.percentile(exact_times, 50) * 1000:>13.2f} {np.percentile(exact_times, 95) * 1000:>13.2f}'
+            )
+        store.delete_col()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the local IVF vector store against exact search')
+    parser.add_argument('--vectors', type=int, default=50000)
+    parser.add_argument('--dims', type=int, default=256)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--noise', type=float, default=1.2, help='Spread of the synthetic clusters (higher = harder)')
+    args = parser.parse_args()
+    run_benchmark(args.vectors, args.dims, args.users, args.queries, args.k, args.nprobe, args.noise)
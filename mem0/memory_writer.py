@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class BackgroundMemoryWriter:
+    '''
+    Takes memory.add off the response path.
+    Turns are queued per user; after coalesce_delay (or once max_batch_turns are waiting) all queued turns
+    of a user are written with a single add call. Each user has at most one add in flight, so writes stay ordered.
+    `target` is anything with add(messages=..., user_id=...) (the memory or the search cache in front of it).
+    '''
+    def __init__(
+        self,
+        target,
+        coalesce_delay: float = 1.0,
+        max_batch_turns: int = 8,
+        max_workers: int = 4,
+    ):
+        self.target = target
+        self.coalesce_delay = coalesce_delay
+        self.max_batch_turns = max_batch_turns
+        self.stats = {'queued': 0, 'turns_written': 0, 'adds': 0, 'errors': 0, 'last_add_seconds': 0.0}
+
+        self._queues: Dict[str, deque] = {}
+        self._in_flight = set()
+        self._flush_requested = set()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='memory-writer')
+        self._dispatcher = threading.Thread(target=self._dispatch, name='memory-writer-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, messages: List[dict], user_id: str):
+        '''Queue one turn's messages for the user; returns immediately.'''
+        with self._condition:
+            self._queues.setdefault(user_id, deque()).append((time.monotonic(), messages))
+            self.stats['queued'] += 1
+            self._condition.notify_all()
+
+    def _ready(self, user_id: str, now: float) -> bool:
+        queue = self._queues.get(user_id)
+        if not queue or user_id in self._in_flight:
+            return False
+        return (
+            user_id in self._flush_requested
+            or len(queue) >= self.max_batch_turns
+            or now - queue[0][0] >= self.coalesce_delay
+        )
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                ready = [user_id for user_id in self._queues if self._ready(user_id, now)]
+                if not ready:
+                    self._condition.wait(timeout=min(0.1, self.coalesce_delay))
+                    continue
+                batches = []
+                for user_id in ready:
+                    queue = self._queues[user_id]
+                    turns = [queue.popleft()[1] for _ in range(min(len(queue), self.max_batch_turns))]
+                    if not queue:
+                        del self._queues[user_id]
+                    self._in_flight.add(user_id)
+                    batches.append((user_id, turns))
+            for user_id, turns in batches:
+                self._executor.submit(self._write, user_id, turns)
+
+    @staticmethod
+    def coalesce(turns: List[List[dict]]) -> List[dict]:
+        '''Merge several turns into one message list, keeping only the first turn's system prompt.'''
+        messages = list(turns[0])
+        for turn in turns[1:]:
+            messages.extend(message for message in turn if message['role'] != 'system')
+        return messages
+
+    def _write(self, user_id: str, turns: List[List[dict]]):
+        start = time.monotonic()
+        try:
+            self.target.add(messages=self.coalesce(turns), user_id=user_id)
+            with self._condition:
+                self.stats['adds'] += 1
+                self.stats['turns_written'] += len(turns)
+        except Exception:
+            logger.exception('background memory.add failed for user %s', user_id)
+            with self._condition:
+                self.stats['errors'] += 1
+        finally:
+            with self._condition:
+                self.stats['last_add_seconds'] = time.monotonic() - start
+                self._in_flight.discard(user_id)
+                self._condition.notify_all()
+
+    def flush(self, user_id: Optional[str] = None, timeout: float = 30.0) -> bool:
+        '''Write everything queued for a user (or all users) now and wait for it. Returns False on timeout.'''
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            users = [user_id] if user_id else list(set(self._queues) | self._in_flight)
+            self._flush_requested.update(users)
+            self._condition.notify_all()
+            try:
+                while any(u in self._queues or u in self._in_flight for u in users):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(timeout=remaining)
+                return True
+            finally:
+                self._flush_requested.difference_update(users)
+
+    def depth(self, user_id: Optional[str] = None) -> int:
+        '''Queued turns not yet handed to memory.add.'''
+        with self._condition:
+            if user_id:
+                return len(self._queues.get(user_id, ()))
+            return sum(len(queue) for queue in self._queues.values())
+
+    def lag(self) -> float:
+        '''Age in seconds of the oldest queued turn.'''
+        with self._condition:
+            oldest = [queue[0][0] for queue in self._queues.values() if queue]
+        return time.monotonic() - min(oldest) if oldest else 0.0
+
+    def report(self) -> str:
+        return (
+            f'queue depth={self.depth()} lag={self.lag():.1f}s in flight={len(self._in_flight)} '
+            f'adds={self.stats["adds"]} turns written={self.stats["turns_written"]} '
+            f'errors={self.stats["errors"]} last add={self.stats["last_add_seconds"]:.2f}s'
+        )
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class QuickActionPrecomputer:
+    '''
+    Precomputed answers for the fixed Quick Action prompts.
+    Each answer is stored with the version of the user's memory state it was generated from
+    (`version(user_id)`, bumped on every memory.add), and is only served while that version is current.
+    refresh(user_id) regenerates a user's stale answers in the background; calls while a refresh
+    is running are coalesced into one follow-up pass.
+    '''
+    def __init__(
+        self,
+        generate: Callable[[str, str], str],
+        version: Callable[[str], int],
+        prompts: List[str],
+        max_workers: int = 2,
+        max_users: int = 1000,
+    ):
+        self.generate = generate
+        self.version = version
+        self.prompts = prompts
+        self.max_users = max_users
+        self.stats = {'hits': 0, 'misses': 0, 'generated': 0, 'errors': 0, 'last_refresh_seconds': 0.0}
+
+        self._answers: 'OrderedDict[str, Dict[str, tuple]]' = OrderedDict()
+        self._running = set()
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quick-actions')
+
+    def get(self, user_id: str, prompt: str) -> Optional[str]:
+        '''The precomputed answer, if it was generated from the user's current memory state.'''
+        current = self.version(user_id)
+        with self._lock:
+            answer = self._answers.get(user_id, {}).get(prompt)
+            if answer and answer[0] == current:
+                self._answers.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return answer[1]
+            self.stats['misses'] += 1
+        return None
+
+    def refresh(self, user_id: str):
+        '''Schedule regeneration of the user's stale answers; returns immediately.'''
+        with self._lock:
+            if user_id in self._running:
+                self._dirty.add(user_id)
+                return
+            self._running.add(user_id)
+        self._executor.submit(self._refresh, user_id)
+
+    def _refresh(self, user_id: str):
+        while True:
+            start = time.monotonic()
+            for prompt in self.prompts:
+                version = self.version(user_id)
+                with self._lock:
+                    answer = self._answers.get(user_id, {}).get(prompt)
+                if answer and answer[0] == version:
+                    continue
+                try:
+                    text = self.generate(prompt, user_id)
+                except Exception:
+                    logger.exception('precomputing quick action failed for user %s', user_id)
+                    with self._lock:
+                        self.stats['errors'] += 1
+                    continue
+                with self._lock:
+                    self._answers.setdefault(user_id, {})[prompt] = (version, text)
+                    self._answers.move_to_end(user_id)
+                    while len(self._answers) > self.max_users:
+                        self._answers.popitem(last=False)
+                    self.stats['generated'] += 1
+
+            with self._lock:
+                self.stats['last_refresh_seconds'] = time.monotonic() - start
+                # Memory changed while we were generating: go again with the new version
+                if user_id not in self._dirty:
+                    self._running.discard(user_id)
+                    return
+                self._dirty.discard(user_id)
+
+    def current(self, user_id: str) -> int:
+        '''Number of the user's answers that match their current memory state.'''
+        version = self.version(user_id)
+        with self._lock:
+            return sum(1 for v, _ in self._answers.get(user_id, {}).values() if v == version)
+
+    def report(self) -> str:
+        return (
+            f'hits={self.stats["hits"]} misses={self.stats["misses"]} generated={self.stats["generated"]} '
+            f'refreshing={len(self._running)} errors={self.stats["errors"]} '
+            f'last refresh={self.stats["last_refresh_seconds"]:.1f}s'
+        )
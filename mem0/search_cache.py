@@ -0,0 +1,103 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    '''Case-fold, collapse whitespace and trim punctuation so trivially different queries share a cache entry.'''
+    return re.sub(r'\s+', ' ', query.lower()).strip(' \t\n.!?,;:')
+
+class MemorySearchCache:
+    '''
+    Short-TTL, per-user cache in front of mem0's memory.search.
+    Entries are keyed on (normalized query, limit) and dropped whenever memory.add runs for that user,
+    so cached results are never older than the user's latest memory write.
+    '''
+    def __init__(self, memory, ttl_seconds: float = 120.0, max_entries_per_user: int = 64):
+        self.memory = memory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_user = max_entries_per_user
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidations': 0, 'prewarmed': 0}
+        self._entries: Dict[str, 'OrderedDict[tuple, tuple]'] = {}
+        # Bumped on every invalidation, so a search racing with an add never caches stale results
+        self._versions: Dict[str, int] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='memory-prewarm')
+
+    def search(self, query: str, user_id: str, limit: int = 5):
+        key = (normalize_query(query), limit)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries.get(user_id)
+            cached = entries.get(key) if entries else None
+            if cached and now - cached[0] < self.ttl_seconds:
+                entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return cached[1]
+            if cached:
+                self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            version = self._versions.get(user_id, 0)
+
+        result = self.memory.search(query=query, user_id=user_id, limit=limit)
+
+        with self._lock:
+            # Skip caching if an add for this user landed while we were searching
+            if self._versions.get(user_id, 0) == version:
+                entries = self._entries.setdefault(user_id, OrderedDict())
+                entries[key] = (now, result)
+                entries.move_to_end(key)
+                while len(entries) > self.max_entries_per_user:
+                    entries.popitem(last=False)
+        return result
+
+    def add(self, messages, user_id: str, **kwargs):
+        '''memory.add followed by invalidation of the user's cached searches.'''
+        result = self.memory.add(messages=messages, user_id=user_id, **kwargs)
+        self.invalidate(user_id)
+        return result
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self.stats['invalidations'] += 1
+        logger.info('memory search cache invalidated for user %s', user_id)
+        for listener in self._listeners:
+            listener(user_id)
+
+    def version(self, user_id: str) -> int:
+        '''Counter of the user's memory state; changes whenever their memories change.'''
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def add_listener(self, listener: Callable[[str], None]):
+        '''Call listener(user_id) after every invalidation (i.e. after the user's memories changed).'''
+        self._listeners.append(listener)
+
+    def prewarm(self, queries: List[str], user_id: str, limit: int = 5):
+        '''Populate the cache for fixed queries in the background (e.g. Quick Actions at sign-in).'''
+        def warm(query):
+            self.search(query, user_id, limit)
+            with self._lock:
+                self.stats['prewarmed'] += 1
+
+        return [self._executor.submit(warm, query) for query in queries]
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def report(self) -> str:
+        return (
+            f'hits={self.stats["hits"]} misses={self.stats["misses"]} '
+            f'hit_ratio={self.hit_ratio:.0%} expired={self.stats["expired"]} '
+            f'invalidations={self.stats["invalidations"]} prewarmed={self.stats["prewarmed"]}'
+        )
@@ -0,0 +1,248 @@
+import importlib.util
+import inspect
+import json
+import os
+import sys
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from itertools import count
+from typing import Dict, Iterable, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_module(name: str, relative_path: str):
+    '''
+    Import a module from one of the implementation directories by file path.
+    The directories (langgraph/, langmem/, mem0/) share names with installed packages,
+    so they can't simply be put on sys.path together.
+    '''
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@dataclass
+class SearchHit:
+    id: str
+    text: str
+    score: Optional[float] = None
+
+class MemoryBackend(ABC):
+    '''
+    Common interface over the repo's memory implementations.
+    Memories are plain texts scoped to a user; ids are whatever the backend assigns.
+    add_many / delete_many default to one call per record; adapters override them when the backend has a bulk path.
+    '''
+    name = 'backend'
+
+    @abstractmethod
+    def add(self, text: str, user_id: str, metadata: Optional[dict] = None) -> str:
+        '''Store one memory for the user and return its id.'''
+
+    @abstractmethod
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[SearchHit]:
+        '''The user's memories most relevant to the query, best first.'''
+
+    @abstractmethod
+    def delete(self, memory_id: str) -> bool:
+        '''Delete one memory; False if it did not exist.'''
+
+    def add_many(self, records: Iterable[dict]) -> List[str]:
+        '''records: dicts with text, user_id and optional metadata.'''
+        return [self.add(record['text'], record['user_id'], record.get('metadata')) for record in records]
+
+    def delete_many(self, memory_ids: Iterable[str]) -> int:
+        return sum(self.delete(memory_id) for memory_id in memory_ids)
+
+    def close(self):
+        pass
+
+
+# manual/memory.py
+class ManualMemoryBackend(MemoryBackend):
+    '''
+    Semantic facts of manual/memory.py's Memory, one Memory (storage directory) per user.
+    Facts have no ids, so the adapter assigns them and tracks the fact dicts it created.
+    '''
+    name = 'manual'
+
+    def __init__(self, storage_dir: str):
+        self.storage_dir = storage_dir
+        load_module('snapshot', 'manual/snapshot.py')  # imported by manual/memory.py
+        self._memory_class = load_module('manual_memory', 'manual/memory.py').Memory
+        self._memories: Dict[str, object] = {}
+        self._facts: Dict[str, tuple] = {}
+        self._ids: Dict[int, str] = {}
+        self._counter = count()
+
+    def _memory(self, user_id: str):
+        if user_id not in self._memories:
+            self._memories[user_id] = self._memory_class(storage_dir=os.path.join(self.storage_dir, user_id))
+        return self._memories[user_id]
+
+    def add(self, text: str, user_id: str, metadata: Optional[dict] = None) -> str:
+        memory = self._memory(user_id)
+        memory.add_fact(text, (metadata or {}).get('category'))
+        fact = memory.facts[-1]
+        memory_id = f'fact-{next(self._counter)}'
+        self._facts[memory_id] = (user_id, fact)
+        self._ids[id(fact)] = memory_id
+        return memory_id
+
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[SearchHit]:
+        facts = self._memory(user_id).search_facts(query, limit=limit)
+        return [SearchHit(self._ids.get(id(fact), ''), fact['content']) for fact in facts]
+
+    def delete(self, memory_id: str) -> bool:
+        entry = self._facts.pop(memory_id, None)
+        if entry is None:
+            return False
+        user_id, fact = entry
+        memory = self._memory(user_id)
+        memory.facts.remove(fact)
+        del self._ids[id(fact)]
+        memory._save_json(memory.facts, memory.facts_file)
+        return True
+
+
+# langgraph/tools.py
+class LangGraphToolsBackend(MemoryBackend):
+    '''The support agent's manage_memory tool and search_memories over MEMORY_DB, scoped by the customer metadata field.'''
+    name = 'langgraph-tools'
+
+    def __init__(self):
+        self.tools = load_module('langgraph_tools', 'langgraph/tools.py')
+        self.tools.set_memory_log_level('quiet')
+
+    def add(self, text: str, user_id: str, metadata: Optional[dict] = None) -> str:
+        result = self.tools.manage_memory.invoke(
+            {'content': text, 'action': 'create', 'metadata': {**(metadata or {}), 'customer': user_id}}
+        )
+        return result.split()[-1]
+
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[SearchHit]:
+        results = self.tools.search_memories(query, limit=limit, filter={'customer': user_id})
+        return [SearchHit(r['id'], r['value']['content'], r['score']) for r in results]
+
+    def delete(self, memory_id: str) -> bool:
+        result = self.tools.manage_memory.invoke({'action': 'delete', 'id': memory_id})
+        return not result.startswith('Error')
+
+
+# langmem tools over a LangGraph store
+class LangmemBackend(MemoryBackend):
+    '''
+    langmem's manage/search memory tools, one namespace per user (as in the langmem coach).
+    Defaults to an InMemoryStore with the local hash embedder, so nothing leaves the process.
+    '''
+    name = 'langmem'
+
+    def __init__(self, store=None, dims: int = 256):
+        from langgraph.store.memory import InMemoryStore
+        from langmem import create_manage_memory_tool, create_search_memory_tool
+
+        if store is None:
+            embedder = load_module('langmem_sqlite_store', 'langmem/sqlite_store.py').HashEmbedder(dims)
+            store = InMemoryStore(index={'embed': embedder, 'dims': dims})
+        self.store = store
+        self._create_manage = create_manage_memory_tool
+        self._create_search = create_search_memory_tool
+        self._tools: Dict[str, tuple] = {}
+        self._owners: Dict[str, str] = {}
+
+    def _user_tools(self, user_id: str):
+        if user_id not in self._tools:
+            namespace = ('benchmark', user_id, 'memories')
+            self._tools[user_id] = (
+                self._create_manage(namespace=namespace, store=self.store),
+                self._create_search(namespace=namespace, store=self.store),
+            )
+        return self._tools[user_id]
+
+    def add(self, text: str, user_id: str, metadata: Optional[dict] = None) -> str:
+        manage, _ = self._user_tools(user_id)
+        memory_id = manage.invoke({'content': text, 'action': 'create'}).split()[-1]
+        self._owners[memory_id] = user_id
+        return memory_id
+
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[SearchHit]:
+        _, search = self._user_tools(user_id)
+        results = search.invoke({'query': query, 'limit': limit})
+        if isinstance(results, str):
+            results = json.loads(results)
+        return [SearchHit(r['key'], r['value']['content'], r.get('score')) for r in results]
+
+    def delete(self, memory_id: str) -> bool:
+        user_id = self._owners.pop(memory_id, None)
+        if user_id is None:
+            return False
+        manage, _ = self._user_tools(user_id)
+        manage.invoke({'action': 'delete', 'id': memory_id})
+        return True
+
+
+# mem0
+class Mem0Backend(MemoryBackend):
+    '''
+    mem0's Memory with raw (infer=False) adds, so no LLM is called.
+    Defaults to local stand-ins for the remote services: the local ANN vector store and the hash embedder.
+    '''
+    name = 'mem0'
+
+    def __init__(self, path: str, dims: int = 256, config: Optional[dict] = None):
+        # Telemetry is a remote service too
+        os.environ.setdefault('MEM0_TELEMETRY', 'false')
+        local_vector_store = load_module('local_vector_store', 'mem0/local_vector_store.py')
+        local_vector_store.register_local_vector_store()
+        from mem0 import Memory
+
+        if config is None:
+            embedder = load_module('langmem_sqlite_store', 'langmem/sqlite_store.py').HashEmbedder(dims)
+            config = {
+                'llm': {'provider': 'openai', 'config': {'model': 'gpt-4o-mini', 'api_key': os.getenv('OPENAI_API_KEY', 'unused')}},
+                'embedder': {'provider': 'langchain', 'config': {'model': embedder}},
+                'vector_store': {
+                    'provider': local_vector_store.PROVIDER,
+                    'config': {'path': path, 'embedding_model_dims': dims, 'collection_name': 'benchmark'},
+                },
+                'history_db_path': os.path.join(path, 'history.db'),
+            }
+        self.memory = Memory.from_config(config)
+        # mem0 >= 1.0 scopes searches with filters/top_k; older versions take user_id/limit
+        self._scoped_by_filters = 'filters' in inspect.signature(self.memory.search).parameters
+
+    def add(self, text: str, user_id: str, metadata: Optional[dict] = None) -> str:
+        result = self.memory.add([{'role': 'user', 'content': text}], user_id=user_id, metadata=metadata, infer=False)
+        return result['results'][0]['id']
+
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[SearchHit]:
+        if self._scoped_by_filters:
+            results = self.memory.search(query, top_k=limit, filters={'user_id': user_id})
+        else:
+            results = self.memory.search(query=query, user_id=user_id, limit=limit)
+        return [SearchHit(r['id'], r['memory'], r.get('score')) for r in results['results']]
+
+    def delete(self, memory_id: str) -> bool:
+        try:
+            self.memory.delete(memory_id)
+            return True
+        except ValueError:
+            return False
+
+
+BACKENDS = {
+    'manual': lambda path: ManualMemoryBackend(os.path.join(path, 'manual')),
+    'langgraph-tools': lambda path: LangGraphToolsBackend(),
+    'langmem': lambda path: LangmemBackend(),
+    'mem0': lambda path: Mem0Backend(os.path.join(path, 'mem0')),
+}
+
+def create_backend(name: str, path: str) -> MemoryBackend:
+    '''Backend by name; path is a scratch directory for backends that persist to disk.'''
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown backend {name!r}, expected one of {list(BACKENDS)}')
+    return BACKENDS[name](path)
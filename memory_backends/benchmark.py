@@ -0,0 +1,140 @@
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from backends import BACKENDS, create_backend
+
+# Synthetic corpus: every memory combines one value per slot, so a query naming a few of its values has one clear target
+SLOTS = {
+    'activity': ['running', 'cycling', 'swimming', 'yoga', 'pilates', 'rowing', 'boxing', 'climbing', 'hiking', 'squats',
+                 'deadlifts', 'sprints', 'tennis', 'skiing', 'dancing', 'kettlebells', 'stretching', 'walking'],
+    'time': ['mornings', 'evenings', 'weekends', 'lunchtime', 'weekdays', 'nights', 'sundays', 'mondays'],
+    'place': ['park', 'gym', 'pool', 'garage', 'studio', 'track', 'beach', 'office', 'trail', 'rooftop', 'basement', 'stadium'],
+    'food': ['oatmeal', 'salmon', 'tofu', 'lentils', 'avocado', 'eggs', 'quinoa', 'yogurt', 'chicken', 'bananas',
+             'almonds', 'rice', 'spinach', 'berries'],
+    'body': ['knee', 'shoulder', 'ankle', 'back', 'wrist', 'hip', 'neck', 'elbow', 'hamstring', 'calf'],
+    'feeling': ['sore', 'stiff', 'strong', 'tired', 'fine', 'tight', 'weak', 'painful'],
+}
+
+def generate_corpus(users: int, per_user: int, queries: int, seed: int = 0):
+    '''Records (text, user_id) and queries (user_id, query, index of the target record).'''
+    rng = random.Random(seed)
+    records = []
+    for user in range(users):
+        for _ in range(per_user):
+            values = {slot: rng.choice(words) for slot, words in SLOTS.items()}
+            text = (
+                f'User does {values["activity"]} on {values["time"]} at the {values["place"]}, '
+                f'eats {values["food"]} afterwards and their {values["body"]} feels {values["feeling"]}'
+            )
+            records.append({'text': text, 'user_id': f'user-{user}', 'values': list(values.values())})
+
+    query_set = []
+    for index in rng.sample(range(len(records)), min(queries, len(records))):
+        record = records[index]
+        query_set.append((record['user_id'], ' '.join(rng.sample(record['values'], 3)), index))
+    return records, query_set
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def rss_mb() -> float:
+    '''Current resident set size (Linux), falling back to the peak where /proc is unavailable.'''
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_backend(name: str, records: List[dict], queries: List[tuple], top_k: int, delete_fraction: float) -> dict:
+    '''Ingest, query and bulk-delete through one backend (run in its own process so RSS is comparable).'''
+    with tempfile.TemporaryDirectory() as path:
+        backend = create_backend(name, path)
+        rss_before = rss_mb()
+
+        start = time.perf_counter()
+        ids = backend.add_many({'text': r['text'], 'user_id': r['user_id']} for r in records)
+        ingest_seconds = time.perf_counter() - start
+        rss_after = rss_mb()
+
+        latencies, found = [], 0
+        for user_id, query, target in queries:
+            start = time.perf_counter()
+            hits = backend.search(query, user_id, limit=top_k)
+            latencies.append(time.perf_counter() - start)
+            found += ids[target] in {hit.id for hit in hits}
+
+        doomed = ids[:int(len(ids) * delete_fraction)]
+        start = time.perf_counter()
+        deleted = backend.delete_many(doomed)
+        delete_seconds = time.perf_counter() - start
+        backend.close()
+
+    return {
+        'backend': name,
+        'records': len(records),
+        'ingest_per_second': len(records) / ingest_seconds,
+        'search_p50_ms': percentile(latencies, 50) * 1000,
+        'search_p99_ms': percentile(latencies, 99) * 1000,
+        'recall_at_k': found / len(queries),
+        'rss_mb': rss_after,
+        'rss_growth_mb': rss_after - rss_before,
+        'deleted': deleted,
+        'delete_per_second': deleted / delete_seconds if delete_seconds else 0.0,
+    }
+
+def run_benchmark(
+    backends: List[str],
+    users: int = 20,
+    per_user: int = 100,
+    queries: int = 200,
+    top_k: int = 5,
+    delete_fraction: float = 0.1,
+) -> List[dict]:
+    records, query_set = generate_corpus(users, per_user, queries)
+    print(f'\n🏁 MEMORY BACKEND BENCHMARK: {len(records)} memories ({users} users), {len(query_set)} queries, k={top_k}')
+    print(
+        f'\t{"backend":<16} {"ingest/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"recall@k":>9} '
+        f'{"RSS MB":>8} {"+RSS MB":>8} {"delete/s":>9}'
+    )
+
+    reports = []
+    # Fresh process per backend: isolates RSS and global state (e.g. MEMORY_DB)
+    context = multiprocessing.get_context('spawn')
+    for name in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            report = executor.submit(run_backend, name, records, query_set, top_k, delete_fraction).result()
+        reports.append(report)
+        print(
+            f'\t{name:<16} {report["ingest_per_second"]:>9.0f} {report["search_p50_ms"]:>8.2f} {report["search_p99_ms"]:>8.2f} '
+            f'{report["recall_at_k"]:>9.3f} {report["rss_mb"]:>8.1f} {report["rss_growth_mb"]:>8.1f} '
+            f'{report["delete_per_second"]:>9.0f}'
+        )
+    return reports
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay one synthetic corpus through every memory backend')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--per-user', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--delete-fraction', type=float, default=0.1)
+    parser.add_argument('--json', help='Write the reports to this file')
+    args = parser.parse_args()
+
+    reports = run_benchmark(args.backends, args.users, args.per_user, args.queries, args.k, args.delete_fraction)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
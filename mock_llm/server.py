@@ -0,0 +1,397 @@
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'llm_client'))
+from hash_embedder import hash_embedding
+
+logger = logging.getLogger('mock_llm')
+
+DEFAULT_PORT = 8900
+
+# Point the agents at the mock: every entry point (manual/agent.py, langgraph/graph.py,
+# langmem/fitness_coach_agent.py, mem0/fitness_coach_agent.py) checks LLM_PROVIDER=mock
+def agent_env(host: str = '127.0.0.1', port: int = DEFAULT_PORT) -> Dict[str, str]:
+    return {'LLM_PROVIDER': 'mock', 'MOCK_LLM_URL': f'http://{host}:{port}/v1'}
+
+
+# Latency and length distributions
+class Distribution:
+    '''
+    Sampler parsed from a spec: 'fixed:200', 'uniform:100,300', 'normal:200,50',
+    'lognormal:200,0.5' (median, sigma) or 'exponential:200' (mean).
+    Values are in the spec's units (milliseconds for latencies, tokens for reply lengths), clipped at zero.
+    '''
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(':')
+        if kind not in self.KINDS:
+            raise ValueError(f'Unknown distribution {kind!r} in {spec!r}, expected one of {self.KINDS}')
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params.split(',') if p]
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == 'fixed':
+            value = p[0]
+        elif self.kind == 'uniform':
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == 'lognormal':
+            value = p[0] * np.exp(rng.gauss(0, p[1]))
+        else:
+            value = rng.expovariate(1 / p[0]) if p[0] else 0.0
+        return max(0.0, value)
+
+@dataclass
+class MockConfig:
+    ttft: Distribution = field(default_factory=lambda: Distribution('lognormal:300,0.4'))  # ms
+    tokens_per_second: float = 80.0  # 0: the whole reply at once
+    reply_tokens: Distribution = field(default_factory=lambda: Distribution('normal:60,20'))
+    embedding_latency: Distribution = field(default_factory=lambda: Distribution('lognormal:40,0.3'))  # ms
+    embedding_dims: int = 1536
+    error_rate: float = 0.0
+    error_codes: Tuple[int, ...] = (429, 500, 503)
+    stream_abort_rate: float = 0.0  # streams cut off after a few tokens
+    rpm_limit: float = 0.0  # requests per minute before answering 429, like a provider's rate limit (0: unlimited)
+    seed: Optional[int] = None
+
+
+# Canned content
+WORDS = (
+    'keep your routine steady and track how you feel after each session. '
+    'a short warm up, a few strength sets and some easy cardio go a long way. '
+    'we have noted your request and will follow up with the details shortly. '
+    'remember to rest, hydrate and log your progress so we can adjust the plan.'
+).split()
+
+def count_tokens(text: str) -> int:
+    '''Rough token estimate (about four characters per token), good enough for usage accounting.'''
+    return max(1, len(text) // 4)
+
+def message_text(messages: List[dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get('content') or ''
+        if isinstance(content, list):
+            content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+        parts.append(content)
+    return '\n'.join(parts)
+
+def sample_from_schema(schema: dict, rng: random.Random, defs: Optional[dict] = None, name: str = 'value') -> Any:
+    '''A value that validates against a JSON schema (enough of it for structured output and tool arguments).'''
+    defs = defs if defs is not None else {**schema.get('definitions', {}), **schema.get('$defs', {})}
+    if '$ref' in schema:
+        return sample_from_schema(defs[schema['$ref'].rsplit('/', 1)[-1]], rng, defs, name)
+    for key in ('anyOf', 'oneOf', 'allOf'):
+        if key in schema:
+            options = [option for option in schema[key] if option.get('type') != 'null'] or schema[key]
+            return sample_from_schema(options[0], rng, defs, name)
+    if 'const' in schema:
+        return schema['const']
+    if 'enum' in schema:
+        return rng.choice(schema['enum'])
+    if 'default' in schema and schema.get('type') != 'object':
+        return schema['default']
+
+    kind = schema.get('type', 'object' if 'properties' in schema else 'string')
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != 'null'), 'null')
+    if kind == 'object':
+        return {key: sample_from_schema(value, rng, defs, key) for key, value in schema.get('properties', {}).items()}
+    if kind == 'array':
+        return [sample_from_schema(schema.get('items', {}), rng, defs, name) for _ in range(schema.get('minItems', 1))]
+    if kind == 'integer':
+        return int(schema.get('minimum', 1))
+    if kind == 'number':
+        return float(schema.get('minimum', 1.0))
+    if kind == 'boolean':
+        return True
+    if kind == 'null':
+        return None
+    return f'mock {name}'
+
+# Server
+class MockLLMServer:
+    '''
+    OpenAI-compatible endpoints backed by canned content:
+    - POST /v1/chat/completions: plain text, structured output (response_format json_schema / json_object),
+      forced tool calls (tool_choice), streaming (SSE, optional usage chunk)
+    - POST /v1/embeddings: deterministic vectors, float or base64 encoded, honouring `dimensions`
+    - GET /v1/models, GET /stats
+    Latency is time-to-first-token plus reply tokens at tokens_per_second; errors are injected at error_rate.
+    '''
+    def __init__(self, config: MockConfig = None):
+        self.config = config or MockConfig()
+        self.rng = random.Random(self.config.seed)
+        self.stats = {
+            'chat': 0, 'streams': 0, 'structured': 0, 'tool_calls': 0, 'embeddings': 0, 'embedded_inputs': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'errors': {}, 'aborted_streams': 0, 'rate_limited': 0,
+        }
+        # Token bucket for rpm_limit, with one second of burst (at least one request)
+        self._allowance = max(1.0, self.config.rpm_limit / 60)
+        self._allowance_updated = time.monotonic()
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        app.router.add_post('/v1/embeddings', self.embeddings)
+        app.router.add_get('/v1/models', self.models)
+        app.router.add_get('/stats', self.get_stats)
+        return app
+
+    def _rate_limited(self) -> Optional[web.Response]:
+        if not self.config.rpm_limit:
+            return None
+        now = time.monotonic()
+        rate = self.config.rpm_limit / 60
+        self._allowance = min(max(1.0, rate), self._allowance + (now - self._allowance_updated) * rate)
+        self._allowance_updated = now
+        if self._allowance >= 1:
+            self._allowance -= 1
+            return None
+        self.stats['rate_limited'] += 1
+        return web.json_response(
+            {'error': {'message': 'Rate limit reached (mock)', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+            status=429,
+            headers={'retry-after': f'{(1 - self._allowance) / rate:.2f}'},
+        )
+
+    def _injected_error(self) -> Optional[web.Response]:
+        if not self.config.error_rate or self.rng.random() >= self.config.error_rate:
+            return None
+        status = self.rng.choice(self.config.error_codes)
+        self.stats['errors'][str(status)] = self.stats['errors'].get(str(status), 0) + 1
+        error_type = 'rate_limit_error' if status == 429 else 'server_error'
+        return web.json_response(
+            {'error': {'message': f'Injected {status} from the mock LLM server', 'type': error_type, 'code': str(status)}},
+            status=status,
+            headers={'retry-after': '1'} if status == 429 else None,
+        )
+
+    def _reply(self, body: dict) -> Tuple[str, Optional[dict]]:
+        '''(content, tool call) for a chat request.'''
+        response_format = body.get('response_format') or {}
+        tools = body.get('tools') or []
+        tool_choice = body.get('tool_choice')
+
+        forced = None
+        if isinstance(tool_choice, dict):
+            forced = next((t for t in tools if t['function']['name'] == tool_choice['function']['name']), None)
+        elif tool_choice == 'required' and tools:
+            forced = tools[0]
+        if forced:
+            self.stats['tool_calls'] += 1
+            arguments = sample_from_schema(forced['function'].get('parameters', {}), self.rng)
+            return '', {'name': forced['function']['name'], 'arguments': json.dumps(arguments)}
+
+        if response_format.get('type') == 'json_schema':
+            self.stats['structured'] += 1
+            return json.dumps(sample_from_schema(response_format['json_schema']['schema'], self.rng)), None
+        if response_format.get('type') == 'json_object':
+            self.stats['structured'] += 1
+            return json.dumps({'response': 'mock'}), None
+
+        length = max(1, int(self.config.reply_tokens.sample(self.rng)))
+        limit = body.get('max_completion_tokens') or body.get('max_tokens')
+        if limit:
+            length = min(length, limit)
+        start = self.rng.randrange(len(WORDS))
+        return ' '.join(WORDS[(start + i) % len(WORDS)] for i in range(length)).capitalize(), None
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.stats['chat'] += 1
+        limited = self._rate_limited()
+        if limited:
+            return limited
+        await asyncio.sleep(self.config.ttft.sample(self.rng) / 1000)
+        error = self._injected_error()
+        if error:
+            return error
+
+        content, tool_call = self._reply(body)
+        prompt_tokens = count_tokens(message_text(body.get('messages', [])))
+        completion_tokens = count_tokens(content or tool_call['arguments'])
+        self.stats['prompt_tokens'] += prompt_tokens
+        self.stats['completion_tokens'] += completion_tokens
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens}
+        completion_id = f'chatcmpl-mock-{uuid.uuid4().hex[:12]}'
+        model = body.get('model', 'mock')
+        tool_calls = [{'id': f'call_{uuid.uuid4().hex[:12]}', 'type': 'function', 'function': tool_call}] if tool_call else None
+        finish_reason = 'tool_calls' if tool_call else 'stop'
+
+        if body.get('stream'):
+            return await self._stream(request, body, completion_id, model, content, tool_calls, finish_reason, usage)
+
+        # Non-streaming: the whole reply arrives after it would have finished generating
+        if self.config.tokens_per_second:
+            await asyncio.sleep(completion_tokens / self.config.tokens_per_second)
+        message = {'role': 'assistant', 'content': content if not tool_calls else None, 'refusal': None}
+        if tool_calls:
+            message['tool_calls'] = tool_calls
+        return web.json_response({
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': message, 'logprobs': None, 'finish_reason': finish_reason}],
+            'usage': usage,
+        })
+
+    async def _stream(self, request, body, completion_id, model, content, tool_calls, finish_reason, usage):
+        self.stats['streams'] += 1
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+
+        def chunk(delta: dict, finish: Optional[str] = None, **extra) -> bytes:
+            data = {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'logprobs': None, 'finish_reason': finish}], **extra,
+            }
+            return f'data: {json.dumps(data)}\n\n'.encode()
+
+        await response.write(chunk({'role': 'assistant', 'content': ''}))
+        if tool_calls:
+            await response.write(chunk({'tool_calls': [{'index': 0, **tool_calls[0]}]}))
+        else:
+            pieces = re.findall(r'\S+\s*', content)
+            abort_at = self.rng.randint(1, max(1, len(pieces) - 1)) if self.rng.random() < self.config.stream_abort_rate else None
+            delay = 1 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+            for i, piece in enumerate(pieces):
+                if i == abort_at:
+                    self.stats['aborted_streams'] += 1
+                    # Drop the connection mid-reply, as a failing upstream would
+                    request.transport.close()
+                    return response
+                if delay:
+                    await asyncio.sleep(delay * count_tokens(piece))
+                await response.write(chunk({'content': piece}))
+
+        await response.write(chunk({}, finish_reason))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            data = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                    'choices': [], 'usage': usage}
+            await response.write(f'data: {json.dumps(data)}\n\n'.encode())
+        await response.write(b'data: [DONE]\n\n')
+        await response.write_eof()
+        return response
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.stats['embeddings'] += 1
+        limited = self._rate_limited()
+        if limited:
+            return limited
+        await asyncio.sleep(self.config.embedding_latency.sample(self.rng) / 1000)
+        error = self._injected_error()
+        if error:
+            return error
+
+        inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+        # Token-id inputs (list of ints, or a list of them) are embedded by their ids
+        if inputs and isinstance(inputs[0], int):
+            inputs = [inputs]
+        texts = [item if isinstance(item, str) else ' '.join(map(str, item)) for item in inputs]
+        dims = body.get('dimensions') or self.config.embedding_dims
+        self.stats['embedded_inputs'] += len(texts)
+
+        data = []
+        for i, text in enumerate(texts):
+            vector = hash_embedding(text, dims)
+            encoded = (
+                base64.b64encode(vector.astype('<f4').tobytes()).decode()
+                if body.get('encoding_format') == 'base64' else vector.tolist()
+            )
+            data.append({'object': 'embedding', 'index': i, 'embedding': encoded})
+        tokens = sum(count_tokens(text) for text in texts)
+        self.stats['prompt_tokens'] += tokens
+        return web.json_response({
+            'object': 'list', 'data': data, 'model': body.get('model', 'mock'),
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        })
+
+    async def models(self, request: web.Request) -> web.Response:
+        models = ('gpt-4o-mini', 'gpt-4o', 'text-embedding-3-small', 'text-embedding-3-large')
+        return web.json_response({
+            'object': 'list', 'data': [{'id': m, 'object': 'model', 'created': 0, 'owned_by': 'mock'} for m in models],
+        })
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+def serve_in_background(config: MockConfig = None, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+    '''Run the mock server on a daemon thread (for load tests driven from Python); returns (server, stop).'''
+    server = MockLLMServer(config)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(server.create_app())
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, host, port).start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name='mock-llm', daemon=True).start()
+    started.wait()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    return server, stop
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible mock LLM server for offline load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--ttft', default='lognormal:300,0.4', help='Time to first token distribution (ms)')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help='Generation rate (0: no generation delay)')
+    parser.add_argument('--reply-tokens', default='normal:60,20', help='Reply length distribution (tokens)')
+    parser.add_argument('--embedding-latency', default='lognormal:40,0.3', help='Embedding request latency distribution (ms)')
+    parser.add_argument('--embedding-dims', type=int, default=1536)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an error')
+    parser.add_argument('--error-codes', type=int, nargs='+', default=[429, 500, 503])
+    parser.add_argument('--stream-abort-rate', type=float, default=0.0, help='Fraction of streams dropped mid-reply')
+    parser.add_argument('--rpm-limit', type=float, default=0.0, help='Answer 429 above this many requests per minute')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        ttft=Distribution(args.ttft),
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=Distribution(args.reply_tokens),
+        embedding_latency=Distribution(args.embedding_latency),
+        embedding_dims=args.embedding_dims,
+        error_rate=args.error_rate,
+        error_codes=tuple(args.error_codes),
+        stream_abort_rate=args.stream_abort_rate,
+        rpm_limit=args.rpm_limit,
+        seed=args.seed,
+    )
+    env = ' '.join(f'{key}={value}' for key, value in agent_env(args.host, args.port).items())
+    print(f'🤖 Mock LLM server on http://{args.host}:{args.port}/v1 (ttft {args.ttft}, {args.tokens_per_second:.0f} tok/s, '
+          f'errors {args.error_rate:.1%})')
+    print(f'\tPoint the agents at it with: export {env}')
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(MockLLMServer(config).create_app(), host=args.host, port=args.port, print=None)
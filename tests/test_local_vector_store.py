@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'mem0'))
+from local_vector_store import LocalANNVectorStore, synthetic_vectors
+
+VECTORS, DIMS, QUERIES, TOP_K = 8000, 64, 50, 10
+
+@pytest.fixture(scope='module')
+def vectors():
+    return synthetic_vectors(VECTORS + QUERIES, DIMS)
+
+@pytest.fixture(scope='module')
+def store(vectors, tmp_path_factory):
+    # exact_threshold=0 so every search above min_train_size goes through the IVF lists
+    store = LocalANNVectorStore('test', str(tmp_path_factory.mktemp('vectors')), DIMS, nprobe=16, exact_threshold=0)
+    store.insert(vectors[:VECTORS], [{'user_id': f'user-{i % 2}', 'data': str(i)} for i in range(VECTORS)])
+    return store
+
+def test_ivf_is_trained(store):
+    assert store.col_info()['ivf_lists'] > 1
+
+@pytest.mark.parametrize('filters', [None, {'user_id': 'user-0'}, {'user_id': 'user-1', 'data': {'ne': '1'}}])
+def test_ivf_recall_against_exact(store, vectors, filters):
+    recalls = []
+    for query in vectors[VECTORS:]:
+        approx, scores = store.search_slots(query, TOP_K, filters)
+        exact, _ = store.search_slots(query, TOP_K, filters, exact=True)
+        assert len(approx) == TOP_K
+        assert np.all(np.diff(scores) <= 0)
+        if filters:
+            assert all(store._matches(store._payloads[slot], filters) for slot in approx.tolist())
+        recalls.append(len(set(approx.tolist()) & set(exact.tolist())) / TOP_K)
+    assert np.mean(recalls) >= 0.9
+
+@pytest.mark.parametrize('filters', [None, {'user_id': 'user-0'}])
+def test_probe_scores_a_fraction_of_the_store(store, vectors, filters):
+    probed = store._probe(vectors[VECTORS], store._candidates(filters), TOP_K)
+    assert TOP_K <= len(probed) < VECTORS / 4
+
+def test_small_filtered_pool_is_exact(store, vectors):
+    filters = {'data': {'in': [str(i) for i in range(50)]}}
+    approx, _ = store.search_slots(vectors[VECTORS], TOP_K, filters)
+    exact, _ = store.search_slots(vectors[VECTORS], TOP_K, filters, exact=True)
+    assert approx.tolist() == exact.tolist()
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'manual'))
+from memory_server import HEADER, OK, RemoteMemory, RemoteMemoryError, decode, encode, frame, serve_in_background
+
+VALUES = [
+    None, True, False, 0, -1, 2 ** 63 - 1, -2 ** 63, 1.5, -0.0, '', 'plain', 'ünïcode 🧠', b'', b'\x00\xff',
+    [], [1, 'two', None], {}, {'nested': {'list': [1, [2, [3]]], 'flag': False}, 'n': 3},
+]
+
+@pytest.mark.parametrize('value', VALUES, ids=repr)
+def test_round_trip(value):
+    data = encode(value)
+    decoded, offset = decode(bytes(data))
+    assert decoded == value
+    assert type(decoded) is type(value)
+    assert offset == len(data)
+
+def test_tuples_decode_as_lists():
+    assert decode(bytes(encode(('a', 1))))[0] == ['a', 1]
+
+def test_values_decode_back_to_back():
+    data = bytes(encode('first') + encode({'second': 2}) + encode(None))
+    first, offset = decode(data)
+    second, offset = decode(data, offset)
+    third, offset = decode(data, offset)
+    assert (first, second, third, offset) == ('first', {'second': 2}, None, len(data))
+
+def test_unencodable_value():
+    with pytest.raises(TypeError):
+        encode({1, 2})
+
+def test_unknown_tag():
+    with pytest.raises(ValueError):
+        decode(b'?')
+
+def test_frame_header():
+    data = frame(7, OK, ['result'])
+    size, request_id, status = HEADER.unpack_from(data)
+    assert (size, request_id, status) == (len(data) - HEADER.size, 7, OK)
+    assert decode(data[HEADER.size:])[0] == ['result']
+
+
+@pytest.fixture
+def memory(tmp_path):
+    server, stop = serve_in_background(str(tmp_path / 'memory.sock'), str(tmp_path / 'memory'))
+    client = RemoteMemory(str(tmp_path / 'memory.sock'))
+    yield client
+    client.close()
+    stop()
+
+def test_remote_calls(memory):
+    memory.add_fact('alice prefers python', 'preference')
+    assert memory.count('facts') == 1
+    assert memory.search_facts('python', mode='bm25')[0]['content'] == 'alice prefers python'
+    with pytest.raises(RemoteMemoryError):
+        memory.count('nope')
+
+def test_pipelined_calls_answer_in_order(memory):
+    # Large enough to span several socket reads on the server
+    with memory.pipeline() as p:
+        for i in range(300):
+            p.add_fact(f'fact {i} ' + 'x' * 500)
+        p.count('nope')
+        p.count('facts')
+    assert len(p.results) == 302
+    assert isinstance(p.results[300], RemoteMemoryError)
+    assert p.results[301] == 300
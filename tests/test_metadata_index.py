@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'langgraph'))
+from tools import MetadataIndex
+
+MEMORIES = {
+    'm1': {'customer': 'Acme', 'issue_type': 'billing', 'timestamp': '2025-05-01 09:00:00'},
+    'm2': {'customer': 'acme', 'issue_type': 'Outage', 'timestamp': '2025-05-15 12:00:00'},
+    'm3': {'customer': 'Globex', 'issue_type': 'billing', 'timestamp': '2025-05-31 23:59:59'},
+    'm4': {'customer': 'Globex', 'issue_type': 'outage', 'timestamp': '2025-06-02 08:00:00'},
+    'm5': {'customer': 42, 'timestamp': '2025-04-30 18:00:00'},
+    'm6': {'timestamp': '2025-06-10 10:00:00'},
+}
+
+@pytest.fixture
+def index():
+    index = MetadataIndex()
+    for memory_id, metadata in MEMORIES.items():
+        index.add(memory_id, metadata)
+    return index
+
+@pytest.mark.parametrize('filter', [None, {}, {'customer': None, 'since': None}])
+def test_no_filter_means_every_memory(index, filter):
+    assert index.candidates(filter) is None
+
+def test_customer_and_issue_type_ignore_case(index):
+    assert index.candidates({'customer': 'ACME'}) == ['m1', 'm2']
+    assert index.candidates({'issue_type': 'outage'}) == ['m2', 'm4']
+
+def test_non_string_values(index):
+    assert index.candidates({'customer': 42}) == ['m5']
+    assert index.candidates({'customer': '42'}) == ['m5']
+
+def test_date_prefixes(index):
+    assert index.candidates({'since': '2025-05-01', 'until': '2025-05-31'}) == ['m1', 'm2', 'm3']
+    assert index.candidates({'since': '2025-06'}) == ['m4', 'm6']
+    assert index.candidates({'until': '2025-04'}) == ['m5']
+
+def test_filters_intersect(index):
+    assert index.candidates({'customer': 'globex', 'issue_type': 'billing'}) == ['m3']
+    assert index.candidates({'customer': 'acme', 'since': '2025-05-02'}) == ['m2']
+    assert index.candidates({'customer': 'acme', 'issue_type': 'billing', 'since': '2025-06'}) == []
+
+def test_empty_or_unknown_values_match_nothing(index):
+    assert index.candidates({'customer': ''}) == []
+    assert index.candidates({'customer': 'initech'}) == []
+
+@pytest.mark.parametrize('filter', [{'cusotmer': 'acme'}, {'customer': 'acme', 'user_id': 'x'}])
+def test_unknown_keys_raise(index, filter):
+    with pytest.raises(ValueError):
+        index.candidates(filter)
+
+def test_readd_and_remove(index):
+    index.add('m1', {'customer': 'Globex', 'issue_type': 'billing', 'timestamp': '2025-05-01 09:00:00'})
+    assert index.candidates({'customer': 'acme'}) == ['m2']
+    assert index.candidates({'customer': 'globex', 'issue_type': 'billing'}) == ['m1', 'm3']
+    index.remove('m3')
+    index.remove('missing')
+    assert index.candidates({'customer': 'globex', 'issue_type': 'billing'}) == ['m1']
+    assert index.candidates({'since': '2025-05-31', 'until': '2025-05-31'}) == []
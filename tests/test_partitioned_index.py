@@ -0,0 +1,68 @@
+import datetime
+import math
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'manual'))
+from memory import PartitionedIndex, tokenize
+from search_eval import generate_store
+
+QUERIES = ['python latency', 'alice caching', 'debugged retries timeouts', 'security', 'nothing matches this']
+
+def text_of(conversation):
+    return f'{conversation["user_message"]} {conversation["agent_response"]}'
+
+def brute_force(records, query, limit, half_life_days=7.0, k1=1.2, b=0.75):
+    '''Score every record: BM25 with store-wide idf and average length, times the recency decay.'''
+    documents = [Counter(tokenize(text_of(record))) for record in records]
+    lengths = [sum(document.values()) for document in documents]
+    average_length = sum(lengths) / len(records)
+    times = [datetime.datetime.fromisoformat(record['timestamp']).timestamp() for record in records]
+    newest = max(times)
+    rate = math.log(2) / (half_life_days * 86400)
+    idfs = {}
+    for term in set(tokenize(query)):
+        frequency = sum(1 for document in documents if term in document)
+        if frequency:
+            idfs[term] = math.log(1 + (len(records) - frequency + 0.5) / (frequency + 0.5))
+    scores = {}
+    for position, document in enumerate(documents):
+        score = sum(
+            idf * document[term] * (k1 + 1) / (document[term] + k1 * (1 - b + b * lengths[position] / average_length))
+            for term, idf in idfs.items() if term in document
+        )
+        if score:
+            scores[position] = score * math.exp(-rate * (newest - times[position]))
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+@pytest.fixture(scope='module')
+def records(tmp_path_factory):
+    # An hour apart: 2000 conversations span about 12 weeks
+    return list(generate_store(str(tmp_path_factory.mktemp('memory')), 0, 2000).conversations)
+
+@pytest.mark.parametrize('query', QUERIES)
+@pytest.mark.parametrize('limit', [1, 5, 20])
+def test_matches_brute_force(records, query, limit):
+    index = PartitionedIndex(text_of, granularity='week', half_life_days=7.0)
+    index.sync(records)
+    assert index.search(query, limit) == brute_force(records, query, limit)
+
+def test_early_termination_skips_old_partitions(records):
+    index = PartitionedIndex(text_of, granularity='week', half_life_days=7.0)
+    index.sync(records)
+    assert len(index.partitions) > 4
+    index.search('python latency', 5)
+    assert 0 < index.partitions_searched < len(index.partitions)
+
+def test_day_partitions_and_incremental_sync(records):
+    index = PartitionedIndex(text_of, granularity='day', half_life_days=2.0)
+    index.sync(records[:1500])
+    index.sync(records)
+    assert index.search('alice caching', 10) == brute_force(records, 'alice caching', 10, half_life_days=2.0)
+
+def test_unknown_granularity():
+    with pytest.raises(ValueError):
+        PartitionedIndex(text_of, granularity='month')
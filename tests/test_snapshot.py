@@ -0,0 +1,69 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'manual'))
+from memory import Memory
+from snapshot import SnapshotRecords, snapshot_path
+
+FACTS = [
+    {'content': 'alice prefers python', 'category': 'preference', 'timestamp': '2025-01-01T09:00:00'},
+    {'content': 'bob debugged the cache', 'category': None, 'timestamp': '2025-01-02T10:30:00.250000'},
+    {'content': 'ünïcode and emoji 🧠 survive', 'category': 'preference', 'timestamp': '2025-01-03T00:00:00'},
+    # Doesn't fit the layout: stored as whole-record JSON
+    {'content': 'carol wrote docs', 'category': 'general', 'timestamp': '2025-01-04T00:00:00', 'source': 'chat'},
+]
+CONVERSATIONS = [
+    {'user_message': 'What is BM25?', 'agent_response': 'A ranking function.', 'metadata': {'turn': 1},
+     'timestamp': '2025-01-01T09:01:00'},
+    {'user_message': 'And idf?', 'agent_response': 'Inverse document frequency.', 'metadata': {},
+     'timestamp': '2025-01-01T09:02:00'},
+]
+
+def make_memory(tmp_path) -> Memory:
+    memory = Memory(storage_dir=str(tmp_path))
+    memory.facts = [dict(fact) for fact in FACTS]
+    memory.conversations = [dict(conversation) for conversation in CONVERSATIONS]
+    memory._save_json(memory.facts, memory.facts_file)
+    memory._save_json(memory.conversations, memory.conversations_file)
+    memory.compact()
+    return memory
+
+def test_round_trip(tmp_path):
+    make_memory(tmp_path)
+    loaded = Memory(storage_dir=str(tmp_path))
+    assert isinstance(loaded.facts, SnapshotRecords)
+    assert isinstance(loaded.conversations, SnapshotRecords)
+    assert list(loaded.facts) == FACTS
+    assert list(loaded.conversations) == CONVERSATIONS
+
+def test_restored_index_matches_fresh_build(tmp_path):
+    make_memory(tmp_path)
+    from_snapshot = Memory(storage_dir=str(tmp_path))
+    from_json = Memory(storage_dir=str(tmp_path), snapshots=False)
+    for query in ('alice python', 'cache', 'emoji', 'docs'):
+        for mode in ('term', 'bm25'):
+            assert from_snapshot.search_facts(query, mode=mode) == from_json.search_facts(query, mode=mode)
+    assert from_snapshot.search_conversations('idf', mode='bm25') == from_json.search_conversations('idf', mode='bm25')
+
+def test_appends_after_load(tmp_path):
+    make_memory(tmp_path)
+    loaded = Memory(storage_dir=str(tmp_path))
+    loaded.add_fact('dave likes rust', 'preference')
+    assert len(loaded.facts) == len(FACTS) + 1
+    assert loaded.facts[-1]['content'] == 'dave likes rust'
+    assert loaded.search_facts('rust', mode='bm25')[0]['content'] == 'dave likes rust'
+
+def test_stale_snapshot_is_ignored(tmp_path):
+    memory = make_memory(tmp_path)
+    memory.facts.append({'content': 'erin joined', 'category': None, 'timestamp': '2025-01-05T00:00:00'})
+    memory._save_json(memory.facts, memory.facts_file)
+    loaded = Memory(storage_dir=str(tmp_path))
+    assert not isinstance(loaded.facts, SnapshotRecords)
+    assert loaded.facts[-1]['content'] == 'erin joined'
+
+def test_corrupt_snapshot_falls_back_to_json(tmp_path):
+    memory = make_memory(tmp_path)
+    with open(snapshot_path(memory.facts_file), 'r+b') as f:
+        f.write(b'garbage!')
+    loaded = Memory(storage_dir=str(tmp_path))
+    assert list(loaded.facts) == FACTS